@@ -0,0 +1,77 @@
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from classes import Experiment
+
+FIELDS = ["file", "result", "status", "bounces", "path_length", "wall_time"]
+
+# Проверка одного эксперимента без окна
+def run_one(path, max_bounces = 1000):
+
+    start = time.perf_counter()
+
+    row = {"file" : path}
+
+    try:
+        exp = Experiment(mirrors = [])
+        exp.load(os.path.dirname(path), os.path.basename(path))
+        result = exp.trace(max_bounces = max_bounces)
+    except Exception as error:
+        row.update({"result" : "error", "status" : type(error).__name__, "bounces" : "", "path_length" : ""})
+    else:
+        row.update({
+            "result" : "hit" if result.is_achieved() else "miss",
+            "status" : result.status,
+            "bounces" : result.bounces,
+            "path_length" : f"{result.length:.3f}"
+        })
+
+    row["wall_time"] = f"{time.perf_counter() - start:.6f}"
+
+    return row
+
+# Сбор всех файлов экспериментов по путям и маскам
+def collect_files(patterns):
+
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.exp")
+        files.extend(sorted(glob.glob(pattern)))
+    return files
+
+# Пакетная проверка экспериментов
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Пакетная проверка сохранённых экспериментов без окна.")
+    parser.add_argument("paths", nargs = "*", default = ["saves"],
+                        help = "файлы .exp, маски или папки (по умолчанию saves)")
+    parser.add_argument("-o", "--output", default = None, help = "CSV-файл с результатами (по умолчанию stdout)")
+    parser.add_argument("-j", "--jobs", type = int, default = None, help = "число процессов (по умолчанию все ядра)")
+    parser.add_argument("--max-bounces", type = int, default = 1000, help = "лимит отражений (по умолчанию 1000)")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.paths)
+
+    output = open(args.output, "w", newline = "") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames = FIELDS)
+        writer.writeheader()
+
+        with ProcessPoolExecutor(max_workers = args.jobs) as executor:
+            for row in executor.map(run_one, files, [args.max_bounces] * len(files), chunksize = 8):
+                writer.writerow(row)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
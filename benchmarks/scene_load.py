@@ -0,0 +1,85 @@
+import argparse
+import math
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from classes import FlatMirror, SphericalMirror, LightSource, LightDestination, read_scene, write_scene, \
+    write_mirror_arrays
+
+# Правильный многоугольник из n зеркал (каждое третье - вогнутое сферическое) с целью в центре
+def make_polygon(n, radius = 2000.0, center = (0.0, 0.0)):
+
+    corners = [(center[0] + radius * math.cos(2 * math.pi * k / n), center[1] + radius * math.sin(2 * math.pi * k / n))
+               for k in range(n)]
+
+    mirrors = []
+    for k in range(n):
+        left_corner, right_corner = corners[(k + 1) % n], corners[k]
+        side = math.dist(left_corner, right_corner)
+        if k % 3 == 2:
+            mirrors.append(SphericalMirror(left_corner, right_corner, "concave", side))
+        else:
+            mirrors.append(FlatMirror(left_corner, right_corner))
+
+    light_source = LightSource(mirrors[0], 0.5, 60)
+    light_destination = LightDestination(center, radius / 20)
+
+    return mirrors, light_source, light_destination
+
+# Лучшее время из repeats загрузок файла
+def time_load(load, path, repeats):
+
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load(path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def load_pickle(path):
+
+    with open(path, "rb") as load_file:
+        return pickle.load(load_file)
+
+# Сравнение времени загрузки старых pickle-сохранений, формата сцены и файлов массивов зеркал
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Сравнение времени загрузки pickle-сохранений, формата сцены и файлов массивов зеркал.")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [4, 100, 1000, 10000],
+                        help = "числа зеркал в сгенерированных сценах (по умолчанию 4 100 1000 10000)")
+    parser.add_argument("--repeats", type = int, default = 5, help = "число повторов загрузки (по умолчанию 5)")
+    args = parser.parse_args(argv)
+
+    print(f"{'mirrors':>8} {'pickle, KB':>11} {'scene, KB':>10} {'arrays, KB':>11} "
+          f"{'pickle, ms':>11} {'scene, ms':>10} {'arrays, ms':>11}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in args.sizes:
+            mirrors, light_source, light_destination = make_polygon(n)
+
+            pickle_path = os.path.join(tmp_dir, f"{n}.pickle.exp")
+            with open(pickle_path, "wb") as save_file:
+                pickle.dump({"light" : None, "mirrors" : mirrors, "light_source" : light_source,
+                             "light_destination" : light_destination}, save_file)
+
+            scene_path = os.path.join(tmp_dir, f"{n}.exp")
+            write_scene(scene_path, mirrors, [light_source], light_destination)
+
+            arrays_path = os.path.join(tmp_dir, f"{n}.arrays.exp")
+            write_mirror_arrays(arrays_path, mirrors, [light_source], light_destination)
+
+            print(f"{n:>8} {os.path.getsize(pickle_path) / 1024:>11.1f} {os.path.getsize(scene_path) / 1024:>10.1f} "
+                  f"{os.path.getsize(arrays_path) / 1024:>11.1f} "
+                  f"{time_load(load_pickle, pickle_path, args.repeats) * 1000:>11.2f} "
+                  f"{time_load(read_scene, scene_path, args.repeats) * 1000:>10.2f} "
+                  f"{time_load(read_scene, arrays_path, args.repeats) * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
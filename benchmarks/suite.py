@@ -0,0 +1,248 @@
+import argparse
+import datetime
+import glob
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks")) # scene_load лежит рядом, откуда бы ни запускали набор
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # Окно не открывается, рисование идёт в память
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+START_DIR = os.getcwd() # Пути из командной строки считаются от папки запуска
+os.chdir(ROOT) # Окно загружает картинки относительно папки проекта ещё при импорте classes
+
+import easygui
+import numpy as np
+import pygame as pg
+
+from classes import Experiment, Window, Tracer, read_scene
+from scene_load import make_polygon
+
+METRICS = ("ray_steps", "reflections", "queries", "scene_fps", "frame_fps") # Измеряемые величины, все - в штуках в секунду
+
+# Повторять action, пока не пройдёт seconds секунд (но хотя бы один раз); action возвращает число выполненных операций
+def rate(action, seconds):
+
+    count, elapsed = 0, 0.0
+    while elapsed < seconds or count == 0:
+        start = time.perf_counter()
+        count += action()
+        elapsed += time.perf_counter() - start
+    return count / elapsed
+
+# Шаги симуляции без точного трассировщика: продвижение луча и проверка касания зеркал (как в Experiment.step_light)
+def measure_ray_steps(exp, drawspace, seconds):
+
+    exp.exact_tracing = False
+    exp.start()
+
+    def steps():
+        if exp.get_status() is not None:
+            exp.start()
+        exp.step_light(drawspace)
+        return len(exp.lights)
+
+    return rate(steps, seconds)
+
+# Отражения в секунду у точного трассировщика (Tracer с сеткой зеркал, без цели)
+def measure_reflections(exp, light_source, seconds, max_bounces = 1000):
+
+    tracer = Tracer(exp.mirrors, None, exp.get_mirror_index())
+    return rate(lambda: max(tracer.trace(light_source, max_bounces).bounces, 1), seconds)
+
+# Запросы ближайшего зеркала на пути луча (Tracer.find_hit) из случайных точек внутри сцены
+def measure_queries(exp, seconds, count = 1000):
+
+    tracer = Tracer(exp.mirrors, None, exp.get_mirror_index())
+    index = tracer.mirror_index
+
+    rng = random.Random(0)
+    rays = []
+    for _ in range(count):
+        point = (rng.uniform(index.min_x, index.max_x), rng.uniform(index.min_y, index.max_y))
+        angle = rng.uniform(0, 2 * math.pi)
+        rays.append((point, (math.cos(angle), math.sin(angle))))
+
+    def queries():
+        for point, direction in rays:
+            tracer.find_hit(point, direction)
+        return len(rays)
+
+    return rate(queries, seconds)
+
+# Кадры с полной перерисовкой статичной сцены (зеркала, цель, кнопки), как после изменения зеркал
+def measure_scene_fps(window, seconds):
+
+    drawspace = window.drawspace
+
+    def frame():
+        drawspace.scene_layers.clear()
+        drawspace.draw_scene(window.exp_mode_buttons, turn_up = True)
+        drawspace.present()
+        return 1
+
+    return rate(frame, seconds)
+
+# Кадры запущенного эксперимента (Experiment.run_exp с точной трассировкой, как в программе): следы лучей, вывод
+# на дисплей и столько шагов физики, сколько приходится на кадр при частоте планировщика. Ожидание кадра не учитывается
+def measure_frame_fps(exp, window, seconds):
+
+    drawspace = window.drawspace
+    steps_per_frame = max(round(exp.scheduler.frame_time * exp.clock.speed / exp.clock.step), 1)
+    exp.scheduler.wait_frame = lambda: None
+    exp.clock.tick = lambda: steps_per_frame
+
+    def restart():
+        exp.start()
+        drawspace.draw_scene(window.exp_mode_buttons, turn_up = True)
+        drawspace.present()
+
+    exp.exact_tracing = True
+    restart()
+
+    count, elapsed = 0, 0.0
+    try:
+        while elapsed < seconds or count == 0:
+            start = time.perf_counter()
+            running = exp.run_exp(window)
+            elapsed += time.perf_counter() - start
+            count += 1
+            # Луч дошёл до конца: эксперимент запускается заново вне замера
+            if not running:
+                restart()
+    finally:
+        del exp.scheduler.wait_frame, exp.clock.tick
+    return count / elapsed
+
+# Все замеры для одной сцены
+def run_scene(exp, window, name, config, seconds):
+
+    exp.lights = []
+    exp.mirrors = config["mirrors"]
+    exp.light_sources = config["light_sources"]
+    exp.light_destination = config["light_destination"]
+
+    result = {"scene" : name, "mirrors" : len(exp.mirrors)}
+    result["queries"] = measure_queries(exp, seconds) if exp.mirrors else None
+    result["scene_fps"] = measure_scene_fps(window, seconds)
+
+    # Лучу нужны источник и цель
+    if exp.light_sources and exp.light_destination is not None:
+        result["ray_steps"] = measure_ray_steps(exp, window.drawspace, seconds)
+        result["reflections"] = measure_reflections(exp, exp.light_sources[0], seconds)
+        result["frame_fps"] = measure_frame_fps(exp, window, seconds)
+    else:
+        result["ray_steps"] = result["reflections"] = result["frame_fps"] = None
+
+    return result
+
+# Сцены для замеров: сохранения и правильные многоугольники из n зеркал посреди окна
+def iter_scenes(saves, sizes, window_size):
+
+    for path in saves:
+        yield os.path.basename(path), lambda path = path: read_scene(path)
+
+    center = (window_size[0] / 2, window_size[1] / 2)
+    radius = min(window_size) / 2 - 20
+    for n in sizes:
+        def generate(n = n):
+            mirrors, light_source, light_destination = make_polygon(n, radius, center)
+            return {"mirrors" : mirrors, "light_sources" : [light_source], "light_destination" : light_destination}
+        yield f"{n}-gon", generate
+
+# Метка версии кода: git describe (или "local" вне репозитория)
+def get_version():
+
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd = ROOT, capture_output = True,
+                              text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+def format_value(value):
+
+    return f"{'-':>12}" if value is None else f"{value:>12.1f}"
+
+# Сравнение с результатами другой версии: отношение новых величин к старым (больше 1 - быстрее)
+def print_comparison(results, baseline):
+
+    old = {result["scene"] : result for result in baseline["results"]}
+    print(f"\nОтносительно {baseline['version']}:")
+    print(f"{'scene':>16} " + " ".join(f"{metric:>12}" for metric in METRICS))
+    for result in results:
+        if result["scene"] not in old:
+            continue
+        ratios = []
+        for metric in METRICS:
+            new_value, old_value = result.get(metric), old[result["scene"]].get(metric)
+            ratios.append(f"{'-':>12}" if not new_value or not old_value else f"{new_value / old_value:>11.2f}x")
+        print(f"{result['scene']:>16} " + " ".join(ratios))
+
+# Набор замеров производительности без окна: физика, трассировка, запросы к сетке зеркал и отрисовка
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Замеры производительности на сохранениях и сгенерированных многоугольниках "
+                                                   "(без окна, SDL_VIDEODRIVER=dummy).")
+    parser.add_argument("--saves", nargs = "*", default = None,
+                        help = "файлы сохранений (по умолчанию saves/*.exp)")
+    parser.add_argument("--sizes", type = int, nargs = "*", default = [4, 100, 1000, 10000, 100000],
+                        help = "числа зеркал в сгенерированных сценах (по умолчанию 4 100 1000 10000 100000)")
+    parser.add_argument("--seconds", type = float, default = 1.0, help = "время каждого замера в секундах (по умолчанию 1.0)")
+    parser.add_argument("--version", default = None, help = "метка версии в результатах (по умолчанию git describe)")
+    parser.add_argument("-o", "--output", default = None,
+                        help = "JSON-файл результатов (по умолчанию benchmarks/results/<версия>.json)")
+    parser.add_argument("--compare", default = None, help = "JSON-файл результатов другой версии для сравнения")
+    args = parser.parse_args(argv)
+
+    saves = ([os.path.join(START_DIR, path) for path in args.saves] if args.saves is not None
+             else sorted(glob.glob(os.path.join(ROOT, "saves", "*.exp"))))
+    version = args.version or get_version()
+
+    # Окна сообщений об итоге эксперимента в замерах не показываются
+    easygui.msgbox = lambda *args, **kwargs: None
+
+    exp = Experiment()
+    window = Window(exp)
+
+    print(f"{'scene':>16} {'mirrors':>8} " + " ".join(f"{metric:>12}" for metric in METRICS))
+
+    results = []
+    for name, load in iter_scenes(saves, args.sizes, window.screen.get_size()):
+        result = run_scene(exp, window, name, load(), args.seconds)
+        results.append(result)
+        print(f"{name:>16} {result['mirrors']:>8} " + " ".join(format_value(result[metric]) for metric in METRICS), flush = True)
+
+    report = {
+        "version" : version,
+        "date" : datetime.datetime.now().isoformat(timespec = "seconds"),
+        "python" : platform.python_version(),
+        "pygame" : pg.version.ver,
+        "numpy" : np.__version__,
+        "machine" : platform.platform(),
+        "seconds" : args.seconds,
+        "results" : results
+    }
+
+    output = os.path.join(START_DIR, args.output) if args.output else os.path.join(ROOT, "benchmarks", "results", f"{version}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+    with open(output, "w", encoding = "utf-8") as output_file:
+        json.dump(report, output_file, indent = 1)
+    print(f"\nРезультаты записаны в {output}")
+
+    if args.compare is not None:
+        with open(os.path.join(START_DIR, args.compare), encoding = "utf-8") as baseline_file:
+            print_comparison(results, json.load(baseline_file))
+
+    pg.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,22 @@
 from classes.mirror import *
+from classes.polyline import *
+from classes.trail import *
 from classes.light import *
+from classes.mirrorarrays import *
+from classes.scenefile import *
+from classes.spatial import *
+from classes.tracer import *
+from classes.trajectory import *
+from classes.aim import *
+from classes.clock import *
+from classes.scheduler import *
+from classes.profiler import *
+from classes.textcache import *
+from classes.vectorized import *
+from classes.sweep import *
+from classes.heatmap import *
+from classes.caustics import *
+from classes.catalog import *
 from classes.experiment import *
 from classes.window import *
 from classes.drawspace import *
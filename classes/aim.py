@@ -0,0 +1,140 @@
+import math
+
+from classes.light import LightSource
+from classes.tracer import Tracer
+
+
+class AimSolver:
+
+    def __init__(self, mirrors, light_destination, mirror_index = None, max_bounces = 100, samples = 360, tolerance = 1e-9):
+        """
+            Конструктор решателя обратной задачи: поиск углов выхода света, при которых луч из
+                заданной точки зеркала попадает в цель.
+                Сначала углы перебираются с шагом 180 / samples. Для каждого отрезка пути (после k
+                отражений) считается смещение центра цели относительно прямой отрезка со знаком.
+                Если у соседних углов одинаковы первые k зеркал, а смещение меняет знак, между ними
+                есть угол, при котором отрезок проходит через центр цели; он уточняется делением пополам.
+            Параметры:
+                mirrors (List[Mirror]): зеркала эксперимента
+                light_destination (LightDestination): цель света
+                mirror_index (MirrorGrid): пространственный индекс зеркал. По умолчанию None
+                max_bounces (int): наибольшее число отражений до цели. По умолчанию 100
+                samples (int): число углов при первоначальном переборе. По умолчанию 360
+                tolerance (float): точность угла в градусах. По умолчанию 1e-9
+        """
+
+        self.light_destination = light_destination
+        self.max_bounces = max_bounces
+        self.samples = samples
+        self.tolerance = tolerance
+
+        self.tracer = Tracer(mirrors, light_destination, mirror_index)
+
+    def solve(self, light_source):
+        """
+            Углы выхода света из источника light_source (его зеркало и положение не меняются),
+                при которых свет достигает цели не более чем за max_bounces отражений.
+            Возвращает:
+                List[(float, TraceResult)]: углы и пути луча, по одному на каждую последовательность
+                    зеркал, по возрастанию числа отражений
+                    (пустой список, если цель не задана)
+        """
+
+        if self.light_destination is None:
+            return []
+
+        step = 180.0 / self.samples
+        angles = [step * (i + 0.5) for i in range(self.samples)]
+        traces = [self.trace(light_source, angle) for angle in angles]
+
+        solutions = [(angle, result) for angle, result in zip(angles, traces) if result.is_achieved()]
+
+        for (angle1, result1), (angle2, result2) in zip(zip(angles, traces), zip(angles[1:], traces[1:])):
+
+            offsets1, offsets2 = self.get_offsets(result1), self.get_offsets(result2)
+
+            for k in range(min(len(offsets1), len(offsets2))):
+                # Прямая k-го отрезка непрерывно зависит от угла, только пока зеркала те же
+                if k > 0 and result1.mirror_indices[k - 1] != result2.mirror_indices[k - 1]:
+                    break
+                if math.isnan(offsets1[k]) or math.isnan(offsets2[k]):
+                    continue
+                if (offsets1[k] < 0) != (offsets2[k] < 0):
+                    solution = self.bisect(light_source, k, result1.mirror_indices[:k], angle1, angle2, offsets1[k])
+                    if solution is not None:
+                        solutions.append(solution)
+
+        # Для каждой последовательности зеркал остаётся угол, при котором луч проходит ближе всего к центру цели
+        best = {}
+        for angle, result in solutions:
+            key = tuple(result.mirror_indices)
+            if key not in best or result.closest < best[key][1].closest:
+                best[key] = (angle, result)
+
+        return sorted(best.values(), key = lambda solution: (solution[1].bounces, solution[0]))
+
+    def trace(self, light_source, angle, max_bounces = None):
+        """
+            Путь луча из точки источника под углом angle.
+        """
+
+        source = LightSource(light_source.mirror, light_source.local_pos, angle, light_source.velocity)
+        return self.tracer.trace(source, self.max_bounces if max_bounces is None else max_bounces)
+
+    def get_offsets(self, result):
+        """
+            Смещения центра цели со знаком относительно прямых всех отрезков пути result
+                (для отрезков, вдоль которых цель впереди; иначе 0 не ищется и ставится nan).
+        """
+
+        cx, cy = self.light_destination.pos
+        offsets = []
+
+        for k in range(result.bounces + 1):
+            point, direction = self.get_segment(result, k)
+            along = (cx - point[0]) * direction[0] + (cy - point[1]) * direction[1]
+            offset = direction[0] * (cy - point[1]) - direction[1] * (cx - point[0])
+            offsets.append(offset if along > 0 else math.nan)
+
+        return offsets
+
+    def get_segment(self, result, k):
+        """
+            Начало и единичное направление отрезка пути result после k отражений.
+        """
+
+        point = result.points[k]
+        if k < result.bounces:
+            x, y = result.points[k + 1]
+            norm = math.sqrt((x - point[0]) ** 2 + (y - point[1]) ** 2)
+            return point, ((x - point[0]) / norm, (y - point[1]) / norm)
+
+        return point, result.direction
+
+    def bisect(self, light_source, k, mirror_indices, lo, hi, lo_offset):
+        """
+            Уточнение угла между lo и hi, при котором k-й отрезок проходит через центр цели.
+            Возвращает:
+                (float, TraceResult): угол и путь луча, если луч попадает в цель; иначе None
+        """
+
+        while hi - lo > self.tolerance:
+
+            middle = (lo + hi) / 2
+            result = self.trace(light_source, middle, k)
+
+            if result.bounces < k or result.mirror_indices != mirror_indices:
+                return None # Путь изменился - смещение между lo и hi разрывно
+
+            offset = self.get_offsets(result)[k]
+            if math.isnan(offset):
+                return None
+            if (offset < 0) == (lo_offset < 0):
+                lo, lo_offset = middle, offset
+            else:
+                hi = middle
+
+        angle = (lo + hi) / 2
+        result = self.trace(light_source, angle)
+
+        return (angle, result) if result.is_achieved() else None
@@ -1,6 +1,8 @@
 import pygame as pg
 from pygame import Surface, Rect, Color
 
+from classes.textcache import text_cache
+
 class Button:
 
     def __init__(self, pos, size, text, font_size, action = lambda : None):
@@ -21,8 +23,7 @@ class Button:
         pg.draw.rect(self.up_surface, self.up_color, self.rect)
         pg.draw.rect(self.down_surface, self.down_color, self.rect)
 
-        font = pg.font.Font(None, font_size)
-        self.text_surface = font.render(text, True, Color("black"))
+        self.text_surface = text_cache.render(text, Color("black"), font_size)
         self.up_surface.blit(
             self.text_surface, 
             (
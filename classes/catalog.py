@@ -0,0 +1,207 @@
+import json
+import os
+
+import pygame as pg
+from pygame import Color, Rect, Surface
+
+from classes.mirror import FlatMirror, SphericalMirror
+from classes.polyline import PolylineMirror
+from classes.spatial import get_bounding_box
+from classes.tracer import Tracer
+from classes.scenefile import read_scene
+
+CATALOG_VERSION = 1 # Версия файла каталога; при несовпадении каталог строится заново
+
+
+class SceneCatalog:
+
+    def __init__(self, saves_path = "saves", catalog_dir = ".catalog", thumbnail_size = (160, 106), max_bounces = 1000):
+        """
+            Конструктор каталога сохранений. Каталог хранит для каждого файла .exp краткие сведения:
+                число и типы зеркал, описывающий прямоугольник, итог трассировки и миниатюру, чтобы
+                список сохранений строился без загрузки самих файлов. Файл перечитывается только
+                если изменились его время изменения или размер.
+            Параметры:
+                saves_path (str): папка с сохранениями. По умолчанию "saves"
+                catalog_dir (str): папка каталога внутри saves_path. По умолчанию ".catalog"
+                thumbnail_size (int, int): размер миниатюры. По умолчанию (160, 106)
+                max_bounces (int): лимит отражений при трассировке. По умолчанию 1000
+        """
+
+        self.saves_path = saves_path
+        self.catalog_path = os.path.join(saves_path, catalog_dir)
+        self.index_path = os.path.join(self.catalog_path, "index.json")
+        self.thumbnail_size = thumbnail_size
+        self.max_bounces = max_bounces
+
+        self.bg_color = Color("azure")
+        self.mirror_color = Color("grey40")
+        self.light_color = Color("darkgoldenrod1")
+        self.dest_color = Color("cornflowerblue")
+
+        self.entries = self.read_index() # Имя файла -> сведения о сцене
+
+    def read_index(self):
+        """
+            Чтение файла каталога. Возвращает пустой каталог, если файла нет или он устарел.
+        """
+
+        try:
+            with open(self.index_path, "r", encoding = "utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+
+        if index.get("version") != CATALOG_VERSION:
+            return {}
+
+        return index.get("entries", {})
+
+    def write_index(self):
+        """
+            Запись файла каталога.
+        """
+
+        os.makedirs(self.catalog_path, exist_ok = True)
+        with open(self.index_path, "w", encoding = "utf-8") as index_file:
+            json.dump({"version" : CATALOG_VERSION, "entries" : self.entries}, index_file, ensure_ascii = False)
+
+    def update(self):
+        """
+            Обновление каталога: новые и изменённые файлы читаются и описываются заново,
+                записи удалённых файлов убираются.
+            Возвращает:
+                List[(str, dict)]: пары (имя файла, сведения) по алфавиту
+        """
+
+        names = sorted(name for name in os.listdir(self.saves_path) if name.endswith(".exp"))
+        changed = False
+
+        for name in names:
+            stat = os.stat(os.path.join(self.saves_path, name))
+            entry = self.entries.get(name)
+            if entry is not None and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+
+            entry = self.describe(name)
+            entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+            self.entries[name] = entry
+            changed = True
+
+        for name in set(self.entries) - set(names):
+            del self.entries[name]
+            thumbnail_path = self.get_thumbnail_path(name)
+            if os.path.exists(thumbnail_path):
+                os.remove(thumbnail_path)
+            changed = True
+
+        if changed:
+            self.write_index()
+
+        return [(name, self.entries[name]) for name in names]
+
+    def describe(self, name):
+        """
+            Сведения о сцене из файла name: зеркала, прямоугольник, итог трассировки и миниатюра.
+        """
+
+        try:
+            config = read_scene(os.path.join(self.saves_path, name))
+        except Exception as error:
+            return {"error" : type(error).__name__}
+
+        mirrors = config["mirrors"]
+        light_source = config["light_source"]
+        light_sources = config["light_sources"]
+        light_destination = config["light_destination"]
+
+        types = {}
+        for mirror in mirrors:
+            mirror_type = "flat" if isinstance(mirror, FlatMirror) else getattr(mirror, "mirror_type", type(mirror).__name__)
+            types[mirror_type] = types.get(mirror_type, 0) + 1
+
+        entry = {"mirrors" : len(mirrors), "types" : types, "bbox" : None, "trace" : None}
+
+        if mirrors:
+            boxes = [get_bounding_box(mirror) for mirror in mirrors]
+            entry["bbox"] = [min(box[0] for box in boxes), min(box[1] for box in boxes),
+                             max(box[2] for box in boxes), max(box[3] for box in boxes)]
+
+        if light_source is not None and light_source.mirror is not None:
+            result = Tracer(mirrors, light_destination).trace(light_source, self.max_bounces)
+            entry["trace"] = {"status" : result.status, "bounces" : result.bounces, "length" : result.length}
+
+        thumbnail = self.render_thumbnail(mirrors, light_sources, light_destination, entry["bbox"])
+        os.makedirs(self.catalog_path, exist_ok = True)
+        pg.image.save(thumbnail, self.get_thumbnail_path(name))
+
+        return entry
+
+    def render_thumbnail(self, mirrors, light_sources, light_destination, bbox):
+        """
+            Миниатюра сцены: зеркала, источники и цель, вписанные в thumbnail_size.
+        """
+
+        width, height = self.thumbnail_size
+        thumbnail = Surface(self.thumbnail_size)
+        thumbnail.fill(self.bg_color)
+
+        if bbox is None:
+            return thumbnail
+
+        margin = 4
+        scale = min((width - 2 * margin) / max(bbox[2] - bbox[0], 1.0), (height - 2 * margin) / max(bbox[3] - bbox[1], 1.0))
+        offset_x = (width - (bbox[2] - bbox[0]) * scale) / 2 - bbox[0] * scale
+        offset_y = (height - (bbox[3] - bbox[1]) * scale) / 2 - bbox[1] * scale
+
+        def to_thumbnail(point):
+            return point[0] * scale + offset_x, point[1] * scale + offset_y
+
+        for mirror in mirrors:
+            if isinstance(mirror, SphericalMirror):
+                rect = mirror.spherical_rect
+                x, y = to_thumbnail((rect.x, rect.y))
+                arc_rect = Rect(x, y, max(rect.w * scale, 1), max(rect.h * scale, 1))
+                pg.draw.arc(thumbnail, self.mirror_color, arc_rect, mirror.start_angle, mirror.stop_angle, width = 2)
+            elif isinstance(mirror, PolylineMirror):
+                pg.draw.lines(thumbnail, self.mirror_color, False, [to_thumbnail(point) for point in mirror.points], width = 2)
+            else:
+                pg.draw.line(thumbnail, self.mirror_color, to_thumbnail(mirror.left_corner), to_thumbnail(mirror.right_corner), width = 2)
+
+        if light_destination is not None:
+            pg.draw.circle(thumbnail, self.dest_color, to_thumbnail(light_destination.pos), max(light_destination.radius * scale, 2))
+
+        for light_source in light_sources:
+            if light_source.mirror is not None:
+                pg.draw.circle(thumbnail, self.light_color, to_thumbnail(light_source.get_absolute_pos()), 3)
+
+        return thumbnail
+
+    def get_thumbnail_path(self, name):
+        """
+            Путь к миниатюре файла name.
+        """
+
+        return os.path.join(self.catalog_path, os.path.splitext(name)[0] + ".png")
+
+
+def describe_entry(name, entry):
+    """
+        Строка для списка сохранений: имя, зеркала и итог трассировки.
+    """
+
+    if "error" in entry:
+        return f"{name} - не читается ({entry['error']})"
+
+    types = ", ".join(f"{mirror_type}: {count}" for mirror_type, count in sorted(entry["types"].items()))
+    text = f"{name} - зеркал {entry['mirrors']} ({types})"
+
+    trace = entry["trace"]
+    if trace is None:
+        text += ", нет источника"
+    elif trace["status"] == "achieved":
+        text += f", цель достигается за {trace['bounces']} отражений"
+    else:
+        text += f", цель не достигается ({trace['status']})"
+
+    return text
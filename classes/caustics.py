@@ -0,0 +1,233 @@
+import math
+
+import numpy as np
+import pygame as pg
+from pygame import Color
+
+from classes.light import MOMENTUM_RATE, MAX_MOMENTUM
+from classes.vectorized import RayBundle, BundleTracer, RAY_ESCAPED
+
+GOLDEN_RATIO = (math.sqrt(5) - 1) / 2 # Дробная часть золотого сечения (сдвиги точек отрезков, см. CausticMap.accumulate_chunk)
+
+
+class CausticMap:
+
+    def __init__(self, size, cell = 3, sample_step = 2.0, max_samples = 1 << 22):
+        """
+            Карта плотности света (каустика) размером с экран: в каждой клетке cell x cell пикселей
+                копится длина путей лучей, прошедших через неё. Отрезки лучей растеризуются
+                векторизованно: каждый отрезок разбивается на точки с шагом sample_step клеток,
+                и все точки пачки складываются в буфер одним np.bincount. Изображение карты
+                растягивается до размера экрана со сглаживанием (см. render).
+            Параметры:
+                size (int, int): ширина и высота карты в пикселях
+                cell (int): сторона клетки буфера в пикселях. По умолчанию 3 (в 9 раз меньше
+                    клеток и в 3 раза меньше точек на отрезок, чем при попиксельном буфере)
+                sample_step (float): шаг точек вдоль отрезка в клетках. По умолчанию 2.0: первая
+                    точка каждого отрезка сдвинута на свою долю шага, поэтому пропуски клеток
+                    между точками разных лучей не совпадают и на карте не видно полос
+                max_samples (int): наибольшее число точек, обрабатываемых за раз. По умолчанию 2^22
+        """
+
+        self.width, self.height = size
+        self.cell = cell
+        self.sample_step = sample_step
+        self.max_samples = max_samples
+
+        # Размер буфера в клетках; порядок осей (ширина, высота), как у pygame.surfarray
+        self.grid_width, self.grid_height = math.ceil(self.width / cell), math.ceil(self.height / cell)
+        self.buffer = np.zeros((self.grid_width, self.grid_height), dtype = np.float64)
+        self.segment_count = 0 # Число учтённых отрезков
+
+        self.bg_color = Color("black")
+        self.light_color = Color("goldenrod1") # Средняя плотность
+        self.peak_color = Color("white") # Наибольшая плотность
+
+    @classmethod
+    def compute(cls, light_sources, mirrors, light_destination, size, rays = 20000, spread = 180.0,
+                max_bounces = 10, max_momentum = MAX_MOMENTUM, **kwargs):
+        """
+            Карта для пучков лучей из источников light_sources: из каждого выпускается rays лучей
+                с углами в пределах spread градусов вокруг угла источника (но в [0..180]).
+            Параметры:
+                light_sources (List[LightSource]): источники света
+                mirrors (List[Mirror]): зеркала эксперимента
+                light_destination (LightDestination): цель света (лучи в ней останавливаются)
+                size (int, int): размер карты в пикселях
+                rays (int): число лучей из каждого источника. По умолчанию 20000
+                spread (float): ширина веера лучей в градусах. По умолчанию 180.0 (все направления)
+                max_bounces (int): наибольшее число отражений луча. По умолчанию 10 (после многих
+                    отражений свет заполняет конфигурацию равномерно и фокусы размываются)
+                max_momentum (float): максимальный момент света. По умолчанию MAX_MOMENTUM
+            Возвращает:
+                CausticMap: карта
+        """
+
+        caustic_map = cls(size, **kwargs)
+        # Отдавать управление не нужно, поэтому веер каждого источника трассируется одним пучком
+        for _ in caustic_map.trace_sources(light_sources, mirrors, light_destination, rays, spread, max_bounces, max_momentum,
+                                           batch = rays):
+            pass
+
+        return caustic_map
+
+    def trace_sources(self, light_sources, mirrors, light_destination, rays = 20000, spread = 180.0,
+                      max_bounces = 10, max_momentum = MAX_MOMENTUM, batch = 250):
+        """
+            Построение карты по частям (параметры - как у compute): веер каждого источника
+                трассируется пачками по batch лучей, и после каждой пачки генератор отдаёт
+                управление. Так карту можно строить между кадрами, не останавливая окно.
+            Возвращает:
+                Iterator[float]: доля выпущенных лучей после каждой пачки (от 0 до 1)
+        """
+
+        tracer = BundleTracer(mirrors, light_destination)
+        total = rays * len(light_sources)
+        done = 0
+
+        for light_source in light_sources:
+            low = max(light_source.light_direction - spread / 2, 0.0)
+            high = min(light_source.light_direction + spread / 2, 180.0)
+            # Крайние углы (вдоль зеркала) не берутся
+            light_directions = low + (high - low) * (np.arange(rays) + 0.5) / rays
+            for first in range(0, rays, batch):
+                bundle = RayBundle.from_light_source(light_source, light_directions[first:first + batch])
+                self.add_bundle(tracer, bundle, max_bounces, max_momentum)
+                done += len(bundle.positions)
+                yield done / total
+
+    def add_bundle(self, tracer, bundle, max_bounces = 10, max_momentum = MAX_MOMENTUM):
+        """
+            Трассировка пучка bundle трассировщиком tracer с накоплением каждого отрезка путей.
+                Отрезки не хранятся: после каждого отражения они сразу добавляются в буфер.
+                Лучи, покинувшие конфигурацию, продлеваются до края карты.
+        """
+
+        max_length = max_momentum / MOMENTUM_RATE * bundle.velocity
+        escape_length = math.hypot(self.width, self.height)
+
+        for _ in range(max_bounces):
+
+            idx = np.nonzero(bundle.active)[0]
+            if len(idx) == 0:
+                break
+
+            starts = bundle.positions[idx].copy()
+            directions = bundle.directions[idx].copy()
+            tracer.step(bundle, max_length)
+
+            ends = bundle.positions[idx]
+            escaped = bundle.status[idx] == RAY_ESCAPED
+            ends[escaped] = starts[escaped] + directions[escaped] * escape_length
+
+            self.accumulate(starts, ends)
+
+    def accumulate(self, starts, ends):
+        """
+            Добавить в буфер отрезки от starts до ends (ndarray N x 2, экранные координаты).
+                Каждая точка отрезка вносит длину своей части отрезка (в пикселях), поэтому
+                значение клетки не зависит от шага sample_step.
+        """
+
+        # Дальше всё считается в клетках буфера
+        starts, ends = clip_segments(np.asarray(starts, dtype = np.float64) / self.cell,
+                                     np.asarray(ends, dtype = np.float64) / self.cell,
+                                     self.grid_width, self.grid_height)
+        if len(starts) == 0:
+            return
+
+        deltas = ends - starts
+        lengths = np.hypot(deltas[:, 0], deltas[:, 1])
+        counts = np.maximum(np.ceil(lengths / self.sample_step), 1).astype(np.int64)
+        lengths *= self.cell
+        self.segment_count += len(starts)
+
+        # Пачки отрезков, в каждой не больше max_samples точек (но хотя бы один отрезок)
+        bounds = np.cumsum(counts)
+        first = 0
+        while first < len(starts):
+            last = max(int(np.searchsorted(bounds, bounds[first] - counts[first] + self.max_samples, side = "right")), first + 1)
+            self.accumulate_chunk(starts[first:last], deltas[first:last], lengths[first:last], counts[first:last])
+            first = last
+
+    def accumulate_chunk(self, starts, deltas, lengths, counts):
+        """
+            Добавить в буфер пачку отрезков: точки всех отрезков строятся одним массивом.
+        """
+
+        # Значения отрезков повторяются для всех их точек (np.repeat быстрее выборки по индексам).
+        # Координаты точек не больше размеров буфера, поэтому хватает float32 и int32: вдвое меньше памяти
+        steps = (deltas / counts[:, None]).astype(np.float32)
+        counts = counts.astype(np.int32)
+        offsets = (np.arange(int(counts.sum()), dtype = np.int32) - np.repeat(np.cumsum(counts) - counts, counts)).astype(np.float32)
+        # Сдвиг первой точки отрезка - дробная часть k * золотое сечение: сдвиги соседних отрезков
+        # равномерно покрывают шаг
+        offsets += np.repeat(((np.arange(len(counts)) + self.segment_count) * GOLDEN_RATIO % 1.0).astype(np.float32), counts)
+
+        x = np.repeat(starts[:, 0].astype(np.float32), counts)
+        x += np.repeat(steps[:, 0], counts) * offsets
+        y = np.repeat(starts[:, 1].astype(np.float32), counts)
+        y += np.repeat(steps[:, 1], counts) * offsets
+
+        # После отсечения точки лежат внутри буфера, кроме попавших ровно на правый или нижний край
+        cells = np.minimum(x.astype(np.int32), self.grid_width - 1)
+        cells *= self.grid_height
+        cells += np.minimum(y.astype(np.int32), self.grid_height - 1)
+        weights = np.repeat(lengths / counts, counts)
+
+        self.buffer += np.bincount(cells, weights = weights, minlength = self.buffer.size).reshape(self.buffer.shape)
+
+    def render(self):
+        """
+            Изображение карты: от bg_color (нет света) через light_color до peak_color (наибольшая
+                плотность). Шкала логарифмическая, иначе видны только самые яркие фокусы. Клетки
+                буфера растягиваются до пикселей со сглаживанием.
+            Возвращает:
+                Surface: изображение размером с карту
+        """
+
+        lit = self.buffer[self.buffer > 0]
+        if len(lit) == 0:
+            k = np.zeros(self.buffer.shape + (1,))
+        else:
+            # Плотность считается относительно медианы освещённых пикселей: так фокусы выделяются
+            # на фоне равномерной засветки при любом числе лучей
+            median = np.median(lit)
+            k = (np.log1p(self.buffer / median) / np.log1p(lit.max() / median))[:, :, None]
+
+        bg = np.array(tuple(self.bg_color)[:3], dtype = np.float64)
+        light = np.array(tuple(self.light_color)[:3], dtype = np.float64)
+        peak_color = np.array(tuple(self.peak_color)[:3], dtype = np.float64)
+
+        image = bg + (light - bg) * np.minimum(k * 2, 1.0) + (peak_color - light) * np.maximum(k * 2 - 1, 0.0)
+
+        return pg.transform.smoothscale(pg.surfarray.make_surface(image.astype(np.uint8)), (self.width, self.height))
+
+
+def clip_segments(starts, ends, width, height):
+    """
+        Отсечение отрезков прямоугольником [0..width] x [0..height] (алгоритм Лианга-Барски для
+            всех отрезков сразу). Отрезки вне прямоугольника отбрасываются.
+        Возвращает:
+            (ndarray, ndarray): начала и концы отсечённых отрезков
+    """
+
+    deltas = ends - starts
+    t0 = np.zeros(len(starts))
+    t1 = np.ones(len(starts))
+    valid = np.ones(len(starts), dtype = bool)
+
+    # Условия вида p * t <= q для каждой из четырёх сторон
+    for p, q in ((-deltas[:, 0], starts[:, 0]), (deltas[:, 0], width - starts[:, 0]),
+                 (-deltas[:, 1], starts[:, 1]), (deltas[:, 1], height - starts[:, 1])):
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            r = q / p
+        t0 = np.where(p < 0, np.maximum(t0, r), t0)
+        t1 = np.where(p > 0, np.minimum(t1, r), t1)
+        valid &= (p != 0) | (q >= 0)
+
+    valid &= t0 <= t1
+
+    starts, deltas, t0, t1 = starts[valid], deltas[valid], t0[valid], t1[valid]
+
+    return starts + deltas * t0[:, None], starts + deltas * t1[:, None]
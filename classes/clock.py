@@ -0,0 +1,72 @@
+import time
+
+
+class SimulationClock:
+
+    def __init__(self, step = 0.01, speed = 1.0, max_frame_time = 0.25):
+        """
+            Конструктор часов симуляции. Физика всегда продвигается шагами фиксированной длины step,
+                поэтому результат эксперимента не зависит от скорости работы компьютера.
+            Параметры:
+                step (float): длина одного шага симуляции в секундах. По умолчанию 0.01
+                speed (float): множитель скорости симуляции относительно реального времени
+                    (больше 1 - быстрее реального времени). По умолчанию 1.0
+                max_frame_time (float): наибольшее реальное время одного кадра, которое учитывается.
+                    Если кадр длился дольше (например, было открыто окно диалога), лишнее время
+                    отбрасывается. По умолчанию 0.25
+        """
+
+        self.step = step
+        self.speed = speed
+        self.max_frame_time = max_frame_time
+
+        self.reset()
+
+    def reset(self):
+        """
+            Сброс часов: симуляционное время начинается с 0.
+        """
+
+        self.sim_time = 0.0 # Прошедшее время симуляции
+        self.steps_done = 0 # Число выполненных шагов
+        self.accumulator = 0.0 # Накопленное, но ещё не просимулированное время
+        self.last_tick = time.time()
+
+    def resync(self):
+        """
+            Забыть реальное время, прошедшее с последнего кадра (например, после паузы).
+        """
+
+        self.last_tick = time.time()
+
+    def real_elapsed(self):
+        """
+            Реальное время с последнего кадра.
+        """
+
+        return time.time() - self.last_tick
+
+    def tick(self):
+        """
+            Отметить новый кадр.
+            Возвращает:
+                int: число шагов симуляции, которые нужно выполнить в этом кадре
+        """
+
+        now = time.time()
+        frame_time = min(now - self.last_tick, self.max_frame_time)
+        self.last_tick = now
+
+        self.accumulator += frame_time * self.speed
+        steps = int(self.accumulator / self.step)
+        self.accumulator -= steps * self.step
+
+        return steps
+
+    def advance(self, steps = 1):
+        """
+            Учесть выполненные шаги симуляции.
+        """
+
+        self.steps_done += steps
+        self.sim_time = self.steps_done * self.step
@@ -1,9 +1,10 @@
 import math
+import time
 
 import pygame as pg
-from pygame import Color
+from pygame import Color, Rect
 
-from classes import FlatMirror, SphericalMirror
+from classes import Mirror, FlatMirror, SphericalMirror, PolylineMirror, CausticMap, text_cache, simplify_polyline
 
 class DrawSpace:
 
@@ -38,11 +39,32 @@ class DrawSpace:
         self.light_caption_color = Color("goldenrod4")
         self.bg_color = Color("azure")
 
-        self.screen.fill(self.bg_color)
+        self.dirty_rects = [] # Изменённые за кадр области экрана
+        self.max_dirty_rects = 64 # Если областей больше, они объединяются в одну
+
+        self.scene_layers = {} # Заранее нарисованные статичные слои сцены (зеркала, цель, кнопки)
+        self.scene_version = None # Состояние сцены, по которому нарисованы слои
+
+        self.trail_surface = None # Прозрачный слой со следами лучей, дорисовывается по одному отрезку
+        self.trail_lights = [] # Лучи, следы которых нарисованы на слое
+        self.trail_counts = [] # Сколько точек отражения каждого луча уже нарисовано
+        self.trail_heads = [] # Последние нарисованные точки следов
+        self.trail_pending = [] # Ещё не нарисованные точки отражения каждого следа (ближе trail_tolerance к последней нарисованной)
+        self.trail_tolerance = 1.0 # Наибольшее отклонение упрощённого следа от настоящего в пикселях
+        self.trail_pending_limit = 64 # Сколько ненарисованных точек следа копится до их упрощения
+
+        self.caustics_enabled = False # Показывать карту плотности света вместо фона в основном режиме
+        self.caustic_layer = None # Изображение карты плотности (см. CausticMap)
+        self.caustic_version = None # Состояние сцены и источников, по которому построена карта
+        self.caustic_map = None # Строящаяся или готовая карта плотности
+        self.caustic_job = None # Генератор, достраивающий карту по частям (None, если карта готова)
+        self.caustic_budget = 0.01 # Время на достраивание карты за кадр в секундах
+
+        self.fill_background()
         for button in self.exp_mode_buttons:
-            self.screen.blit(button.up_surface, button.pos)
+            self.mark_dirty(self.screen.blit(button.up_surface, button.pos))
 
-        pg.display.flip()
+        self.present()
 
     def length(left, right):
         """
@@ -50,6 +72,170 @@ class DrawSpace:
         """
         return math.sqrt((left[0] - right[0]) ** 2 + (left[1] - right[1]) ** 2)
 
+    def mark_dirty(self, rect, surface = None):
+        """
+            Отметить область экрана rect как изменённую в текущем кадре.
+                Если рисование шло на другую поверхность surface, ничего не отмечается.
+        """
+
+        if surface is None or surface is self.screen:
+            self.dirty_rects.append(Rect(rect))
+
+    def fill_background(self):
+        """
+            Залить весь экран цветом фона. Весь экран становится изменённым.
+        """
+
+        self.mark_dirty(self.screen.fill(self.bg_color))
+
+    def present(self):
+        """
+            Вывести на дисплей все изменённые за кадр области одним вызовом pg.display.update.
+        """
+
+        if not self.dirty_rects:
+            return
+
+        rects = self.dirty_rects
+        if len(rects) > self.max_dirty_rects:
+            rects = [rects[0].unionall(rects[1:])]
+
+        pg.display.update(rects)
+        self.dirty_rects = []
+
+    def get_scene_version(self):
+        """
+            Состояние статичной части сцены: зеркала и цель.
+        """
+
+        experiment = self.experiment
+        light_destination = experiment.light_destination
+        destination = None if light_destination is None else (tuple(light_destination.pos), light_destination.radius)
+
+        return id(experiment.mirrors), len(experiment.mirrors), Mirror.generation, destination
+
+    def get_sources_version(self):
+        """
+            Состояние источников света: зеркало, положение и угол каждого.
+        """
+
+        return tuple((id(light_source.mirror), light_source.local_pos, light_source.light_direction)
+                     for light_source in self.experiment.light_sources)
+
+    def get_caustic_layer(self):
+        """
+            Изображение карты плотности света для текущих зеркал, цели и источников. Если они
+                изменились, карта начинает строиться заново: по частям, между кадрами (см. advance_caustics).
+            Возвращает:
+                Surface: изображение уже построенной части карты (None, пока не построено ничего)
+        """
+
+        version = (self.get_scene_version(), self.get_sources_version())
+        if version != self.caustic_version:
+            experiment = self.experiment
+            self.caustic_map = CausticMap(self.screen.get_size())
+            self.caustic_job = self.caustic_map.trace_sources(experiment.light_sources, experiment.mirrors,
+                                                              experiment.light_destination)
+            self.caustic_layer = None
+            self.caustic_version = version
+
+        return self.caustic_layer
+
+    def caustics_pending(self):
+        """
+            Нужно ли ещё достраивать карту плотности (карта включена, а построена не вся или не для
+                текущей сцены).
+        """
+
+        if not self.caustics_enabled or not self.experiment.light_sources:
+            return False
+
+        return self.caustic_job is not None or (self.get_scene_version(), self.get_sources_version()) != self.caustic_version
+
+    def advance_caustics(self):
+        """
+            Достроить карту плотности, потратив на это не больше caustic_budget секунд (но хотя бы
+                одну пачку лучей), и обновить её изображение. Слои сцены с картой после этого
+                рисуются заново.
+            Возвращает:
+                bool: True, если изображение карты изменилось
+        """
+
+        self.get_caustic_layer()
+        if self.caustic_job is None:
+            return False
+
+        deadline = time.perf_counter() + self.caustic_budget
+        for _ in self.caustic_job:
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            self.caustic_job = None
+
+        self.caustic_layer = self.caustic_map.render().convert(self.screen)
+        self.scene_layers = {key : layer for key, layer in self.scene_layers.items() if key[3] is None}
+
+        return True
+
+    def invalidate_scene(self):
+        """
+            Сбросить статичные слои сцены (после загрузки, очистки или изменения зеркал).
+        """
+
+        self.scene_layers = {}
+        self.scene_version = None
+
+    def get_scene_layer(self, buttons, show_corners = False, show_pos = False, caustics = False):
+        """
+            Статичный слой сцены: фон, зеркала, цель и кнопки. Рисуется один раз и перерисовывается,
+                только если изменились зеркала или цель.
+            Параметры:
+                buttons (List[Button]): рисуемые кнопки
+                show_corners (bool): выделять края зеркал
+                show_pos (bool): показывать параметры цели
+                caustics (bool): фон - карта плотности света из источников (см. get_caustic_layer);
+                    без источников или пока карта не начала строиться фон обычный
+            Возвращает:
+                Surface: слой размером с экран
+        """
+
+        caustics = caustics and bool(self.experiment.light_sources)
+
+        version = self.get_scene_version()
+        if version != self.scene_version:
+            self.invalidate_scene()
+            self.scene_version = version
+
+        # Карта плотности зависит ещё и от источников
+        key = (tuple(id(button) for button in buttons), show_corners, show_pos, self.get_sources_version() if caustics else None)
+        layer = self.scene_layers.get(key)
+
+        if layer is None:
+            layer = pg.Surface(self.screen.get_size()).convert(self.screen)
+            caustic_layer = self.get_caustic_layer() if caustics else None
+            # Пока карта не начала строиться, фон обычный
+            if caustic_layer is not None:
+                layer.blit(caustic_layer, (0, 0))
+            else:
+                layer.fill(self.bg_color)
+            self.draw_mirrors(show_corners = show_corners, surface = layer)
+            self.draw_light_destination(show_pos = show_pos, surface = layer)
+            self.draw_buttons(buttons, surface = layer)
+            self.scene_layers[key] = layer
+
+        return layer
+
+    def draw_scene(self, buttons, show_corners = False, show_pos = False, turn_up = False, caustics = False):
+        """
+            Вывод статичного слоя сцены на экран. Кнопки поднимаются, если turn_up = True
+        """
+
+        self.mark_dirty(self.screen.blit(self.get_scene_layer(buttons, show_corners, show_pos, caustics), (0, 0)))
+
+        if turn_up:
+            for button in buttons:
+                button.is_up = True
+
     def draw_everything(self, buttons, is_highlighted = True):
         """
             "Нарисуй всё": отрисовка всех частей программы. 
@@ -58,24 +244,21 @@ class DrawSpace:
                 is_highlighted (bool): Рисовать ли отладочную информацию о конфигурации зеркал
         """
 
-        self.screen.fill(self.bg_color)
+        self.draw_scene(buttons, show_corners = True, show_pos = True)
 
-        self.draw_buttons(buttons)
-        self.draw_mirrors(show_corners = True)
         if is_highlighted:
             self.draw_highlights()
         self.draw_light_source(light_radius = 10, view_direction = True)
-        self.draw_light_destination(show_pos = True)
-
-        pg.display.flip()
 
-    def draw_buttons(self, buttons, turn_up = False):
+    def draw_buttons(self, buttons, turn_up = False, surface = None):
         """
-            Рисование кнопок buttons и поднять их, если turn_up = True
+            Рисование кнопок buttons (на экране или на поверхности surface) и поднять их, если turn_up = True
         """
 
+        screen = self.screen if surface is None else surface
+
         for button in buttons:
-            self.screen.blit(button.up_surface, button.pos)
+            self.mark_dirty(screen.blit(button.up_surface, button.pos), surface)
             if turn_up:
                 button.is_up = True
 
@@ -85,15 +268,16 @@ class DrawSpace:
         """
         for button in buttons:
             if not button.is_up:
-                self.screen.blit(button.up_surface, button.pos)
-                pg.display.flip()
+                self.mark_dirty(self.screen.blit(button.up_surface, button.pos))
                 button.is_up = True
 
-    def draw_mirrors(self, show_corners = False):
+    def draw_mirrors(self, show_corners = False, surface = None):
         """
-            Рисование зеркал. Если show_corners = True, выделяет края
+            Рисование зеркал (на экране или на поверхности surface). Если show_corners = True, выделяет края
         """
 
+        screen = self.screen if surface is None else surface
+
         if show_corners:
             corner_point_radius = 12
 
@@ -109,19 +293,26 @@ class DrawSpace:
                 left_base_end = mirror.left_base_end
                 right_base_end = mirror.right_base_end
 
-                pg.draw.polygon(self.screen, self.wood_color, [left_corner, right_corner, right_base_end, left_base_end])
-                pg.draw.polygon(self.screen, self.mirror_color, [left_corner, right_corner, right_mirror_end, left_mirror_end])
+                self.mark_dirty(pg.draw.polygon(screen, self.wood_color, [left_corner, right_corner, right_base_end, left_base_end]), surface)
+                pg.draw.polygon(screen, self.mirror_color, [left_corner, right_corner, right_mirror_end, left_mirror_end])
                 if show_corners:
-                    pg.draw.circle(self.screen, self.wood_color, left_corner, corner_point_radius)
+                    self.mark_dirty(pg.draw.circle(screen, self.wood_color, left_corner, corner_point_radius), surface)
 
             if isinstance(mirror, SphericalMirror):
 
                 arc_width = 5
                 mirror_rect = mirror.spherical_rect
 
-                pg.draw.arc(self.screen, self.mirror_color, mirror_rect, mirror.start_angle, mirror.stop_angle, width = arc_width)
+                self.mark_dirty(pg.draw.arc(screen, self.mirror_color, mirror_rect, mirror.start_angle, mirror.stop_angle, width = arc_width), surface)
                 if show_corners:
-                    pg.draw.circle(self.screen, self.wood_color, left_corner, corner_point_radius)
+                    self.mark_dirty(pg.draw.circle(screen, self.wood_color, left_corner, corner_point_radius), surface)
+
+            if isinstance(mirror, PolylineMirror):
+
+                self.mark_dirty(pg.draw.polygon(screen, self.wood_color, mirror.get_outline()), surface)
+                pg.draw.polygon(screen, self.mirror_color, mirror.get_outline(mirror.mirror_width))
+                if show_corners:
+                    self.mark_dirty(pg.draw.circle(screen, self.wood_color, left_corner, corner_point_radius), surface)
 
     def draw_highlights(self):
         """
@@ -133,9 +324,8 @@ class DrawSpace:
         left_corner = mirror.left_corner
         right_corner = mirror.right_corner
 
-        font = pg.font.Font(None, 40)
-        left_point_text = font.render("Left: " + str(left_corner), True, self.caption_color)
-        right_point_text = font.render("Right: " + str(right_corner), True, self.caption_color)
+        left_point_text = text_cache.render("Left: " + str(left_corner), self.caption_color, 40)
+        right_point_text = text_cache.render("Right: " + str(right_corner), self.caption_color, 40)
         left_point_pos_x, left_point_pos_y = (left_corner[0] - 100, left_corner[1] - 50)
         right_point_pos_x, right_point_pos_y = (right_corner[0] - 100, right_corner[1] - 50)
 
@@ -162,43 +352,44 @@ class DrawSpace:
         left_point_pos = (left_point_pos_x, left_point_pos_y)
         right_point_pos = (right_point_pos_x, right_point_pos_y)
 
-        self.screen.blit(left_point_text, left_point_pos)
-        self.screen.blit(right_point_text, right_point_pos)
+        self.mark_dirty(self.screen.blit(left_point_text, left_point_pos))
+        self.mark_dirty(self.screen.blit(right_point_text, right_point_pos))
 
-        if self.experiment.light_source is not None and self.experiment.light_source.mirror is mirror:
-            light_point_text = font.render("Light source: " + str(self.experiment.light_source.get_absolute_pos()), True, self.light_caption_color)
-            light_angle_text = font.render("Angle: " + str(self.experiment.light_source.light_direction), True, self.light_caption_color)
-            apx, apy = self.experiment.light_source.get_absolute_pos()
+        for light_source in self.experiment.light_sources:
+            if light_source.mirror is not mirror:
+                continue
+            light_point_text = text_cache.render("Light source: " + str(light_source.get_absolute_pos()), self.light_caption_color, 40)
+            light_angle_text = text_cache.render("Angle: " + str(light_source.light_direction), self.light_caption_color, 40)
+            apx, apy = light_source.get_absolute_pos()
             light_point_pos = (apx, apy + 50)
             light_angle_pos = (apx, apy + 75)
-            self.screen.blit(light_point_text, light_point_pos)
-            self.screen.blit(light_angle_text, light_angle_pos)
+            self.mark_dirty(self.screen.blit(light_point_text, light_point_pos))
+            self.mark_dirty(self.screen.blit(light_angle_text, light_angle_pos))
                 
     
     def draw_light_source(self, light_radius = 4, view_direction = False):
         """
-            Рисование источника света с радиусом в light_radius в отладочном режиме. 
+            Рисование источников света с радиусом в light_radius в отладочном режиме. 
                 view_direction позволяет указать направление выходящего луча света. 
         """
-        light_source = self.experiment.light_source
-        if light_source is None:
-            return
 
-        lspos = light_source.get_absolute_pos()
-        
-        pg.draw.circle(self.screen, self.light_color, lspos, light_radius)
-        if view_direction:
-            dirvec = light_source.get_direction_vec()
-            line_end = (dirvec[0] * 50 + lspos[0], dirvec[1] * 50 + lspos[1])
-            pg.draw.line(self.screen, self.light_color, lspos, line_end, 5)
+        for light_source in self.experiment.light_sources:
 
-        pg.display.flip()
+            lspos = light_source.get_absolute_pos()
+            
+            self.mark_dirty(pg.draw.circle(self.screen, self.light_color, lspos, light_radius))
+            if view_direction:
+                dirvec = light_source.get_direction_vec()
+                line_end = (dirvec[0] * 50 + lspos[0], dirvec[1] * 50 + lspos[1])
+                self.mark_dirty(pg.draw.line(self.screen, self.light_color, lspos, line_end, 5))
 
-    def draw_light_destination(self, show_pos = False):
+    def draw_light_destination(self, show_pos = False, surface = None):
         """
-            Рисование цели света. Если show_pos = True, показывает координаты и радиус цели.
+            Рисование цели света (на экране или на поверхности surface). Если show_pos = True, показывает координаты и радиус цели.
         """
 
+        screen = self.screen if surface is None else surface
+
         light_destination = self.experiment.light_destination
         if light_destination is None:
             return
@@ -206,31 +397,127 @@ class DrawSpace:
         ldpos = light_destination.pos 
         radius = light_destination.radius
         
-        pg.draw.circle(self.screen, self.dest_color, ldpos, radius)
+        self.mark_dirty(pg.draw.circle(screen, self.dest_color, ldpos, radius), surface)
 
         if show_pos:
 
-            font = pg.font.Font(None, 40)
-            pos_point_text = font.render("Pos: " + str(ldpos), True, self.dest_color)
-            radius_point_text = font.render("Radius: " + str(radius), True, self.dest_color)
+            pos_point_text = text_cache.render("Pos: " + str(ldpos), self.dest_color, 40)
+            radius_point_text = text_cache.render("Radius: " + str(radius), self.dest_color, 40)
 
-        pg.display.flip()
+    def reset_trail(self, lights):
+        """
+            Начать новые следы для лучей lights.
+        """
+
+        if self.trail_surface is None:
+            self.trail_surface = pg.Surface(self.screen.get_size(), pg.SRCALPHA).convert_alpha()
+        self.trail_surface.fill((0, 0, 0, 0))
+
+        self.trail_lights = list(lights)
+        # След начинается с самой старой из хранимых точек
+        self.trail_counts = [light.reflection_points.total - len(light.reflection_points) + 1 for light in lights]
+        self.trail_heads = [light.reflection_points[0] for light in lights]
+        self.trail_pending = [[] for _ in lights]
 
     def draw_light(self):
         """
-            Отрисовка луча света (его ломаной линии).
+            Отрисовка лучей света (их ломаных линий) за один проход по общему слою следов. На слой
+                дорисовываются только отрезки, пройденные с прошлого кадра, поэтому время кадра
+                не растёт с числом отражений. Новые отрезки перед рисованием упрощаются (см. simplify_polyline)
+                вместе с ещё не нарисованными точками прошлых кадров: пока луч не отошёл от последней
+                нарисованной вершины дальше trail_tolerance, его точки копятся и ничего не рисуется.
         """
 
-        if self.experiment.light is None:
+        lights = self.experiment.lights
+        if not lights:
             return
 
-        points = [self.experiment.light_source.get_absolute_pos()] + self.experiment.light.reflection_points
+        if len(lights) != len(self.trail_lights) or any(light is not trail_light for light, trail_light in zip(lights, self.trail_lights)):
+            self.reset_trail(lights)
+
+        for idx, light in enumerate(lights):
 
-        for prev_point, next_point in zip(points, points[1:] + [self.experiment.light.current_point]):
-            pg.draw.line(self.screen, self.light_color, prev_point, next_point, 5)
+            trail_head = self.trail_heads[idx]
+            pending = self.trail_pending[idx]
+            pending.extend(light.reflection_points.since(self.trail_counts[idx]))
+            self.trail_counts[idx] = light.reflection_points.total
 
-        pg.display.flip()
+            # Точки, отклоняющиеся от ломаной меньше чем на trail_tolerance пикселей, не рисуются
+            new_points = simplify_polyline([trail_head] + pending + [light.current_point], self.trail_tolerance)
 
+            # Луч почти не сдвинулся от последней нарисованной вершины: точки ждут следующего кадра.
+            # Если их накопилось много (луч бьётся в одном пикселе), хвост упрощается сам по себе,
+            # без текущей точки луча, поэтому его последняя вершина не теряется
+            if len(new_points) == 2 and math.dist(trail_head, light.current_point) < self.trail_tolerance:
+                if len(pending) > self.trail_pending_limit:
+                    pending[:] = simplify_polyline([trail_head] + pending, self.trail_tolerance)[1:]
+                continue
+            pending.clear()
+
+            for next_point in new_points[1:]:
+                rect = pg.draw.line(self.trail_surface, self.light_color, trail_head, next_point, 5)
+                self.mark_dirty(self.screen.blit(self.trail_surface, rect, rect))
+                trail_head = next_point
+            self.trail_heads[idx] = trail_head
+
+    def draw_trace_info(self, trace_results):
+        """
+            Рисование итогов заранее рассчитанных путей: числа отражений и времени до цели,
+                по строке на источник.
+        """
+
+        for idx, trace_result in enumerate(trace_results):
+
+            if trace_result.is_achieved():
+                text = f"Отражений: {trace_result.bounces}. Время до цели: {trace_result.get_time():.1f} с"
+            elif trace_result.status == "periodic":
+                text = f"Цель не будет достигнута: замкнутая траектория из {trace_result.period} отражений"
+            else:
+                text = f"Цель не будет достигнута. Отражений: {trace_result.bounces}"
+            if len(trace_results) > 1:
+                text = f"Источник {idx + 1}. " + text
+
+            info_text = text_cache.render(text, self.caption_color, 32, self.bg_color)
+            self.mark_dirty(self.screen.blit(info_text, (self.screen.get_width() / 2 - info_text.get_width() / 2, 30 + 30 * idx)))
+
+    def draw_profile_hud(self, profiler):
+        """
+            Рисование замеров профилировщика (см. FrameProfiler) панелью внизу экрана: по строке на
+                кадр целиком и на каждую фазу - среднее, 95-й перцентиль и максимум в миллисекундах
+                и гистограмма за последние кадры.
+        """
+
+        names = {"total" : "кадр", "events" : "события", "physics" : "физика", "draw" : "рисование",
+                 "present" : "вывод", "wait" : "ожидание"}
+        lines = profiler.hud_lines
+        if not lines:
+            return
+
+        line_height = 18
+        columns = (10, 110, 190, 270) # Начала столбцов: название, среднее, p95, максимум
+        bar_x, bar_width, bar_gap = 360, 8, 2
+        width = bar_x + len(lines[0][4]) * (bar_width + bar_gap) + 10
+        height = line_height * (len(lines) + 1) + 10
+
+        panel = Rect(self.screen.get_width() / 2 - width / 2, self.screen.get_height() - height - 10, width, height)
+        self.mark_dirty(self.screen.fill(self.bg_color, panel))
+
+        header = ("фаза", "ср., мс", "p95, мс", "макс., мс")
+        for column, text in zip(columns, header):
+            self.screen.blit(text_cache.render(text, self.caption_color, 20), (panel.x + column, panel.y + 5))
+
+        for row, (phase, mean, p95, peak, histogram) in enumerate(lines, start = 1):
+            y = panel.y + 5 + row * line_height
+            for column, text in zip(columns, (names[phase], f"{mean:.2f}", f"{p95:.2f}", f"{peak:.2f}")):
+                self.screen.blit(text_cache.render(text, self.caption_color, 20), (panel.x + column, y))
+
+            # Столбцы гистограммы: высота пропорциональна доле кадров в корзине
+            total = max(sum(histogram), 1)
+            for idx, count in enumerate(histogram):
+                bar_height = round((line_height - 4) * count / total)
+                if bar_height > 0:
+                    pg.draw.rect(self.screen, self.light_caption_color,
+                                 (panel.x + bar_x + idx * (bar_width + bar_gap), y + line_height - 4 - bar_height, bar_width, bar_height))
 
     def is_point_in_polygon(self, point, polygon):
         """
@@ -255,9 +542,7 @@ class DrawSpace:
         """
 
         for prev_pos, next_pos in zip(global_mirror_poses, global_mirror_poses[1:]):
-            pg.draw.line(self.screen, self.mirror_color, prev_pos, next_pos, width = 10)
-
-        pg.display.flip()
+            self.mark_dirty(pg.draw.line(self.screen, self.mirror_color, prev_pos, next_pos, width = 10))
 
         if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
 
@@ -267,8 +552,7 @@ class DrawSpace:
 
             first_x, first_y = global_mirror_poses[0]
             if abs(first_x - mouse_x) < 20 and abs(first_y - mouse_y) < 20:
-                pg.draw.line(self.screen, self.mirror_color, global_mirror_poses[0], global_mirror_poses[-1], width = 10)
-                pg.display.flip()
+                self.mark_dirty(pg.draw.line(self.screen, self.mirror_color, global_mirror_poses[0], global_mirror_poses[-1], width = 10))
                 draw_mode = False
             else:
                 if self.has_collision(global_mirror_poses[:-1], global_mirror_poses[-1], event.pos):
@@ -282,8 +566,7 @@ class DrawSpace:
 
             mouse_x, mouse_y = event.pos
 
-            pg.draw.line(self.screen, self.mirror_color, global_mirror_poses[-1], event.pos, width = 10)
-            pg.display.flip()
+            self.mark_dirty(pg.draw.line(self.screen, self.mirror_color, global_mirror_poses[-1], event.pos, width = 10))
 
         return draw_mode
 
@@ -291,13 +574,9 @@ class DrawSpace:
         """
             Обновление режима настроек.
         """
-        self.screen.fill(self.bg_color)
-        for button in buttons:
-            self.screen.blit(button.up_surface, button.pos)
+        self.draw_scene(buttons)
         for prev_pos, next_pos in zip(mirror_poses, mirror_poses[1:]):
             pg.draw.line(self.screen, self.mirror_color, prev_pos, next_pos, width = 10)
-        self.draw_light_destination()
-        pg.display.flip()
 
     def ccw(self, pos1, pos2, pos3):
         return (pos3[1] - pos1[1]) * (pos2[0] - pos1[0]) > (pos2[1] - pos1[1]) * (pos3[0] - pos1[0])
@@ -1,32 +1,69 @@
 import easygui
 import os
-import pickle
-import time
+from contextlib import nullcontext
 
 import pygame as pg
 
-from classes import Light, LightSource, FlatMirror, SphericalMirror
+from classes import Light, LightSource, FlatMirror, SphericalMirror, PolylineMirror, Tracer, Trajectory, SimulationClock, MirrorGrid, \
+    FrameScheduler, MAX_MOMENTUM, read_scene, write_scene, ReflectionWriter, TRAIL_POINTS
 
 
 class Experiment:
 
-    def __init__(self, light = None, mirrors = [], light_source = None, light_destination = None):
+    def __init__(self, light = None, mirrors = [], light_source = None, light_destination = None, exact_tracing = True, 
+            clock = None, scheduler = None, trail_points = TRAIL_POINTS, reflection_log = None, light_sources = None,
+            success_mode = "any", profiler = None):
         """
-            Конструктор класса Эксперимент. Содержит все его параметры: зеркала, источник света,
-                цель луча света, сам луч света. 
+            Конструктор класса Эксперимент. Содержит все его параметры: зеркала, источники света,
+                цель луча света, сами лучи света. 
             Параметры:
                 light (Light): луч света. По умолчанию None
                 mirrors (List[Mirror]): список всех зеркал эксперимента. По умолчанию []
-                light_source (LightSource): источник света. По умолчанию None
+                light_source (LightSource): источник света, если он один. По умолчанию None
                 light_destination (LightDestination): цель света. По умолчанию None
+                exact_tracing (bool): рассчитывать весь путь луча заранее точным трассировщиком (Tracer)
+                    и только проигрывать его, вместо проверки касания на каждом шаге. По умолчанию True
+                clock (SimulationClock): часы симуляции с фиксированным шагом и множителем скорости.
+                    По умолчанию SimulationClock()
+                scheduler (FrameScheduler): планировщик кадров отрисовки. По умолчанию FrameScheduler()
+                trail_points (int): сколько последних точек отражения луча хранить в памяти. По умолчанию TRAIL_POINTS
+                reflection_log (str): CSV-файл, куда по ходу эксперимента пишутся все отражения
+                    (см. ReflectionWriter). По умолчанию не пишутся
+                light_sources (List[LightSource]): источники света, лучи из которых движутся одновременно.
+                    По умолчанию [light_source]
+                success_mode (str): условие успеха при нескольких источниках: "any" - цели достиг хотя бы
+                    один луч, "all" - все лучи. По умолчанию "any"
+                profiler (FrameProfiler): покадровые замеры фаз главного цикла. По умолчанию не ведутся
         """
 
-        self.light = light
+        self.lights = [light] if light is not None else [] # Лучи запущенного эксперимента, по одному на источник
         self.mirrors = mirrors
-        self.light_source = light_source
+        if light_sources is None:
+            light_sources = [light_source] if light_source is not None else []
+        self.light_sources = light_sources
+        self.success_mode = success_mode
         self.light_destination = light_destination
         self.settings_mode = False # Режим настроек и изменения параметров
         self.advancing = False # Режим запущенного эксперимента (движения луча света)
+        self.exact_tracing = exact_tracing
+        self.trace_results = [] # Заранее рассчитанные пути лучей запущенного эксперимента
+        self.light_statuses = [] # Итоги лучей запущенного эксперимента (None, пока луч движется)
+        self.max_bounces = 10000 # Наибольшее число отражений при расчёте пути
+        self.clock = clock if clock is not None else SimulationClock()
+        self.scheduler = scheduler if scheduler is not None else FrameScheduler()
+        self.mirror_index = None # Пространственный индекс зеркал, см. get_mirror_index
+        self.trail_points = trail_points
+        self.reflection_log = reflection_log
+        self.reflection_writer = None # Открытая запись отражений запущенного эксперимента
+        self.profiler = profiler
+
+    @property
+    def light_source(self):
+        """
+            Первый источник света или None, если источников нет.
+        """
+
+        return self.light_sources[0] if self.light_sources else None
 
     def turn_settings(self):
         """
@@ -37,19 +74,70 @@ class Experiment:
 
     def start(self):
         """
-            Начало эксперимента, создание света.
+            Начало эксперимента, создание света из всех источников. Без источников эксперимент не запускается.
         """
 
-        self.light = Light(self.light_source)
+        if not self.light_sources:
+            self.lights = []
+            self.light_statuses = []
+            return
+
+        self.close_reflection_log()
+        if self.reflection_log is not None:
+            self.reflection_writer = ReflectionWriter(self.reflection_log)
+
+        if self.exact_tracing:
+            self.trace_results = self.trace_all(self.max_bounces)
+            trajectories = [Trajectory.from_trace(result) for result in self.trace_results]
+        else:
+            self.trace_results = []
+            trajectories = [None] * len(self.light_sources)
+
+        self.lights = [Light(light_source, trajectory, self.trail_points, self.reflection_writer, idx)
+                       for idx, (light_source, trajectory) in enumerate(zip(self.light_sources, trajectories))]
+        self.light_statuses = [None] * len(self.lights)
+        self.clock.reset()
         self.resume()
 
+    def close_reflection_log(self):
+        """
+            Закрыть запись отражений, если она открыта.
+        """
+
+        if self.reflection_writer is not None:
+            self.reflection_writer.close()
+            self.reflection_writer = None
+
+    def trace(self, max_bounces = 1000, max_momentum = MAX_MOMENTUM):
+        """
+            Точная трассировка эксперимента без окна и анимации (для первого источника).
+            Параметры:
+                max_bounces (int): максимальное число отражений. По умолчанию 1000
+                max_momentum (float): максимальный момент света. По умолчанию MAX_MOMENTUM
+            Возвращает:
+                TraceResult: путь луча и итог эксперимента
+        """
+
+        tracer = Tracer(self.mirrors, self.light_destination, self.get_mirror_index())
+        return tracer.trace(self.light_source, max_bounces, max_momentum)
+
+    def trace_all(self, max_bounces = 1000, max_momentum = MAX_MOMENTUM):
+        """
+            Точная трассировка лучей всех источников. Пространственный индекс зеркал общий,
+                поэтому строится один раз на все лучи.
+            Возвращает:
+                List[TraceResult]: пути лучей в порядке источников
+        """
+
+        tracer = Tracer(self.mirrors, self.light_destination, self.get_mirror_index())
+        return [tracer.trace(light_source, max_bounces, max_momentum) for light_source in self.light_sources]
+
     def run(self, window):
         """
             Запуск программы.
         """
 
         self.running = True # Режим работы программы, завершается, если это значение = False
-        self.curr_time = time.time()
         self.global_mirror_poses = [] # Позиции всех зеркал эксперимента в пространстве
         self.highlighted = None # Для режима настроек: выделенное зеркало
         self.is_highlighted = False # Флаг выделенного зеркала
@@ -57,11 +145,29 @@ class Experiment:
 
         while self.running:
 
+            if self.profiler is not None:
+                self.profiler.begin_frame()
+
             if self.settings_mode: 
                 self.settings(window) # Режим настроек
             else:
                 self.exp_mode(window) # Основной режим программы
 
+            if self.profiler is not None:
+                self.profiler.end_frame()
+
+        # Окно могли закрыть посреди запуска: журнал отражений дописывается и закрывается
+        self.close_reflection_log()
+        if self.profiler is not None:
+            self.profiler.close()
+
+    def measure(self, phase):
+        """
+            Замер фазы кадра phase профилировщиком (для with); без профилировщика ничего не замеряется.
+        """
+
+        return self.profiler.measure(phase) if self.profiler is not None else nullcontext()
+
     def exp_mode(self, window):
         """
             Основной режим программы. Здесь расположено меню загрузки, сохранения,
@@ -75,7 +181,14 @@ class Experiment:
 
         if not self.advancing: # Если эксперимент не запущен, следить за использованием кнопок
 
-            for event in pg.event.get():
+            # Пока карта плотности достраивается, кадры идут и без событий (частоту кадров
+            # wait_events выдерживает сам, поэтому события ждутся лишь миллисекунду)
+            building = drawspace.caustics_pending()
+            events = self.scheduler.wait_events(0.001 if building else None)
+            if building and drawspace.advance_caustics() and not events:
+                events = [pg.event.Event(pg.NOEVENT)]
+
+            for event in events:
 
                 has_event = True
 
@@ -83,19 +196,17 @@ class Experiment:
                     self.running = False
                     break
 
-                drawspace.draw_mirrors()
+                drawspace.draw_scene(window.exp_mode_buttons, turn_up = True, caustics = drawspace.caustics_enabled)
                 drawspace.draw_light_source()
-                drawspace.draw_light_destination()
 
-                if self.light_source is not None and self.light_destination is not None:
-                    self.ready = True
+                # Источник могли удалить, поэтому готовность проверяется заново
+                self.ready = self.light_source is not None and self.light_destination is not None
 
-                drawspace.draw_buttons(window.exp_mode_buttons, True)
                 if not self.ready:
                     window.start_button.is_up = False
-                    screen.blit(window.start_button.down_surface, window.start_button.pos)
+                    drawspace.mark_dirty(screen.blit(window.start_button.down_surface, window.start_button.pos))
 
-                pg.display.flip()
+                drawspace.present()
 
                 if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
                     
@@ -108,22 +219,26 @@ class Experiment:
                                 mouse_y >= button_y and mouse_y <= button_y + this_button_height:
 
                             if button.is_up:
-                                screen.blit(button.down_surface, button.pos)
-                                pg.display.flip()
+                                drawspace.mark_dirty(screen.blit(button.down_surface, button.pos))
+                                drawspace.present()
                                 button.is_up = False
 
                                 button.action() 
 
         # Если событий не было, но есть свет, продолжить выполнение эксперимента
-        if not has_event and self.light is not None:
+        if not has_event and self.lights:
 
             if not window.quit_button.is_up:
-                screen.blit(window.quit_button.up_surface, window.quit_button.pos)
+                drawspace.mark_dirty(screen.blit(window.quit_button.up_surface, window.quit_button.pos))
                 window.quit_button.is_up = True
 
-            pg.display.flip()
+            with self.measure("present"):
+                drawspace.present()
 
-            for event in pg.event.get():
+            with self.measure("events"):
+                events = pg.event.get()
+
+            for event in events:
                 if event.type == pg.QUIT:
                     self.running = False
                     self.pause()
@@ -136,8 +251,7 @@ class Experiment:
 
                 for button in [b for b in window.exp_mode_buttons if b is not window.quit_button]:
                     if button.is_up:
-                        window.screen.blit(button.down_surface, button.pos)
-                        pg.display.flip()
+                        drawspace.mark_dirty(window.screen.blit(button.down_surface, button.pos))
                         button.is_up = False
                 self.running = self.run_exp(window) # Запуск самого эксперимента
 
@@ -149,7 +263,7 @@ class Experiment:
 
         drawspace = window.drawspace
 
-        for event in pg.event.get():
+        for event in self.scheduler.wait_events():
             if event.type == pg.QUIT:
                 self.running = False
 
@@ -171,6 +285,7 @@ class Experiment:
                 else:
                     drawspace.update_buttons(window.no_source_buttons)
                     drawspace.draw_everything(window.no_source_buttons, self.is_highlighted)
+                drawspace.present()
 
                 self.is_highlighted = False
                 self.highlighted = None
@@ -190,7 +305,8 @@ class Experiment:
 
                         new_mirror = None
 
-                        for mirror in self.mirrors:
+                        # Кандидаты под курсором из пространственного индекса
+                        for mirror in self.get_mirror_index().query_point(event.pos):
 
                             if isinstance(mirror, FlatMirror):
                                 
@@ -206,8 +322,7 @@ class Experiment:
                                     # Если нажали правой кнопкой, открыть окно изменения типа зеркала
                                     if event.type == pg.MOUSEBUTTONDOWN and event.button == 3:
                                         new_mirror = window.edit_mirror_type(mirror)
-                                        if self.light_source is not None and self.light_source.mirror is mirror:
-                                            self.light_source.mirror = new_mirror
+                                        self.move_light_sources(mirror, new_mirror)
 
                             elif isinstance(mirror, SphericalMirror):
                                 
@@ -220,8 +335,18 @@ class Experiment:
                                         window.edit_mirror(event.type == pg.MOUSEBUTTONDOWN, mirror)
                                     if event.type == pg.MOUSEBUTTONDOWN and event.button == 3:
                                         new_mirror = window.edit_mirror_type(mirror)
-                                        if self.light_source is not None and self.light_source.mirror is mirror:
-                                            self.light_source.mirror = new_mirror
+                                        self.move_light_sources(mirror, new_mirror)
+
+                            elif isinstance(mirror, PolylineMirror):
+
+                                if mirror.contains_point(event.pos):
+                                    self.is_highlighted = True
+                                    self.highlighted = mirror
+                                    if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
+                                        window.edit_mirror(event.type == pg.MOUSEBUTTONDOWN, mirror)
+                                    if event.type == pg.MOUSEBUTTONDOWN and event.button == 3:
+                                        new_mirror = window.edit_mirror_type(mirror)
+                                        self.move_light_sources(mirror, new_mirror)
 
                         if new_mirror is not None:
                             self.mirrors[self.mirrors.index(self.highlighted)] = new_mirror
@@ -231,12 +356,41 @@ class Experiment:
 
                             window.edit_destination(event.pos)
 
+            drawspace.present()
+
+    def get_mirror_index(self):
+        """
+            Пространственный индекс зеркал. Перестраивается, если зеркала были добавлены, заменены
+                или пересчитаны (recalculate_points) с момента последнего построения.
+            Возвращает:
+                MirrorGrid: сетка над текущими зеркалами
+        """
+
+        if self.mirror_index is None or not self.mirror_index.is_valid(self.mirrors):
+            self.mirror_index = MirrorGrid(self.mirrors)
+
+        return self.mirror_index
+
     def add_light_source(self, mirror):
         """
-            Создать источник света на заданном зеркале mirror.
+            Добавить источник света на заданном зеркале mirror.
+            Возвращает:
+                LightSource: новый источник
+        """
+
+        light_source = LightSource(mirror)
+        self.light_sources.append(light_source)
+
+        return light_source
+
+    def move_light_sources(self, mirror, new_mirror):
+        """
+            Перенести все источники с зеркала mirror на зеркало new_mirror (после замены зеркала).
         """
 
-        self.light_source = LightSource(mirror)
+        for light_source in self.light_sources:
+            if light_source.mirror is mirror:
+                light_source.mirror = new_mirror
 
     def draw_mode(self, window, start_pos, drawspace):
         """
@@ -252,12 +406,7 @@ class Experiment:
 
         while draw_mode:
 
-            while time.time() - self.curr_time < 0.02:
-                pass
-
-            self.curr_time = time.time()
-
-            for event in pg.event.get():
+            for event in self.scheduler.wait_events():
 
                 if event.type == pg.QUIT:
                     draw_mode = False
@@ -266,6 +415,7 @@ class Experiment:
 
                 # Рисовать зеркала, пока строится многоугольник. Остановиться, когда замкнули
                 draw_mode = drawspace.draw_settling_mirrors(draw_mode, self.global_mirror_poses, event, window.settings_mode_buttons)
+                drawspace.present()
 
         # По умолчанию конфигурация формируется из плоских зеркал
         for prev_pos, next_pos in zip(self.global_mirror_poses, self.global_mirror_poses[1:] + [self.global_mirror_poses[0]]):
@@ -277,32 +427,124 @@ class Experiment:
 
     def run_exp(self, window):
         """
-            Запущенный эксперимент. При достижении лучом света цели, выскакивает окно с успехом 
-                и завершает программу. Если по истечении длительного времени цель не достигнута,
+            Запущенный эксперимент. Все лучи движутся одновременно. При успехе (см. success_mode)
+                выскакивает окно с успехом и завершает программу. Если цель не будет достигнута,
                 программа завершается с ошибкой.
         """
 
         drawspace = window.drawspace
 
-        drawspace.draw_light()
+        with self.measure("draw"):
+            drawspace.draw_light()
+            if self.trace_results:
+                drawspace.draw_trace_info(self.trace_results)
+            if self.profiler is not None and self.profiler.hud:
+                drawspace.draw_profile_hud(self.profiler)
+        with self.measure("present"):
+            drawspace.present()
+
+        # Отрисовка идёт с частотой кадров планировщика, физика - шагами часов симуляции
+        with self.measure("wait"):
+            self.scheduler.wait_frame()
+
+        for _ in range(self.clock.tick()):
+
+            with self.measure("physics"):
+                status = self.step_light(drawspace)
+            if status is None:
+                continue
+            self.close_reflection_log()
+
+            if status == "achieved":
+                easygui.msgbox(msg = "Успех! Свет достиг требуемой зоны. Завершаем программу.", title = "Успех!")
+                return False
+
+            # При нескольких источниках сообщается, какой луч не достиг цели
+            idx = self.light_statuses.index(status)
+            light = "Свет" if len(self.lights) == 1 else f"Свет источника {idx + 1}"
+
+            if status == "exhausted":
+                easygui.msgbox(msg = f"Ошибка: {light} движется слишком долго. Завершаем программу.", title = "Ошибка")
+            elif status == "escaped":
+                easygui.msgbox(msg = f"Ошибка: {light} покинул конфигурацию зеркал. Завершаем программу.", title = "Ошибка")
+            elif status == "periodic":
+                trace_result = self.trace_results[idx]
+                mirrors = ", ".join(str(mirror_idx) for mirror_idx in trace_result.orbit_mirrors)
+                easygui.msgbox(msg = f"Ошибка: {light} движется по замкнутой траектории из {trace_result.period} отражений "
+                                     f"(зеркала {mirrors}) и не достигнет цели. Завершаем программу.", title = "Ошибка")
+            return False
+        return True
 
-        while time.time() - self.light.last_tick < 0.01:
-            pass
+    def step_light(self, drawspace):
+        """
+            Один шаг симуляции фиксированной длины clock.step для всех ещё движущихся лучей.
+                Проверки касания идут по общему пространственному индексу зеркал.
+            Параметры:
+                drawspace (DrawSpace): рисовальщик (нужен для проверки касания без трассировщика)
+            Возвращает:
+                str: итог эксперимента (см. get_status) или None, если он ещё не ясен
+        """
 
-        self.light.advance()
+        mirror_index = self.get_mirror_index()
 
-        if self.light_destination.is_achieved(self.light):
-            easygui.msgbox(msg = "Успех! Свет достиг требуемой зоны. Завершаем программу.", title = "Успех!")
-            return False
-        if self.light.momentum > 10000:
-            easygui.msgbox(msg = "Ошибка: Свет движется слишком долго. Завершаем программу.", title = "Ошибка")
-            return False
-        mirror = self.light.is_clashed(self.mirrors, drawspace)
+        for idx, light in enumerate(self.lights):
+            if self.light_statuses[idx] is None:
+                self.light_statuses[idx] = self.step_single_light(light, idx, drawspace, mirror_index)
+        self.clock.advance()
+
+        return self.get_status()
+
+    def step_single_light(self, light, idx, drawspace, mirror_index = None):
+        """
+            Один шаг симуляции луча light из источника idx.
+            Возвращает:
+                str: "achieved", если свет достиг цели; "exhausted", если свет движется слишком долго;
+                    "escaped", если свет покинул конфигурацию; "periodic", если свет попал в замкнутую
+                    траекторию; иначе None
+        """
+
+        reached = light.advance(self.clock.step)
+
+        if reached or self.light_destination.is_achieved(light):
+            return "achieved"
+        if light.momentum > MAX_MOMENTUM:
+            return "exhausted"
+        if light.trajectory is not None: # Отражения уже рассчитаны заранее
+            if light.trajectory.is_finished(light.distance):
+                status = self.trace_results[idx].status
+                return status if status in ("escaped", "periodic") else "exhausted"
+            return None
+        mirror = light.is_clashed(self.mirrors, drawspace, mirror_index)
         if mirror is not None:
-            dir_vec = mirror.reflect_light(self.light)
-            self.light.reflection_points.append(self.light.current_point)
-            self.light.direction_vec = dir_vec
-        return True
+            dir_vec = mirror.reflect_light(light)
+            light.direction_vec = dir_vec
+            # Номер зеркала нужен только для записи событий в файл
+            light.add_reflection(light.current_point, self.mirrors.index(mirror) if light.writer is not None else -1)
+        return None
+
+    def get_status(self):
+        """
+            Итог эксперимента по итогам лучей и условию success_mode.
+                "any": успех, как только цели достиг любой луч; неудача, когда не достиг ни один.
+                "all": успех, когда цели достигли все лучи; неудача при первом же луче, который её не достигнет.
+            Возвращает:
+                str: "achieved" или итог первого неудачного луча; None, если итог ещё не ясен
+                    (или лучей нет вовсе)
+        """
+
+        statuses = self.light_statuses
+        if not statuses:
+            return None
+        failures = [status for status in statuses if status not in (None, "achieved")]
+
+        if self.success_mode == "all":
+            if failures:
+                return failures[0]
+            return "achieved" if all(status == "achieved" for status in statuses) else None
+
+        if "achieved" in statuses:
+            return "achieved"
+        return failures[0] if len(failures) == len(statuses) else None
 
     def pause(self):
         """
@@ -316,6 +558,7 @@ class Experiment:
         """
 
         self.advancing = True
+        self.clock.resync()
 
     def save(self, file_path, save_name):
         """
@@ -327,16 +570,8 @@ class Experiment:
         if file_path is None or save_name is None:
             return
 
-        experiment_config = {
-            "light" : self.light,
-            "mirrors" : self.mirrors,
-            "light_source" : self.light_source,
-            "light_destination" : self.light_destination
-        }
-
-        # Используется пакет pickle
-        with open(os.path.join(file_path, save_name), 'wb') as save_file:
-            pickle.dump(experiment_config, save_file)
+        # Сохраняются только исходные данные сцены (см. scenefile)
+        write_scene(os.path.join(file_path, save_name), self.mirrors, self.light_sources, self.light_destination, self.success_mode)
 
     def load(self, file_path, load_name):
         """
@@ -350,17 +585,20 @@ class Experiment:
         if file_path is None or load_name is None:
             return None
 
-        with open(os.path.join(file_path, load_name), 'rb') as load_file:
-            experiment_config = pickle.load(load_file)
+        # Старые сохранения (pickle) тоже читаются
+        experiment_config = read_scene(os.path.join(file_path, load_name))
 
-        del self.light
+        del self.lights
         del self.mirrors
-        del self.light_source
+        del self.light_sources
         del self.light_destination
 
-        self.light = experiment_config["light"]
+        # Сохранённый луч (он есть только в старых pickle) не восстанавливается: лучи строит start
+        self.lights = []
+        self.light_statuses = []
         self.mirrors = experiment_config["mirrors"]
-        self.light_source = experiment_config["light_source"]
+        self.light_sources = experiment_config["light_sources"]
+        self.success_mode = experiment_config["success_mode"]
         self.light_destination = experiment_config["light_destination"]
 
         return experiment_config
\ No newline at end of file
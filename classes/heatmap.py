@@ -0,0 +1,170 @@
+import hashlib
+import os
+
+import numpy as np
+import pygame as pg
+from pygame import Color
+
+from classes.light import MOMENTUM_RATE, MAX_MOMENTUM
+from classes.scenefile import dump_scene
+from classes.sweep import ParameterSweep
+from classes.vectorized import RAY_ACHIEVED, RAY_ESCAPED
+
+HEATMAP_VERSION = 1 # Версия расчёта карты; входит в хэш, чтобы старый кэш не использовался
+
+
+class ReachabilityMap:
+
+    def __init__(self, mirror_idx, local_poses, light_directions, status, bounces):
+        """
+            Карта достижимости цели: для каждой пары (положение источника на зеркале, угол выхода)
+                хранится итог трассировки и число отражений.
+            Параметры:
+                mirror_idx (int): номер зеркала источника
+                local_poses (ndarray P): значения положения на зеркале (строки карты)
+                light_directions (ndarray A): значения угла выхода в градусах (столбцы карты)
+                status (ndarray P x A): состояния лучей (RAY_ACHIEVED и т.д.)
+                bounces (ndarray P x A): числа отражений
+        """
+
+        self.mirror_idx = mirror_idx
+        self.local_poses = local_poses
+        self.light_directions = light_directions
+        self.status = status
+        self.bounces = bounces
+
+        self.hit_color = Color("gold") # Попадание с малым числом отражений
+        self.far_hit_color = Color("darkred") # Попадание с наибольшим числом отражений
+        self.escaped_color = Color("grey90")
+        self.exhausted_color = Color("grey70")
+        self.marker_color = Color("blue")
+
+    @classmethod
+    def compute(cls, experiment, positions = 201, angles = 181, max_bounces = 300, jobs = None, rays_per_task = 8192):
+        """
+            Расчёт карты для зеркала источника эксперимента: векторизованно и в нескольких процессах
+                (см. ParameterSweep).
+            Параметры:
+                experiment (Experiment): эксперимент с зеркалами, источником и целью
+                positions (int): число значений положения в [0..1]. По умолчанию 201
+                angles (int): число значений угла в [0..180]. По умолчанию 181
+                max_bounces (int): лимит отражений. По умолчанию 300
+                jobs (int): число процессов. По умолчанию все ядра
+                rays_per_task (int): примерное число лучей в одной задаче. По умолчанию 8192
+            Возвращает:
+                ReachabilityMap: карта
+        """
+
+        mirror_idx = experiment.mirrors.index(experiment.light_source.mirror)
+        local_poses = np.linspace(0.0, 1.0, positions)
+        light_directions = np.linspace(0.0, 180.0, angles)
+
+        sweep = ParameterSweep(experiment, local_poses, light_directions, [mirror_idx], max_bounces)
+        result = sweep.run(jobs = jobs, rays_per_task = rays_per_task)
+
+        # Задачи идут по строкам положений, углы внутри строки - по порядку
+        return cls(mirror_idx, local_poses, light_directions,
+                   result.status.reshape(positions, angles), result.bounces.reshape(positions, angles))
+
+    @classmethod
+    def load(cls, path):
+        """
+            Загрузка карты, сохранённой save.
+        """
+
+        with np.load(path) as data:
+            return cls(int(data["mirror_idx"]), data["local_poses"], data["light_directions"], data["status"], data["bounces"])
+
+    def save(self, path):
+        """
+            Сохранение карты в файл .npz.
+        """
+
+        np.savez_compressed(path, mirror_idx = self.mirror_idx, local_poses = self.local_poses,
+                            light_directions = self.light_directions, status = self.status, bounces = self.bounces)
+
+    def get_hit_count(self):
+        """
+            Возвращает число пар параметров, при которых свет достигает цели.
+        """
+
+        return int(np.count_nonzero(self.status == RAY_ACHIEVED))
+
+    def render(self, scale = 3, light_source = None):
+        """
+            Изображение карты: по горизонтали угол выхода, по вертикали положение на зеркале.
+                Попадания окрашены от hit_color (мало отражений) до far_hit_color (много),
+                промахи - серым.
+            Параметры:
+                scale (int): размер клетки карты в пикселях. По умолчанию 3
+                light_source (LightSource): если задан, его текущие параметры отмечаются крестом
+            Возвращает:
+                Surface: изображение карты
+        """
+
+        hits = self.status == RAY_ACHIEVED
+
+        image = np.empty(self.status.shape + (3,), dtype = np.uint8)
+        image[:] = tuple(self.exhausted_color)[:3]
+        image[self.status == RAY_ESCAPED] = tuple(self.escaped_color)[:3]
+
+        if hits.any():
+            # Логарифмическая шкала: различие между 1 и 10 отражениями важнее, чем между 200 и 300
+            bounces = np.log1p(self.bounces[hits].astype(np.float64))
+            k = (bounces / max(bounces.max(), 1.0))[:, None]
+            near = np.array(tuple(self.hit_color)[:3], dtype = np.float64)
+            far = np.array(tuple(self.far_hit_color)[:3], dtype = np.float64)
+            image[hits] = (near + (far - near) * k).astype(np.uint8)
+
+        # surfarray ожидает массив (ширина, высота, 3)
+        surface = pg.surfarray.make_surface(image.transpose(1, 0, 2))
+        surface = pg.transform.scale(surface, (surface.get_width() * scale, surface.get_height() * scale))
+
+        if light_source is not None:
+            x = (light_source.light_direction - self.light_directions[0]) / \
+                (self.light_directions[-1] - self.light_directions[0]) * (surface.get_width() - 1)
+            y = (light_source.local_pos - self.local_poses[0]) / \
+                (self.local_poses[-1] - self.local_poses[0]) * (surface.get_height() - 1)
+            pg.draw.line(surface, self.marker_color, (x - 6, y), (x + 6, y), 2)
+            pg.draw.line(surface, self.marker_color, (x, y - 6), (x, y + 6), 2)
+
+        return surface
+
+
+def get_scene_hash(experiment, positions, angles, max_bounces):
+    """
+        Хэш сцены и параметров карты: зеркала, цель, зеркало и скорость источника, размеры сетки
+            и пределы трассировки (от скорости и момента зависит, какой путь луч успеет пройти).
+            Положение и угол самого источника в хэш не входят - карта их перебирает.
+    """
+
+    light_source = experiment.light_source
+    mirror_idx = experiment.mirrors.index(light_source.mirror)
+
+    digest = hashlib.sha1(dump_scene(experiment.mirrors, (), experiment.light_destination))
+    digest.update(f"{HEATMAP_VERSION}:{mirror_idx}:{positions}:{angles}:{max_bounces}:"
+                  f"{light_source.velocity!r}:{MOMENTUM_RATE!r}:{MAX_MOMENTUM!r}".encode())
+
+    return digest.hexdigest()
+
+
+def get_reachability_map(experiment, cache_dir = None, positions = 201, angles = 181, max_bounces = 300, jobs = None):
+    """
+        Карта достижимости для эксперимента. Если задан cache_dir, готовая карта берётся из кэша
+            по хэшу сцены, а новая сохраняется в него.
+        Возвращает:
+            ReachabilityMap: карта
+    """
+
+    if cache_dir is None:
+        return ReachabilityMap.compute(experiment, positions, angles, max_bounces, jobs)
+
+    path = os.path.join(cache_dir, get_scene_hash(experiment, positions, angles, max_bounces) + ".npz")
+    if os.path.exists(path):
+        return ReachabilityMap.load(path)
+
+    reachability = ReachabilityMap.compute(experiment, positions, angles, max_bounces, jobs)
+    os.makedirs(cache_dir, exist_ok = True)
+    reachability.save(path)
+
+    return reachability
@@ -1,7 +1,11 @@
 import math
-import time
 
 from classes.mirror import FlatMirror, SphericalMirror
+from classes.polyline import PolylineMirror
+from classes.trail import PointRing, TRAIL_POINTS
+
+MOMENTUM_RATE = 0.01 # Прирост момента света за секунду движения
+MAX_MOMENTUM = 10000 # Момент, после которого эксперимент считается неудачным
 
 def length(p1, p2): # Вспомогательная функция для подсчета длины отрезка между двумя точками
 
@@ -10,41 +14,94 @@ def length(p1, p2): # Вспомогательная функция для по
 
 class Light:
 
-    def __init__(self, light_source = None):
+    def __init__(self, light_source = None, trajectory = None, max_points = TRAIL_POINTS, writer = None, source_idx = 0):
         """
             Конструктор класса Light (луч света). 
             Параметры:
                 light_source (LightSource): источник света, из которого идет луч (по умолчанию None)
+                trajectory (Trajectory): заранее рассчитанная траектория. Если задана, луч только
+                    движется вдоль неё, без проверок столкновений (по умолчанию None)
+                max_points (int): сколько последних точек отражения хранить в памяти (по умолчанию TRAIL_POINTS)
+                writer (ReflectionWriter): потоковая запись всех отражений в файл (по умолчанию None)
+                source_idx (int): номер источника в эксперименте, пишется вместе с отражениями (по умолчанию 0)
         """
 
         self.source = light_source
         self.direction_vec = self.source.get_direction_vec() # Направление выхода света из источника
         self.current_point = self.source.get_absolute_pos() # Исходное положение луча света
-        self.reflection_points = [self.current_point] # Точки преломления света (образуют ломаную)
+        self.reflection_points = PointRing(max_points, [self.current_point]) # Последние точки преломления света (образуют ломаную)
         self.momentum = 0.0 # Момент света, отсчет от 0
         self.velocity = self.source.velocity # Скорость распространения света
-        self.last_tick = time.time() # Движение во времени
+        self.time = 0.0 # Время симуляции, прошедшее с выхода луча из источника
+        self.trajectory = trajectory
+        self.distance = 0.0 # Пройденный путь
+        self.writer = writer
+        self.source_idx = source_idx
 
-    def advance(self):
+    def advance(self, dt):
         """
             Продвинуть луч света во времени.
+            Параметры:
+                dt (float): шаг времени симуляции (см. SimulationClock)
+            Возвращает:
+                bool: True, если по пути луч достиг цели (только при заданной траектории; без неё
+                    касания зеркал и цели проверяются снаружи, см. Experiment.step_single_light)
         """
 
-        tick_diff = time.time() - self.last_tick # Разность во времени
-        self.momentum += tick_diff * 0.01 
-        self.last_tick = time.time()
+        self.time += dt
+        self.momentum += dt * MOMENTUM_RATE
+        self.distance += self.velocity * dt
+
+        if self.trajectory is not None:
+            self.current_point, passed = self.trajectory.locate(self.distance)
+            # Пройденные вершины траектории становятся точками отражения
+            while self.reflection_points.total <= passed:
+                idx = self.reflection_points.total
+                self.direction_vec = self.trajectory.get_direction(idx) or self.direction_vec
+                mirror_idx = self.trajectory.get_mirror_index(idx)
+                # Последняя вершина (вход в цель или уход за сцену) - не отражение и в журнал не пишется
+                if mirror_idx < 0:
+                    self.reflection_points.append(self.trajectory.points[idx])
+                    continue
+                self.add_reflection(self.trajectory.points[idx], mirror_idx, self.trajectory.lengths[idx] / self.velocity)
+            return self.trajectory.achieved and self.trajectory.is_finished(self.distance)
 
         # Сдвиг луча в сторону направления движения
-        self.current_point = (self.current_point[0] + self.velocity * tick_diff * self.direction_vec[0], 
-                                self.current_point[1] + self.velocity * tick_diff * self.direction_vec[1])
+        self.current_point = (self.current_point[0] + self.velocity * dt * self.direction_vec[0], 
+                                self.current_point[1] + self.velocity * dt * self.direction_vec[1])
 
-    def is_clashed(self, mirrors, drawspace):
+        return False
+
+    def add_reflection(self, point, mirror_idx = -1, time = None):
+        """
+            Добавить точку отражения в след луча и, если задан writer, записать событие в файл
+                (с текущим направлением луча, т.е. уже после отражения).
+            Параметры:
+                point (float, float): точка отражения
+                mirror_idx (int): номер зеркала. По умолчанию -1 (неизвестно)
+                time (float): время отражения. По умолчанию текущее время луча
+        """
+
+        self.reflection_points.append(point)
+
+        if self.writer is not None:
+            self.writer.write(self.time if time is None else time, point, mirror_idx, self.direction_vec, self.source_idx)
+
+    def is_clashed(self, mirrors, drawspace, mirror_index = None):
         """
             Коснулся ли луч какого-то зеркала?
+            Параметры:
+                mirrors (List[Mirror]): зеркала эксперимента
+                drawspace (DrawSpace): рисовальщик
+                mirror_index (MirrorGrid): пространственный индекс зеркал. Если задан, проверяются
+                    только зеркала рядом с лучом. По умолчанию None
             Возращает:
                 mirror (Mirror), которого коснулся; иначе None
         """
 
+        if mirror_index is not None:
+            mirrors = mirror_index.query_point(self.current_point)
+
         for mirror in mirrors:
             if isinstance(mirror, FlatMirror):
                 if drawspace.is_point_in_polygon(self.current_point, mirror.get_outer_polygon()):
@@ -57,6 +114,9 @@ class Light:
                     elif mirror.mirror_type == "concave":
                         if length(mirror.center, self.current_point) <= mirror.curv_radius:
                             return mirror
+            elif isinstance(mirror, PolylineMirror):
+                if mirror.contains_point(self.current_point):
+                    return mirror
 
         return None
 
@@ -79,6 +139,32 @@ class LightSource:
         self.light_direction = light_direction
         self.velocity = velocity
 
+    @classmethod
+    def from_params(cls, params, mirrors):
+        """
+            Источник по параметрам, записанным get_params.
+        """
+
+        return cls(
+            mirrors[params["mirror"]] if params["mirror"] >= 0 else None,
+            params["local_pos"],
+            params["light_direction"],
+            params["velocity"]
+        )
+
+    def get_params(self, mirrors):
+        """
+            Параметры источника для записи в файл: номер зеркала в mirrors (-1, если его там нет),
+                положение, угол выхода и скорость.
+        """
+
+        return {
+            "mirror" : next((idx for idx, mirror in enumerate(mirrors) if mirror is self.mirror), -1),
+            "local_pos" : self.local_pos,
+            "light_direction" : self.light_direction,
+            "velocity" : self.velocity
+        }
+
     def get_absolute_pos(self):
         """
             Возвращает точку местоположения источника в пространстве.
@@ -124,6 +210,9 @@ class LightSource:
             light_pos = (light_pos_vec_x + center[0], light_pos_vec_y + center[1])
 
             return light_pos
+        elif isinstance(mirror, PolylineMirror):
+
+            return mirror.get_point(self.local_pos)
 
     def get_direction_vec(self):
         """
@@ -170,4 +259,30 @@ class LightDestination:
         if (light_pos[0] - self.pos[0]) ** 2 + (light_pos[1] - self.pos[1]) ** 2 < self.radius ** 2:
             return True
 
-        return False
\ No newline at end of file
+        return False
+
+    def intersect_ray(self, point, direction):
+        """
+            Пересечение луча с зоной цели.
+            Параметры:
+                point (float, float): начало луча
+                direction (float, float): единичный вектор направления луча
+            Возвращает:
+                (float, float): расстояния от начала луча до входа в зону и выхода из неё;
+                    None, если луч не проходит через зону
+        """
+
+        dx, dy = direction
+        fx, fy = point[0] - self.pos[0], point[1] - self.pos[1]
+
+        b = fx * dx + fy * dy
+        disc = b * b - (fx * fx + fy * fy - self.radius ** 2)
+        if disc <= 0:
+            return None
+        root = math.sqrt(disc)
+
+        t_out = -b + root
+        if t_out <= 0:
+            return None
+
+        return max(-b - root, 0.0), t_out
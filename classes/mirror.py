@@ -2,16 +2,21 @@ import math
 import pygame as pg
 from pygame import Color
 
+RAY_EPS = 1e-7 # Минимальное расстояние до пересечения, чтобы луч не отражался повторно в той же точке
+
 
 class Mirror:
 
-    def __init__(self, left_corner = (0, 0), right_corner = (1, 1)):
+    generation = 0 # Счётчик изменений геометрии зеркал (для перестроения индексов, например MirrorGrid)
+
+    def __init__(self, left_corner = (0, 0), right_corner = (1, 1), bump_generation = True):
         """
         Конструктор класса Mirror.
     
         Параметры:
             left_corner (float, float): Координаты левого края зеркала (по умолчанию (0, 0)) 
             right_corner (float, float): Координаты правого края зеркала (по умолчанию (1, 1))
+            bump_generation (bool): увеличить ли Mirror.generation. False - для представлений уже учтённой геометрии (см. MirrorList). По умолчанию True
         """
 
         self.left_corner = left_corner
@@ -23,6 +28,9 @@ class Mirror:
         # Точка по центру отрезка, соединяющего оба края зеркала
         self.central_point = (float(left_corner[0] + right_corner[0]) / 2, float(left_corner[1] + right_corner[1]) / 2)
 
+        if bump_generation:
+            Mirror.generation += 1
+
     def get_dir_norm_vecs(self, left_corner = None, right_corner = None):
         """
         Возвращает единичный направляющий вектор прямой от левого к правому краю и единичнй нормальный вектор к ней же. 
@@ -68,15 +76,16 @@ class Mirror:
 
 class FlatMirror(Mirror):
 
-    def __init__(self, left_corner = (0, 0), right_corner = (1, 1)):
+    def __init__(self, left_corner = (0, 0), right_corner = (1, 1), bump_generation = True):
         """
             Конструктор класса FlatMirror (плоское зеркало), подкласс Mirror.
             Параметры:
                 left_corner (float, float): Координаты левого края зеркала (по умолчанию (0, 0)) 
                 right_corner (float, float): Координаты правого края зеркала (по умолчанию (1, 1))
+                bump_generation (bool): увеличить ли Mirror.generation. False - для представлений уже учтённой геометрии (см. MirrorList). По умолчанию True
         """
 
-        super().__init__(left_corner, right_corner)
+        super().__init__(left_corner, right_corner, bump_generation)
 
         self.left_mirror_end, self.right_mirror_end, self.left_base_end, self.right_base_end = self.calculate_points(left_corner, right_corner)
 
@@ -127,6 +136,8 @@ class FlatMirror(Mirror):
 
         self.central_point = (float(self.left_corner[0] + self.right_corner[0]) / 2, float(self.left_corner[1] + self.right_corner[1]) / 2)
 
+        Mirror.generation += 1
+
     def reflect_light(self, light):
         """
             Отразить свет.
@@ -136,12 +147,21 @@ class FlatMirror(Mirror):
                 new_dir (float, float): направление отраженного луча
         """
 
-        x1, y1 = self.left_corner
-        x2, y2 = self.right_corner
+        return self.reflect_direction(light.current_point, light.direction_vec)
+
+    def reflect_direction(self, point, direction):
+        """
+            Отразить направление direction в точке point зеркала.
+            Параметры:
+                point (float, float): точка падения луча
+                direction (float, float): направление падающего луча
+            Возвращает:
+                new_dir (float, float): направление отраженного луча
+        """
 
         nvecx, nvecy = self.get_dir_norm_vecs()[1]
 
-        curr_dir = light.direction_vec
+        curr_dir = direction
 
         dot = curr_dir[0] * nvecx + curr_dir[1] * nvecy
         diff_vec = (2 * dot * nvecx, 2 * dot * nvecy)
@@ -174,10 +194,39 @@ class FlatMirror(Mirror):
 
         return [left_corner, right_corner, right_mirror_end, left_mirror_end]
 
+    def intersect_ray(self, point, direction):
+        """
+            Пересечение луча с отражающей поверхностью (отрезком между краями зеркала).
+            Параметры:
+                point (float, float): начало луча
+                direction (float, float): единичный вектор направления луча
+            Возвращает:
+                float: расстояние от начала луча до точки пересечения; None, если пересечения нет
+        """
+
+        x1, y1 = self.left_corner
+        x2, y2 = self.right_corner
+        ex, ey = x2 - x1, y2 - y1
+        dx, dy = direction
+
+        denom = dx * ey - dy * ex
+        if denom == 0:
+            return None
+
+        wx, wy = x1 - point[0], y1 - point[1]
+        t = (wx * ey - wy * ex) / denom # Расстояние вдоль луча
+        s = (wx * dy - wy * dx) / denom # Относительное положение на зеркале
+
+        if t <= RAY_EPS or s < 0.0 or s > 1.0:
+            return None
+
+        return t
+
 
 class SphericalMirror(Mirror):
 
-    def __init__(self, left_corner = (0, 0), right_corner = (1, 1), mirror_type = "convex", curv_radius = 150.0):
+    def __init__(self, left_corner = (0, 0), right_corner = (1, 1), mirror_type = "convex", curv_radius = 150.0,
+                 bump_generation = True):
         """
             Конструктор сферического зеркала. 
             Параметры:
@@ -185,8 +234,9 @@ class SphericalMirror(Mirror):
                 right_corner (float, float): Координаты правого края зеркала (по умолчанию (1, 1))
                 mirror_type (["convex", "concave"]): Тип зеркала. "convex" -> выпуклое, "concave" -> вогнутое. По умолчанию "convex"
                 curv_radius (float): Радиус кривизны зеркала. По умолчанию 150.0
+                bump_generation (bool): увеличить ли Mirror.generation. False - для представлений уже учтённой геометрии (см. MirrorList). По умолчанию True
         """
-        super().__init__(left_corner, right_corner)
+        super().__init__(left_corner, right_corner, bump_generation)
 
         self.mirror_type = mirror_type 
         self.curv_radius = curv_radius
@@ -221,6 +271,8 @@ class SphericalMirror(Mirror):
 
         self.start_angle, self.stop_angle = self.get_angles()
 
+        Mirror.generation += 1
+
     def build_rounding_polygon(self):
         """
             Построение описывающего зеркало прямоугольника.
@@ -302,19 +354,28 @@ class SphericalMirror(Mirror):
                 new_dir (float, float): направление отраженного луча
         """
 
-        x1, y1 = self.left_corner
-        x2, y2 = self.right_corner
+        return self.reflect_direction(light.current_point, light.direction_vec)
+
+    def reflect_direction(self, point, direction):
+        """
+            Отразить направление direction в точке point зеркала.
+            Параметры:
+                point (float, float): точка падения луча
+                direction (float, float): направление падающего луча
+            Возвращает:
+                new_dir (float, float): направление отраженного луча
+        """
 
         x0, y0 = self.center
 
-        xn, yn = light.current_point
+        xn, yn = point
 
         nvecx, nvecy = xn - x0, yn - y0
         nvecx, nvecy = nvecx / math.sqrt(nvecx ** 2 + nvecy ** 2), nvecy / math.sqrt(nvecx ** 2 + nvecy ** 2)
         if self.mirror_type == "concave":
             nvecx, nvecy = -nvecx, -nvecy 
 
-        curr_dir = light.direction_vec
+        curr_dir = direction
 
         dot = curr_dir[0] * nvecx + curr_dir[1] * nvecy
         diff_vec = (2 * dot * nvecx, 2 * dot * nvecy)
@@ -322,3 +383,39 @@ class SphericalMirror(Mirror):
         new_dir = (curr_dir[0] - diff_vec[0], curr_dir[1] - diff_vec[1])
 
         return new_dir
+
+    def intersect_ray(self, point, direction):
+        """
+            Пересечение луча с дугой зеркала.
+            Параметры:
+                point (float, float): начало луча
+                direction (float, float): единичный вектор направления луча
+            Возвращает:
+                float: расстояние от начала луча до ближайшей точки пересечения с дугой; 
+                    None, если пересечения нет
+        """
+
+        x0, y0 = self.center
+        dx, dy = direction
+        fx, fy = point[0] - x0, point[1] - y0
+
+        b = fx * dx + fy * dy
+        disc = b * b - (fx * fx + fy * fy - self.curv_radius ** 2)
+        if disc < 0:
+            return None
+        root = math.sqrt(disc)
+
+        # Дуга лежит по ту сторону от отрезка между краями, куда выгнуто зеркало
+        nvecx, nvecy = self.get_dir_norm_vecs()[1]
+        if self.mirror_type == "concave":
+            nvecx, nvecy = -nvecx, -nvecy
+        cx, cy = self.central_point
+
+        for t in (-b - root, -b + root):
+            if t <= RAY_EPS:
+                continue
+            px, py = point[0] + t * dx, point[1] + t * dy
+            if (px - cx) * nvecx + (py - cy) * nvecy >= 0:
+                return t
+
+        return None
@@ -0,0 +1,361 @@
+import json
+from collections.abc import MutableSequence
+
+import numpy as np
+
+from classes.mirror import Mirror, FlatMirror, SphericalMirror
+from classes.polyline import PolylineMirror
+from classes.light import LightSource, LightDestination
+
+ARRAYS_MAGIC = b"MIRRORS-ARRAYS" # Начало файла массивов зеркал
+ARRAYS_VERSION = 3 # Текущая версия формата (в версии 1 был единственный источник "light_source", в версии 3 добавлены профили ломаных)
+
+# Типы зеркал в массиве types
+MIRROR_FLAT = 0
+MIRROR_CONVEX = 1
+MIRROR_CONCAVE = 2
+MIRROR_POLYLINE = 3
+
+MIRROR_TYPES = {"flat" : MIRROR_FLAT, "convex" : MIRROR_CONVEX, "concave" : MIRROR_CONCAVE, "polyline" : MIRROR_POLYLINE}
+
+BASE_WIDTH = 10 # Толщина корпуса плоских и изогнутых зеркал (как в FlatMirror и PolylineMirror)
+
+
+class MirrorArrays:
+
+    def __init__(self, left_corners, right_corners, types, radii, light_sources = (), light_destination = None, success_mode = "any",
+                 profile_offsets = None, profile_points = None):
+        """
+            Конструктор сцены в виде непрерывных массивов: по строке на зеркало. Массивы могут быть
+                отображены в память (np.memmap), тогда файл не читается целиком.
+            Параметры:
+                left_corners (ndarray N x 2): левые края зеркал
+                right_corners (ndarray N x 2): правые края зеркал
+                types (ndarray N): типы зеркал (MIRROR_FLAT, MIRROR_CONVEX, MIRROR_CONCAVE, MIRROR_POLYLINE)
+                radii (ndarray N): радиусы кривизны (0 для плоских зеркал)
+                light_sources (List[dict]): параметры источников (mirror, local_pos, light_direction, velocity). По умолчанию нет
+                light_destination (dict): параметры цели (pos, radius). По умолчанию None
+                success_mode (str): условие успеха при нескольких источниках ("any" или "all"). По умолчанию "any"
+                profile_offsets (ndarray N + 1): профиль зеркала idx - строки profile_offsets[idx]..profile_offsets[idx + 1]
+                    массива profile_points (пустой у всех зеркал, кроме ломаных). По умолчанию профилей нет
+                profile_points (ndarray M x 2): точки профилей (u, v) всех ломаных подряд. По умолчанию нет
+        """
+
+        self.left_corners = left_corners
+        self.right_corners = right_corners
+        self.types = types
+        self.radii = radii
+        self.light_sources = list(light_sources)
+        self.light_destination = light_destination
+        self.success_mode = success_mode
+        self.profile_offsets = np.zeros(len(types) + 1, dtype = np.int64) if profile_offsets is None else profile_offsets
+        self.profile_points = np.zeros((0, 2)) if profile_points is None else profile_points
+
+    def __len__(self):
+
+        return len(self.types)
+
+    @classmethod
+    def from_mirrors(cls, mirrors, light_sources = (), light_destination = None, success_mode = "any"):
+        """
+            Массивы по списку зеркал и, если заданы, источникам и цели.
+        """
+
+        count = len(mirrors)
+        left_corners = np.zeros((count, 2))
+        right_corners = np.zeros((count, 2))
+        types = np.zeros(count, dtype = np.uint8)
+        radii = np.zeros(count)
+        profile_offsets = np.zeros(count + 1, dtype = np.int64)
+        profiles = []
+
+        for idx, mirror in enumerate(mirrors):
+            left_corners[idx] = mirror.left_corner
+            right_corners[idx] = mirror.right_corner
+            profile_offsets[idx + 1] = profile_offsets[idx]
+            if isinstance(mirror, SphericalMirror):
+                types[idx] = MIRROR_TYPES[mirror.mirror_type]
+                radii[idx] = mirror.curv_radius
+            elif isinstance(mirror, PolylineMirror):
+                types[idx] = MIRROR_POLYLINE
+                profiles.extend(mirror.profile)
+                profile_offsets[idx + 1] += len(mirror.profile)
+            elif not isinstance(mirror, FlatMirror):
+                raise ValueError(f"Неизвестный тип зеркала: {type(mirror).__name__}")
+
+        source_params = [light_source.get_params(mirrors) for light_source in light_sources]
+
+        destination_params = None
+        if light_destination is not None:
+            destination_params = {"pos" : list(light_destination.pos), "radius" : light_destination.radius}
+
+        profile_points = np.array(profiles, dtype = np.float64).reshape(-1, 2)
+
+        return cls(left_corners, right_corners, types, radii, source_params, destination_params, success_mode,
+                   profile_offsets, profile_points)
+
+    @classmethod
+    def open(cls, path):
+        """
+            Открытие файла массивов через отображение в память: время загрузки не зависит от числа зеркал.
+        """
+
+        with open(path, "rb") as arrays_file:
+            magic, _, version = arrays_file.readline().strip().partition(b" ")
+            if magic != ARRAYS_MAGIC:
+                raise ValueError("Файл не является файлом массивов зеркал")
+            if int(version) > ARRAYS_VERSION:
+                raise ValueError(f"Неподдерживаемая версия файла массивов зеркал: {int(version)}")
+            header = json.loads(arrays_file.readline())
+
+        if "light_sources" in header:
+            source_params = header["light_sources"]
+        else: # Версия 1
+            source_params = [header["light_source"]] if header.get("light_source") is not None else []
+        scene_params = (source_params, header.get("light_destination"), header.get("success_mode", "any"))
+
+        count, offset = header["count"], header["data_offset"]
+        if count == 0:
+            return cls(np.zeros((0, 2)), np.zeros((0, 2)), np.zeros(0, dtype = np.uint8), np.zeros(0), *scene_params)
+
+        def mapped(dtype, shape):
+            nonlocal offset
+            array = np.memmap(path, dtype = dtype, mode = "r", offset = offset, shape = shape)
+            offset += array.nbytes
+            return array
+
+        left_corners = mapped("<f8", (count, 2))
+        right_corners = mapped("<f8", (count, 2))
+        radii = mapped("<f8", (count,))
+        if int(version) >= 3:
+            profile_offsets = mapped("<i8", (count + 1,))
+            profile_count = header.get("profile_count", 0)
+            # Пустой массив нельзя отобразить в память
+            profile_points = mapped("<f8", (profile_count, 2)) if profile_count else np.zeros((0, 2))
+        else:
+            profile_offsets, profile_points = None, None
+        types = mapped("u1", (count,))
+
+        return cls(left_corners, right_corners, types, radii, *scene_params, profile_offsets, profile_points)
+
+    def write(self, path):
+        """
+            Запись в файл: строка с версией, строка-заголовок JSON (число зеркал и точек профилей,
+                источники, цель, начало данных) и сами массивы, выровненные по 8 байт.
+        """
+
+        header = {"count" : len(self), "light_sources" : self.light_sources, "light_destination" : self.light_destination,
+                  "success_mode" : self.success_mode, "profile_count" : len(self.profile_points)}
+
+        first_line = ARRAYS_MAGIC + b" " + str(ARRAYS_VERSION).encode() + b"\n"
+        # Начало данных зависит от длины заголовка, в котором оно записано, поэтому заголовок дополняется пробелами
+        header["data_offset"] = 0
+        header_line = json.dumps(header).encode()
+        data_offset = -(-(len(first_line) + len(header_line) + 32) // 8) * 8
+        header["data_offset"] = data_offset
+        header_line = json.dumps(header).encode()
+        header_line += b" " * (data_offset - len(first_line) - len(header_line) - 1) + b"\n"
+
+        with open(path, "wb") as arrays_file:
+            arrays_file.write(first_line + header_line)
+            arrays_file.write(np.ascontiguousarray(self.left_corners, dtype = "<f8").tobytes())
+            arrays_file.write(np.ascontiguousarray(self.right_corners, dtype = "<f8").tobytes())
+            arrays_file.write(np.ascontiguousarray(self.radii, dtype = "<f8").tobytes())
+            arrays_file.write(np.ascontiguousarray(self.profile_offsets, dtype = "<i8").tobytes())
+            arrays_file.write(np.ascontiguousarray(self.profile_points, dtype = "<f8").tobytes())
+            arrays_file.write(np.ascontiguousarray(self.types, dtype = "u1").tobytes())
+
+    def get_mirror(self, idx, view = False):
+        """
+            Объект зеркала idx, построенный по строке массивов.
+            Параметры:
+                idx (int): номер зеркала
+                view (bool): представление зеркала, уже входящего в сцену (см. MirrorList): его
+                    создание не меняет геометрию, поэтому Mirror.generation не увеличивается. По умолчанию False
+        """
+
+        left_corner = tuple(float(v) for v in self.left_corners[idx])
+        right_corner = tuple(float(v) for v in self.right_corners[idx])
+        mirror_type = int(self.types[idx])
+
+        if mirror_type == MIRROR_FLAT:
+            return FlatMirror(left_corner, right_corner, not view)
+        if mirror_type == MIRROR_CONVEX:
+            return SphericalMirror(left_corner, right_corner, "convex", float(self.radii[idx]), not view)
+        if mirror_type == MIRROR_CONCAVE:
+            return SphericalMirror(left_corner, right_corner, "concave", float(self.radii[idx]), not view)
+        if mirror_type == MIRROR_POLYLINE:
+            return PolylineMirror(left_corner, right_corner, self.get_profile(idx), not view)
+
+        raise ValueError(f"Неизвестный тип зеркала: {mirror_type}")
+
+    def get_bounding_boxes(self):
+        """
+            Описывающие прямоугольники всех зеркал, посчитанные прямо по массивам, без создания
+                объектов зеркал: те же, что у spatial.get_bounding_box (корпус плоских зеркал,
+                rounding_polygon сферических). У ломаных - прямоугольник вершин, расширенный на
+                толщину корпуса, т.е. чуть больше точного.
+            Возвращает:
+                ndarray N x 4: строки (x1, y1, x2, y2)
+        """
+
+        left = np.asarray(self.left_corners, dtype = np.float64)
+        right = np.asarray(self.right_corners, dtype = np.float64)
+        types = np.asarray(self.types)
+        radii = np.asarray(self.radii, dtype = np.float64)
+
+        # Направляющий и нормальный векторы, как в Mirror.get_dir_norm_vecs
+        chord = right - left
+        length = np.hypot(chord[:, 0], chord[:, 1])[:, None]
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            pvec = -chord / length
+            nvec = np.stack([-chord[:, 1], chord[:, 0]], axis = 1) / length
+
+        # Четыре вершины описывающего многоугольника каждого зеркала
+        polygons = np.stack([left, right, right, left], axis = 1)
+
+        flat = types == MIRROR_FLAT
+        polygons[flat, 2] = right[flat] + BASE_WIDTH * (nvec[flat] + pvec[flat])
+        polygons[flat, 3] = left[flat] + BASE_WIDTH * (nvec[flat] - pvec[flat])
+
+        # Высота сегмента окружности над хордой (см. SphericalMirror.build_rounding_polygon)
+        spherical = (types == MIRROR_CONVEX) | (types == MIRROR_CONCAVE)
+        with np.errstate(invalid = "ignore"):
+            depth = radii - np.sqrt(radii ** 2 - (length[:, 0] / 2) ** 2)
+        depth = np.where(types == MIRROR_CONCAVE, -depth, depth)[:, None]
+        polygons[spherical, 2] = right[spherical] + nvec[spherical] * depth[spherical]
+        polygons[spherical, 3] = left[spherical] + nvec[spherical] * depth[spherical]
+
+        boxes = np.concatenate([polygons.min(axis = 1), polygons.max(axis = 1)], axis = 1)
+
+        # Вершины ломаных по профилям (см. PolylineMirror.build)
+        offsets = np.asarray(self.profile_offsets)
+        counts = np.diff(offsets)
+        polyline = np.nonzero((types == MIRROR_POLYLINE) & (counts > 0))[0]
+        if len(polyline):
+            owners = np.repeat(np.arange(len(types)), counts)
+            profile = np.asarray(self.profile_points, dtype = np.float64)
+            points = left[owners] + chord[owners] * profile[:, :1] + nvec[owners] * profile[:, 1:]
+            starts = offsets[polyline]
+            boxes[polyline, :2] = np.minimum.reduceat(points, starts) - BASE_WIDTH
+            boxes[polyline, 2:] = np.maximum.reduceat(points, starts) + BASE_WIDTH
+
+        return boxes
+
+    def get_profile(self, idx):
+        """
+            Точки профиля (u, v) зеркала idx (пустой список, если зеркало не ломаная).
+        """
+
+        first, last = int(self.profile_offsets[idx]), int(self.profile_offsets[idx + 1])
+
+        return [(float(u), float(v)) for u, v in self.profile_points[first:last]]
+
+
+class MirrorList(MutableSequence):
+
+    def __init__(self, arrays):
+        """
+            Список зеркал поверх MirrorArrays. Объект зеркала создаётся только при первом обращении
+                к нему, поэтому открытие сцены не требует построения всех зеркал. Пока список
+                не менялся, векторизованный трассировщик работает прямо с массивами.
+            Параметры:
+                arrays (MirrorArrays): массивы сцены
+        """
+
+        self.arrays = arrays
+        self.views = [None] * len(arrays) # Уже созданные объекты зеркал
+        self.modified = False # Менялся ли состав списка
+        self.generation = Mirror.generation # Версия геометрии зеркал на момент открытия
+
+    def __len__(self):
+
+        return len(self.views)
+
+    def __getitem__(self, idx):
+
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        mirror = self.views[idx]
+        if mirror is None:
+            mirror = self.arrays.get_mirror(idx if idx >= 0 else idx + len(self), view = True)
+            self.views[idx] = mirror
+
+        return mirror
+
+    def __setitem__(self, idx, mirror):
+
+        self.materialize()
+        self.views[idx] = mirror
+        self.modified = True
+
+    def __delitem__(self, idx):
+
+        self.materialize()
+        del self.views[idx]
+        self.modified = True
+
+    def insert(self, idx, mirror):
+
+        self.materialize()
+        self.views.insert(idx, mirror)
+        self.modified = True
+
+    def index(self, mirror, start = 0, stop = None):
+
+        # Ищутся только уже созданные зеркала: несозданное не может совпасть с переданным объектом
+        stop = len(self) if stop is None else stop
+        for idx in range(start, stop):
+            if self.views[idx] is mirror:
+                return idx
+
+        raise ValueError("Зеркало не найдено")
+
+    def materialize(self):
+        """
+            Создать объекты всех зеркал (перед изменением состава списка).
+        """
+
+        for idx in range(len(self)):
+            self[idx]
+
+    def is_pristine(self):
+        """
+            Возвращает True, если список и геометрия зеркал совпадают с массивами.
+        """
+
+        return not self.modified and self.generation == Mirror.generation
+
+
+def read_mirror_arrays(path):
+    """
+        Загрузка конфигурации эксперимента из файла массивов: зеркала создаются по требованию.
+    """
+
+    arrays = MirrorArrays.open(path)
+    mirrors = MirrorList(arrays)
+
+    light_sources = [LightSource.from_params(params, mirrors) for params in arrays.light_sources]
+
+    light_destination = None
+    if arrays.light_destination is not None:
+        params = arrays.light_destination
+        light_destination = LightDestination(tuple(params["pos"]), params["radius"])
+
+    return {
+        "light" : None,
+        "mirrors" : mirrors,
+        "light_source" : light_sources[0] if light_sources else None,
+        "light_sources" : light_sources,
+        "success_mode" : arrays.success_mode,
+        "light_destination" : light_destination
+    }
+
+
+def write_mirror_arrays(path, mirrors, light_sources = (), light_destination = None, success_mode = "any"):
+    """
+        Сохранение сцены в файл массивов.
+    """
+
+    MirrorArrays.from_mirrors(mirrors, light_sources, light_destination, success_mode).write(path)
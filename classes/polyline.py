@@ -0,0 +1,461 @@
+import math
+
+from classes.mirror import Mirror, RAY_EPS
+
+
+class SegmentHierarchy:
+
+    def __init__(self, points, leaf_size = 4):
+        """
+            Иерархия описывающих прямоугольников (BVH) над отрезками ломаной. Отрезки ломаной уже
+                упорядочены вдоль кривой, поэтому узел - это диапазон отрезков, а дети делят его
+                пополам. Луч проверяет только отрезки в узлах, которые пересекает, т.е. запрос
+                стоит O(log k) для k отрезков, а не O(k).
+            Параметры:
+                points (List[(float, float)]): вершины ломаной
+                leaf_size (int): наибольшее число отрезков в листе. По умолчанию 4
+        """
+
+        self.points = points
+        self.leaf_size = leaf_size
+
+        # Узлы хранятся списками: прямоугольник (x1, y1, x2, y2), диапазон отрезков и дети (-1 у листа)
+        self.boxes = []
+        self.ranges = []
+        self.children = []
+
+        if len(points) > 1:
+            self.build_node(0, len(points) - 1)
+
+    def build_node(self, first, last):
+        """
+            Построить узел над отрезками first..last - 1 (без рекурсии) и вернуть его номер.
+        """
+
+        root = self.add_node(first, last)
+        stack = [root]
+
+        while stack:
+            node = stack.pop()
+            first, last = self.ranges[node]
+            if last - first <= self.leaf_size:
+                continue
+            middle = (first + last) // 2
+            left, right = self.add_node(first, middle), self.add_node(middle, last)
+            self.children[node] = (left, right)
+            stack.extend((left, right))
+
+        return root
+
+    def add_node(self, first, last):
+        """
+            Добавить узел над отрезками first..last - 1 (вершинами first..last) и вернуть его номер.
+        """
+
+        xs = [point[0] for point in self.points[first:last + 1]]
+        ys = [point[1] for point in self.points[first:last + 1]]
+
+        self.boxes.append((min(xs), min(ys), max(xs), max(ys)))
+        self.ranges.append((first, last))
+        self.children.append(-1)
+
+        return len(self.boxes) - 1
+
+    def intersect_ray(self, point, direction):
+        """
+            Ближайшее пересечение луча с ломаной.
+            Параметры:
+                point (float, float): начало луча
+                direction (float, float): единичный вектор направления луча
+            Возвращает:
+                (float, int, float): расстояние вдоль луча, номер отрезка и положение на нём [0..1];
+                    None, если пересечения нет
+        """
+
+        if not self.boxes:
+            return None
+
+        px, py = point
+        dx, dy = direction
+        inv_x = 1.0 / dx if dx != 0 else math.inf
+        inv_y = 1.0 / dy if dy != 0 else math.inf
+
+        best = None
+        best_t = math.inf
+        stack = [0]
+
+        while stack:
+            node = stack.pop()
+
+            # Пересечение луча с прямоугольником узла (метод плит)
+            x1, y1, x2, y2 = self.boxes[node]
+            if dx != 0:
+                tx1, tx2 = (x1 - px) * inv_x, (x2 - px) * inv_x
+                t_enter, t_leave = min(tx1, tx2), max(tx1, tx2)
+            elif x1 <= px <= x2:
+                t_enter, t_leave = -math.inf, math.inf
+            else:
+                continue
+            if dy != 0:
+                ty1, ty2 = (y1 - py) * inv_y, (y2 - py) * inv_y
+                t_enter, t_leave = max(t_enter, min(ty1, ty2)), min(t_leave, max(ty1, ty2))
+            elif not y1 <= py <= y2:
+                continue
+            if t_enter > t_leave or t_leave <= RAY_EPS or t_enter >= best_t:
+                continue
+
+            if self.children[node] != -1:
+                stack.extend(self.children[node])
+                continue
+
+            first, last = self.ranges[node]
+            for idx in range(first, last):
+                hit = intersect_segment(point, direction, self.points[idx], self.points[idx + 1])
+                if hit is not None and hit[0] < best_t:
+                    best_t = hit[0]
+                    best = (hit[0], idx, hit[1])
+
+        return best
+
+    def find_nearest(self, point, max_dist = math.inf):
+        """
+            Ближайший к точке point отрезок ломаной.
+            Параметры:
+                point (float, float): точка
+                max_dist (float): отрезки дальше max_dist не ищутся. По умолчанию без ограничения
+            Возвращает:
+                (int, float, float): номер отрезка, положение на нём [0..1] и расстояние до точки;
+                    None, если все отрезки дальше max_dist
+        """
+
+        best = None
+        best_dist = max_dist
+        stack = [0] if self.boxes and self.get_box_distance(0, point) <= max_dist else []
+
+        while stack:
+            node = stack.pop()
+
+            # Расстояние до прямоугольника узла не больше расстояния до любого его отрезка
+            if self.get_box_distance(node, point) > best_dist:
+                continue
+
+            if self.children[node] != -1:
+                # Ближний ребёнок обходится первым, чтобы раньше найти близкий отрезок
+                left, right = self.children[node]
+                if self.get_box_distance(left, point) < self.get_box_distance(right, point):
+                    left, right = right, left
+                stack.extend((left, right))
+                continue
+
+            px, py = point
+
+            first, last = self.ranges[node]
+            for idx in range(first, last):
+                (ax, ay), (bx, by) = self.points[idx], self.points[idx + 1]
+                ex, ey = bx - ax, by - ay
+                norm2 = ex * ex + ey * ey
+                s = min(max(((px - ax) * ex + (py - ay) * ey) / norm2, 0.0), 1.0) if norm2 > 0 else 0.0
+                dist = math.sqrt((px - ax - s * ex) ** 2 + (py - ay - s * ey) ** 2)
+                if dist <= best_dist:
+                    best_dist = dist
+                    best = (idx, s, dist)
+
+        return best
+
+    def get_box_distance(self, node, point):
+        """
+            Расстояние от точки point до прямоугольника узла node (0, если точка внутри).
+        """
+
+        x1, y1, x2, y2 = self.boxes[node]
+        box_dx = max(x1 - point[0], 0.0, point[0] - x2)
+        box_dy = max(y1 - point[1], 0.0, point[1] - y2)
+
+        return math.sqrt(box_dx * box_dx + box_dy * box_dy)
+
+
+class PolylineMirror(Mirror):
+
+    def __init__(self, left_corner = (0, 0), right_corner = (1, 1), profile = None, bump_generation = True):
+        """
+            Конструктор изогнутого зеркала произвольной формы (например, параболического), заданного
+                плотной ломаной. Форма задаётся профилем относительно краёв, поэтому при перемещении
+                краёв зеркало перестраивается само. Нормаль при отражении интерполируется между
+                вершинами, как будто зеркало гладкое.
+            Параметры:
+                left_corner (float, float): Координаты левого края зеркала (по умолчанию (0, 0))
+                right_corner (float, float): Координаты правого края зеркала (по умолчанию (1, 1))
+                profile (List[(float, float)]): точки профиля (u, v): u от 0 до 1 - положение вдоль
+                    отрезка между краями, v - отступ от него в пикселях в сторону корпуса (положительный
+                    отступ - зеркало выгнуто от света). Профиль начинается в (0, 0) и кончается в (1, 0).
+                    По умолчанию парабола глубиной в 1/8 расстояния между краями
+                bump_generation (bool): увеличить ли Mirror.generation. False - для представлений уже учтённой геометрии (см. MirrorList). По умолчанию True
+        """
+
+        super().__init__(left_corner, right_corner, bump_generation)
+
+        self.mirror_type = "polyline"
+        self.base_width = 10 # Толщина всего корпуса зеркала
+        self.mirror_width = 5 # Толщина самого зеркала
+
+        if profile is None:
+            profile = parabolic_profile(self.get_flat_length() / 8)
+        self.profile = [(float(u), float(v)) for u, v in profile]
+
+        self.build()
+
+    def build(self):
+        """
+            Построение вершин ломаной по профилю, нормалей в вершинах и иерархии отрезков.
+        """
+
+        x1, y1 = self.left_corner
+        x2, y2 = self.right_corner
+        nvecx, nvecy = self.get_dir_norm_vecs()[1]
+
+        self.points = [(x1 + (x2 - x1) * u + nvecx * v, y1 + (y2 - y1) * u + nvecy * v) for u, v in self.profile]
+
+        # Нормали отрезков (в сторону корпуса, как у отрезка между краями) и их средние в вершинах
+        segment_normals = [get_segment_normal(a, b) for a, b in zip(self.points, self.points[1:])]
+        self.vertex_normals = []
+        for idx in range(len(self.points)):
+            nx = sum(normal[0] for normal in segment_normals[max(idx - 1, 0):idx + 1])
+            ny = sum(normal[1] for normal in segment_normals[max(idx - 1, 0):idx + 1])
+            norm = math.sqrt(nx ** 2 + ny ** 2)
+            self.vertex_normals.append((nx / norm, ny / norm) if norm > 0 else (nvecx, nvecy))
+
+        # Длины дуги до каждой вершины (для положения источника на зеркале)
+        self.arc_lengths = [0.0]
+        for a, b in zip(self.points, self.points[1:]):
+            self.arc_lengths.append(self.arc_lengths[-1] + math.sqrt((b[0] - a[0]) ** 2 + (b[1] - a[1]) ** 2))
+
+        self.hierarchy = SegmentHierarchy(self.points)
+
+    def recalculate_points(self):
+        """
+            Пересчёт всех частей зеркала при изменении параметров.
+        """
+
+        self.central_point = (float(self.left_corner[0] + self.right_corner[0]) / 2, float(self.left_corner[1] + self.right_corner[1]) / 2)
+        self.build()
+
+        Mirror.generation += 1
+
+    def get_depth(self):
+        """
+            Наибольший по модулю отступ профиля (со знаком).
+        """
+
+        return max((v for u, v in self.profile), key = abs, default = 0.0)
+
+    def set_depth(self, depth):
+        """
+            Растянуть профиль поперёк так, чтобы наибольший отступ стал равен depth.
+        """
+
+        old_depth = self.get_depth()
+        if old_depth == 0:
+            self.profile = parabolic_profile(depth, len(self.profile) - 1)
+        else:
+            self.profile = [(u, v * depth / old_depth) for u, v in self.profile]
+
+    def get_outline(self, width = None):
+        """
+            Многоугольник из ломаной и её копии, сдвинутой на width в сторону корпуса.
+                По умолчанию width - толщина корпуса.
+        """
+
+        if width is None:
+            width = self.base_width
+
+        back = [(x + nx * width, y + ny * width) for (x, y), (nx, ny) in zip(self.points, self.vertex_normals)]
+
+        return self.points + back[::-1]
+
+    def get_point(self, local_pos):
+        """
+            Точка зеркала на относительном расстоянии local_pos [0..1] вдоль ломаной от левого края.
+        """
+
+        distance = self.arc_lengths[-1] * min(max(local_pos, 0.0), 1.0)
+
+        for idx in range(len(self.points) - 1):
+            seg_length = self.arc_lengths[idx + 1] - self.arc_lengths[idx]
+            if distance <= self.arc_lengths[idx + 1] or idx == len(self.points) - 2:
+                s = (distance - self.arc_lengths[idx]) / seg_length if seg_length > 0 else 0.0
+                (ax, ay), (bx, by) = self.points[idx], self.points[idx + 1]
+                return (ax + (bx - ax) * s, ay + (by - ay) * s)
+
+        return self.points[0]
+
+    def get_normal(self, idx, s):
+        """
+            Нормаль, интерполированная между вершинами отрезка idx в положении s [0..1] на нём.
+        """
+
+        (nx1, ny1), (nx2, ny2) = self.vertex_normals[idx], self.vertex_normals[idx + 1]
+        nx, ny = nx1 + (nx2 - nx1) * s, ny1 + (ny2 - ny1) * s
+        norm = math.sqrt(nx ** 2 + ny ** 2)
+
+        return (nx / norm, ny / norm) if norm > 0 else get_segment_normal(self.points[idx], self.points[idx + 1])
+
+    def get_offset(self, point, max_dist = math.inf):
+        """
+            Расстояние со знаком от точки point до ломаной: положительное со стороны корпуса.
+                None, если ломаная дальше max_dist (по умолчанию без ограничения).
+        """
+
+        nearest = self.hierarchy.find_nearest(point, max_dist)
+        if nearest is None:
+            return None
+
+        idx, s, dist = nearest
+        nx, ny = self.get_normal(idx, s)
+        (ax, ay), (bx, by) = self.points[idx], self.points[idx + 1]
+        side = (point[0] - ax - (bx - ax) * s) * nx + (point[1] - ay - (by - ay) * s) * ny
+
+        return dist if side >= 0 else -dist
+
+    def contains_point(self, point):
+        """
+            Лежит ли точка point в корпусе зеркала: между ломаной и её копией, сдвинутой на
+                base_width в сторону корпуса (но не за краями зеркала).
+        """
+
+        # Точки дальше толщины корпуса от ломаной отсекаются сразу, без полного поиска
+        nearest = self.hierarchy.find_nearest(point, self.base_width)
+        if nearest is None:
+            return False
+
+        idx, s, dist = nearest
+        if dist > 0 and ((idx == 0 and s == 0.0) or (idx == len(self.points) - 2 and s == 1.0)):
+            return False
+
+        return self.get_offset(point, self.base_width) >= 0
+
+    def reflect_light(self, light):
+        """
+            Отразить свет.
+            Параметры:
+                light (Light): луч света, созданный в эксперименте
+            Возвращает:
+                new_dir (float, float): направление отраженного луча
+        """
+
+        return self.reflect_direction(light.current_point, light.direction_vec)
+
+    def reflect_direction(self, point, direction):
+        """
+            Отразить направление direction в точке point зеркала (по интерполированной нормали
+                ближайшего к точке отрезка).
+            Параметры:
+                point (float, float): точка падения луча
+                direction (float, float): направление падающего луча
+            Возвращает:
+                new_dir (float, float): направление отраженного луча
+        """
+
+        idx, s, _ = self.hierarchy.find_nearest(point)
+        nvecx, nvecy = self.get_normal(idx, s)
+
+        dot = direction[0] * nvecx + direction[1] * nvecy
+        new_dir = (direction[0] - 2 * dot * nvecx, direction[1] - 2 * dot * nvecy)
+
+        # При скользящем падении отражение по интерполированной нормали может уйти за отрезок,
+        # тогда луч отражается от самого отрезка
+        segx, segy = get_segment_normal(self.points[idx], self.points[idx + 1])
+        if (direction[0] * segx + direction[1] * segy) * (new_dir[0] * segx + new_dir[1] * segy) > 0:
+            dot = direction[0] * segx + direction[1] * segy
+            new_dir = (direction[0] - 2 * dot * segx, direction[1] - 2 * dot * segy)
+
+        return new_dir
+
+    def intersect_ray(self, point, direction):
+        """
+            Пересечение луча с ломаной зеркала (через иерархию отрезков).
+            Параметры:
+                point (float, float): начало луча
+                direction (float, float): единичный вектор направления луча
+            Возвращает:
+                float: расстояние от начала луча до ближайшего пересечения; None, если пересечения нет
+        """
+
+        hit = self.hierarchy.intersect_ray(point, direction)
+
+        return hit[0] if hit is not None else None
+
+
+def intersect_segment(point, direction, left, right):
+    """
+        Пересечение луча с отрезком от left до right (как FlatMirror.intersect_ray).
+        Возвращает:
+            (float, float): расстояние вдоль луча и положение на отрезке [0..1]; None, если пересечения нет
+    """
+
+    x1, y1 = left
+    ex, ey = right[0] - x1, right[1] - y1
+    dx, dy = direction
+
+    denom = dx * ey - dy * ex
+    if denom == 0:
+        return None
+
+    wx, wy = x1 - point[0], y1 - point[1]
+    t = (wx * ey - wy * ex) / denom
+    s = (wx * dy - wy * dx) / denom
+
+    if t <= RAY_EPS or s < 0.0 or s > 1.0:
+        return None
+
+    return t, s
+
+
+def get_segment_normal(left, right):
+    """
+        Единичная нормаль к отрезку (с той же стороны, что и Mirror.get_dir_norm_vecs).
+    """
+
+    nx, ny = left[1] - right[1], right[0] - left[0]
+    norm = math.sqrt(nx ** 2 + ny ** 2)
+
+    return (nx / norm, ny / norm) if norm > 0 else (0.0, 0.0)
+
+
+def parabolic_profile(depth, segments = 64):
+    """
+        Профиль параболы глубиной depth: v = 4 * depth * u * (1 - u). При положительной глубине
+            фокус лежит на расстоянии L^2 / (16 * depth) от вершины в сторону света (L - расстояние
+            между краями).
+        Параметры:
+            depth (float): отступ середины зеркала в пикселях
+            segments (int): число отрезков ломаной. По умолчанию 64
+        Возвращает:
+            List[(float, float)]: точки профиля (u, v)
+    """
+
+    return [(idx / segments, 4 * depth * (idx / segments) * (1 - idx / segments)) for idx in range(segments + 1)]
+
+
+def load_profile(path):
+    """
+        Чтение профиля из текстового файла: по строке "u,v" (или "u v") на точку; строки, которые
+            не читаются как два числа (например, заголовок), пропускаются.
+        Возвращает:
+            List[(float, float)]: точки профиля по возрастанию u
+    """
+
+    profile = []
+    with open(path, encoding = "utf-8") as profile_file:
+        for line in profile_file:
+            values = line.replace(",", " ").replace(";", " ").split()
+            try:
+                u, v = float(values[0]), float(values[1])
+            except (IndexError, ValueError):
+                continue
+            profile.append((u, v))
+
+    profile.sort()
+    if len(profile) < 2 or profile[0][0] != 0.0 or profile[-1][0] != 1.0:
+        raise ValueError("Профиль должен начинаться в u = 0 и кончаться в u = 1")
+
+    return profile
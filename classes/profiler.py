@@ -0,0 +1,156 @@
+import json
+import time
+from bisect import bisect_right
+from collections import deque
+
+PHASES = ("events", "physics", "draw", "present", "wait") # Фазы кадра в порядке вывода
+HISTOGRAM_EDGES = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 33.0, 66.0) # Границы корзин гистограмм в миллисекундах
+
+
+class PhaseTimer:
+
+    def __init__(self, profiler, phase):
+        """
+            Замер одной фазы кадра (для with). Создаётся один раз на фазу и используется повторно.
+        """
+
+        self.profiler = profiler
+        self.phase = phase
+        self.start = 0.0
+
+    def __enter__(self):
+
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.profiler.add(self.phase, time.perf_counter() - self.start)
+        return False
+
+
+class FrameProfiler:
+
+    def __init__(self, log_path = None, history = 300, hud = False, hud_interval = 15):
+        """
+            Конструктор покадрового профилировщика главного цикла. Время каждой фазы кадра (опрос
+                событий, физика, рисование, вывод на дисплей, ожидание следующего кадра) суммируется
+                за кадр, а итоги последних history кадров хранятся для гистограмм и средних значений.
+            Параметры:
+                log_path (str): JSONL-файл, куда пишется по строке на кадр. По умолчанию не пишется
+                history (int): по скольким последним кадрам считаются гистограммы. По умолчанию 300
+                hud (bool): показывать ли замеры поверх эксперимента (см. DrawSpace.draw_profile_hud).
+                    По умолчанию False
+                hud_interval (int): через сколько кадров обновлять надписи HUD. По умолчанию 15
+        """
+
+        self.log_path = log_path
+        self.hud = hud
+        self.hud_interval = hud_interval
+
+        self.timers = {phase : PhaseTimer(self, phase) for phase in PHASES}
+        self.history = {phase : deque(maxlen = history) for phase in PHASES + ("total",)}
+
+        self.frame_count = 0 # Число записанных кадров
+        self.frame_start = None # Начало текущего кадра (None вне кадра)
+        self.frame_times = dict.fromkeys(PHASES, 0.0) # Время фаз текущего кадра в секундах
+        self.frame_calls = dict.fromkeys(PHASES, 0) # Число замеров фаз в текущем кадре
+        self.start_time = time.perf_counter()
+        self.hud_lines = [] # Последние посчитанные строки HUD
+
+        self.file = open(log_path, "w", encoding = "utf-8") if log_path is not None else None
+
+    def measure(self, phase):
+        """
+            Замер фазы phase: with profiler.measure("physics"): ...
+        """
+
+        return self.timers[phase]
+
+    def add(self, phase, seconds):
+        """
+            Добавить seconds секунд к фазе phase текущего кадра.
+        """
+
+        self.frame_times[phase] += seconds
+        self.frame_calls[phase] += 1
+
+    def begin_frame(self):
+        """
+            Начало кадра: замеры фаз обнуляются.
+        """
+
+        self.frame_start = time.perf_counter()
+        for phase in PHASES:
+            self.frame_times[phase] = 0.0
+            self.frame_calls[phase] = 0
+
+    def end_frame(self):
+        """
+            Конец кадра: итоги записываются в историю и в файл. Кадры без единого замера (например,
+                ожидание нажатия кнопки) не учитываются.
+        """
+
+        if self.frame_start is None:
+            return
+
+        frame_start, self.frame_start = self.frame_start, None
+        total = time.perf_counter() - frame_start
+        if not any(self.frame_calls.values()):
+            return
+
+        for phase in PHASES:
+            self.history[phase].append(self.frame_times[phase] * 1000)
+        self.history["total"].append(total * 1000)
+        self.frame_count += 1
+
+        if self.file is not None:
+            record = {"frame" : self.frame_count, "time" : round(frame_start - self.start_time, 6),
+                      "total" : round(total * 1000, 4)}
+            for phase in PHASES:
+                record[phase] = round(self.frame_times[phase] * 1000, 4)
+            record["other"] = round(max(total - sum(self.frame_times.values()), 0.0) * 1000, 4)
+            record["steps"] = self.frame_calls["physics"]
+            self.file.write(json.dumps(record) + "\n")
+
+        if self.hud and (self.frame_count % self.hud_interval == 1 or not self.hud_lines):
+            self.hud_lines = self.get_summary_lines()
+
+    def get_stats(self, phase):
+        """
+            Среднее, 95-й перцентиль и максимум времени фазы phase за последние кадры (в миллисекундах).
+        """
+
+        values = sorted(self.history[phase])
+        if not values:
+            return 0.0, 0.0, 0.0
+
+        return sum(values) / len(values), values[min(int(len(values) * 0.95), len(values) - 1)], values[-1]
+
+    def get_histogram(self, phase):
+        """
+            Гистограмма времени фазы phase за последние кадры: число кадров в каждой корзине
+                HISTOGRAM_EDGES (последняя корзина - всё, что дольше последней границы).
+        """
+
+        counts = [0] * (len(HISTOGRAM_EDGES) + 1)
+        for value in self.history[phase]:
+            counts[bisect_right(HISTOGRAM_EDGES, value)] += 1
+
+        return counts
+
+    def get_summary_lines(self):
+        """
+            Строки сводки для HUD: (название, среднее, p95, максимум, гистограмма) по кадру целиком
+                и по каждой фазе.
+        """
+
+        return [(phase,) + self.get_stats(phase) + (self.get_histogram(phase),) for phase in ("total",) + PHASES]
+
+    def close(self):
+        """
+            Закрыть файл замеров.
+        """
+
+        if self.file is not None and not self.file.closed:
+            self.file.close()
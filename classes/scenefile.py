@@ -0,0 +1,157 @@
+import json
+import pickle
+
+from classes.mirror import FlatMirror, SphericalMirror
+from classes.polyline import PolylineMirror
+from classes.light import LightSource, LightDestination
+from classes.mirrorarrays import ARRAYS_MAGIC, read_mirror_arrays
+
+SCENE_MAGIC = b"MIRRORS-SCENE" # Начало файла сцены; по нему новый формат отличается от старых pickle-файлов
+SCENE_VERSION = 3 # Текущая версия формата (в версии 1 был единственный источник "light_source", в версии 3 добавлены зеркала-ломаные)
+
+
+def dump_scene(mirrors, light_sources = (), light_destination = None, success_mode = "any"):
+    """
+        Запись сцены в компактный формат. Хранятся только исходные данные: края и тип зеркал,
+            радиус кривизны или профиль, параметры источников и цели. Производные точки (корпус, дуги и т.д.)
+            пересчитываются при загрузке.
+        Параметры:
+            mirrors (List[Mirror]): зеркала эксперимента
+            light_sources (List[LightSource]): источники света. По умолчанию нет
+            light_destination (LightDestination): цель света. По умолчанию None
+            success_mode (str): условие успеха при нескольких источниках ("any" или "all"). По умолчанию "any"
+        Возвращает:
+            bytes: содержимое файла сцены
+    """
+
+    scene = {
+        "mirrors" : [dump_mirror(mirror) for mirror in mirrors],
+        "light_sources" : [light_source.get_params(mirrors) for light_source in light_sources],
+        "success_mode" : success_mode
+    }
+
+    if light_destination is not None:
+        scene["light_destination"] = {
+            "pos" : list(light_destination.pos),
+            "radius" : light_destination.radius
+        }
+
+    header = SCENE_MAGIC + b" " + str(SCENE_VERSION).encode() + b"\n"
+    return header + json.dumps(scene, separators = (",", ":")).encode()
+
+
+def dump_mirror(mirror):
+    """
+        Исходные данные зеркала: [тип, левый край, правый край(, радиус кривизны или профиль)].
+    """
+
+    left_corner, right_corner = list(mirror.left_corner), list(mirror.right_corner)
+
+    if isinstance(mirror, FlatMirror):
+        return ["flat", left_corner, right_corner]
+    if isinstance(mirror, SphericalMirror):
+        return [mirror.mirror_type, left_corner, right_corner, mirror.curv_radius]
+    if isinstance(mirror, PolylineMirror):
+        return ["polyline", left_corner, right_corner, [list(point) for point in mirror.profile]]
+
+    raise ValueError(f"Неизвестный тип зеркала: {type(mirror).__name__}")
+
+
+def load_scene(data):
+    """
+        Чтение сцены, записанной dump_scene.
+        Параметры:
+            data (bytes): содержимое файла сцены
+        Возвращает:
+            dict: конфигурация эксперимента (light, mirrors, light_source - первый из источников,
+                light_sources, success_mode, light_destination)
+    """
+
+    header, _, body = data.partition(b"\n")
+    magic, _, version = header.partition(b" ")
+    if magic != SCENE_MAGIC:
+        raise ValueError("Файл не является файлом сцены")
+    if int(version) > SCENE_VERSION:
+        raise ValueError(f"Неподдерживаемая версия файла сцены: {int(version)}")
+
+    scene = json.loads(body)
+
+    mirrors = [load_mirror(entry) for entry in scene["mirrors"]]
+
+    if "light_sources" in scene:
+        source_params = scene["light_sources"]
+    else: # Версия 1
+        source_params = [scene["light_source"]] if "light_source" in scene else []
+    light_sources = [LightSource.from_params(params, mirrors) for params in source_params]
+
+    light_destination = None
+    if "light_destination" in scene:
+        params = scene["light_destination"]
+        light_destination = LightDestination(tuple(params["pos"]), params["radius"])
+
+    return {
+        "light" : None,
+        "mirrors" : mirrors,
+        "light_source" : light_sources[0] if light_sources else None,
+        "light_sources" : light_sources,
+        "success_mode" : scene.get("success_mode", "any"),
+        "light_destination" : light_destination
+    }
+
+
+def load_mirror(entry):
+    """
+        Зеркало по исходным данным, записанным dump_mirror.
+    """
+
+    mirror_type, left_corner, right_corner = entry[0], tuple(entry[1]), tuple(entry[2])
+
+    if mirror_type == "flat":
+        return FlatMirror(left_corner, right_corner)
+    if mirror_type in ("convex", "concave"):
+        return SphericalMirror(left_corner, right_corner, mirror_type, entry[3])
+    if mirror_type == "polyline":
+        return PolylineMirror(left_corner, right_corner, entry[3])
+
+    raise ValueError(f"Неизвестный тип зеркала: {mirror_type}")
+
+
+def is_scene_data(data):
+    """
+        Возвращает True, если data записано в формате сцены, а не старым pickle.
+    """
+
+    return data.startswith(SCENE_MAGIC)
+
+
+def read_scene(path):
+    """
+        Загрузка конфигурации эксперимента из файла. Понимает формат сцены, файлы массивов зеркал
+            (см. mirrorarrays) и старые pickle-файлы.
+    """
+
+    with open(path, "rb") as scene_file:
+        if scene_file.read(len(ARRAYS_MAGIC)) == ARRAYS_MAGIC:
+            return read_mirror_arrays(path)
+        scene_file.seek(0)
+        data = scene_file.read()
+
+    if is_scene_data(data):
+        return load_scene(data)
+
+    config = pickle.loads(data)
+    # В старых файлах был единственный источник
+    light_source = config.get("light_source")
+    config.setdefault("light_sources", [light_source] if light_source is not None else [])
+    config.setdefault("success_mode", "any")
+
+    return config
+
+
+def write_scene(path, mirrors, light_sources = (), light_destination = None, success_mode = "any"):
+    """
+        Сохранение сцены в файл в формате сцены.
+    """
+
+    with open(path, "wb") as scene_file:
+        scene_file.write(dump_scene(mirrors, light_sources, light_destination, success_mode))
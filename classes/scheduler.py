@@ -0,0 +1,60 @@
+import time
+
+import pygame as pg
+
+
+class FrameScheduler:
+
+    def __init__(self, fps = 60):
+        """
+            Конструктор планировщика кадров. Вместо активного ожидания процесс спит до начала
+                следующего кадра или до прихода события. Физика при этом идёт своими шагами
+                (см. SimulationClock), а отрисовка - не чаще fps раз в секунду.
+            Параметры:
+                fps (int): целевая частота кадров отрисовки. По умолчанию 60
+        """
+
+        self.fps = fps
+        self.frame_time = 1.0 / fps
+        self.last_frame = time.time()
+
+    def wait_frame(self):
+        """
+            Спать до начала следующего кадра.
+        """
+
+        remaining = self.frame_time - (time.time() - self.last_frame)
+        if remaining > 0:
+            time.sleep(remaining)
+
+        self.last_frame = time.time()
+
+    def wait_events(self, timeout = None):
+        """
+            Ждать события, не загружая процессор. Частота кадров при этом не превышает fps.
+            Параметры:
+                timeout (float): наибольшее время ожидания в секундах. По умолчанию ждать бесконечно
+            Возвращает:
+                List[Event]: пришедшие события (пустой список, если истёк timeout)
+        """
+
+        self.wait_frame()
+
+        if timeout is None:
+            first = pg.event.wait()
+        else:
+            first = pg.event.wait(int(timeout * 1000))
+
+        events = [] if first.type == pg.NOEVENT else [first]
+        events.extend(pg.event.get())
+
+        self.last_frame = time.time()
+
+        return events
+
+    def pause(self, seconds):
+        """
+            Задержка на seconds секунд (например, чтобы показать нажатую кнопку).
+        """
+
+        time.sleep(seconds)
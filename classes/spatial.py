@@ -0,0 +1,153 @@
+import math
+
+from classes.mirror import Mirror, FlatMirror, SphericalMirror
+from classes.polyline import PolylineMirror
+from classes.mirrorarrays import MirrorList
+
+
+class MirrorGrid:
+
+    def __init__(self, mirrors, cell_size = None):
+        """
+            Конструктор равномерной сетки над зеркалами. Каждое зеркало записывается во все клетки,
+                которые пересекает его описывающий прямоугольник (корпус для плоских зеркал,
+                rounding_polygon для сферических, контур ломаной для изогнутых), поэтому запрос
+                проверяет только соседние зеркала. Для неизменённого MirrorList прямоугольники
+                считаются по массивам, и объекты зеркал создаются только в клетках, куда заглянул запрос.
+            Параметры:
+                mirrors (List[Mirror]): зеркала эксперимента
+                cell_size (float): размер клетки. По умолчанию подбирается так, чтобы клеток было
+                    примерно столько же, сколько зеркал
+        """
+
+        self.mirrors = mirrors
+        self.generation = Mirror.generation # Версия геометрии зеркал, по которой построена сетка
+        self.size = len(mirrors)
+
+        if isinstance(mirrors, MirrorList) and mirrors.is_pristine():
+            boxes = mirrors.arrays.get_bounding_boxes().tolist()
+        else:
+            boxes = [get_bounding_box(mirror) for mirror in mirrors]
+
+        if boxes:
+            self.min_x = min(box[0] for box in boxes)
+            self.min_y = min(box[1] for box in boxes)
+            self.max_x = max(box[2] for box in boxes)
+            self.max_y = max(box[3] for box in boxes)
+        else:
+            self.min_x = self.min_y = self.max_x = self.max_y = 0.0
+
+        width, height = self.max_x - self.min_x, self.max_y - self.min_y
+        if cell_size is None:
+            cell_size = math.sqrt(max(width * height, 1.0) / max(len(mirrors), 1))
+        self.cell_size = max(cell_size, 1.0)
+
+        self.cols = int(width // self.cell_size) + 1
+        self.rows = int(height // self.cell_size) + 1
+        self.cells = {} # (столбец, строка) -> номера зеркал по возрастанию
+
+        for idx, (x1, y1, x2, y2) in enumerate(boxes):
+            col1, row1 = self.get_cell((x1, y1))
+            col2, row2 = self.get_cell((x2, y2))
+            for col in range(col1, col2 + 1):
+                for row in range(row1, row2 + 1):
+                    self.cells.setdefault((col, row), []).append(idx)
+
+    def is_valid(self, mirrors):
+        """
+            Возвращает True, если сетка построена по текущему состоянию списка зеркал mirrors.
+        """
+
+        return self.mirrors is mirrors and self.size == len(mirrors) and self.generation == Mirror.generation
+
+    def get_cell(self, point):
+        """
+            Клетка, в которой находится точка point.
+        """
+
+        return int((point[0] - self.min_x) // self.cell_size), int((point[1] - self.min_y) // self.cell_size)
+
+    def query_point(self, point):
+        """
+            Зеркала, описывающие прямоугольники которых могут содержать точку point.
+            Возвращает:
+                List[Mirror]: зеркала в порядке списка зеркал эксперимента
+        """
+
+        return [self.mirrors[idx] for idx in self.cells.get(self.get_cell(point), ())]
+
+    def iter_ray_cells(self, point, direction):
+        """
+            Обход клеток сетки вдоль луча (алгоритм Amanatides-Woo).
+            Параметры:
+                point (float, float): начало луча
+                direction (float, float): единичный вектор направления луча
+            Возвращает:
+                генератор пар (float, List[int]): расстояние вдоль луча до выхода из клетки и номера зеркал в ней
+        """
+
+        # Отсечение луча прямоугольником сетки
+        t_enter, t_leave = 0.0, math.inf
+        for p, d, lo, hi in ((point[0], direction[0], self.min_x, self.min_x + self.cols * self.cell_size),
+                             (point[1], direction[1], self.min_y, self.min_y + self.rows * self.cell_size)):
+            if d == 0:
+                if p < lo or p > hi:
+                    return
+                continue
+            t1, t2 = (lo - p) / d, (hi - p) / d
+            if t1 > t2:
+                t1, t2 = t2, t1
+            t_enter, t_leave = max(t_enter, t1), min(t_leave, t2)
+        if t_enter > t_leave:
+            return
+
+        start = (point[0] + t_enter * direction[0], point[1] + t_enter * direction[1])
+        col, row = self.get_cell(start)
+        col, row = min(max(col, 0), self.cols - 1), min(max(row, 0), self.rows - 1)
+
+        steps, t_max, t_delta = [], [], []
+        for cell, p, d, lo in ((col, point[0], direction[0], self.min_x), (row, point[1], direction[1], self.min_y)):
+            if d > 0:
+                steps.append(1)
+                t_max.append((lo + (cell + 1) * self.cell_size - p) / d)
+                t_delta.append(self.cell_size / d)
+            elif d < 0:
+                steps.append(-1)
+                t_max.append((lo + cell * self.cell_size - p) / d)
+                t_delta.append(-self.cell_size / d)
+            else:
+                steps.append(0)
+                t_max.append(math.inf)
+                t_delta.append(math.inf)
+
+        while 0 <= col < self.cols and 0 <= row < self.rows:
+
+            t_exit = min(t_max[0], t_max[1])
+            yield t_exit, self.cells.get((col, row), ())
+
+            if t_max[0] < t_max[1]:
+                col += steps[0]
+                t_max[0] += t_delta[0]
+            else:
+                row += steps[1]
+                t_max[1] += t_delta[1]
+
+
+def get_bounding_box(mirror):
+    """
+        Описывающий прямоугольник зеркала (x1, y1, x2, y2).
+    """
+
+    if isinstance(mirror, FlatMirror):
+        polygon = mirror.get_outer_polygon()
+    elif isinstance(mirror, SphericalMirror):
+        polygon = mirror.rounding_polygon
+    elif isinstance(mirror, PolylineMirror):
+        polygon = mirror.get_outline()
+    else:
+        polygon = [mirror.left_corner, mirror.right_corner]
+
+    xs = [p[0] for p in polygon]
+    ys = [p[1] for p in polygon]
+
+    return min(xs), min(ys), max(xs), max(ys)
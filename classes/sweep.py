@@ -0,0 +1,140 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from classes.vectorized import RayBundle, BundleTracer, RAY_ACHIEVED, STATUS_NAMES
+
+
+class SweepResult:
+
+    def __init__(self, mirror_indices, local_poses, light_directions, status, bounces, closest):
+        """
+            Результат перебора параметров источника. Все массивы одной длины, по элементу на комбинацию.
+            Параметры:
+                mirror_indices (ndarray): номера зеркал источника
+                local_poses (ndarray): относительные положения на зеркале
+                light_directions (ndarray): углы выхода света
+                status (ndarray): состояния лучей (RAY_ACHIEVED и т.д.)
+                bounces (ndarray): числа отражений
+                closest (ndarray): наименьшие расстояния от пути луча до центра цели
+        """
+
+        self.mirror_indices = mirror_indices
+        self.local_poses = local_poses
+        self.light_directions = light_directions
+        self.status = status
+        self.bounces = bounces
+        self.closest = closest
+
+    def __len__(self):
+
+        return len(self.status)
+
+    def get_hits(self):
+        """
+            Возвращает номера комбинаций, при которых свет достигает цели, по возрастанию числа отражений.
+        """
+
+        hits = np.nonzero(self.status == RAY_ACHIEVED)[0]
+        return hits[np.argsort(self.bounces[hits], kind = "stable")]
+
+    def get_closest_misses(self, count = 10):
+        """
+            Возвращает номера count промахнувшихся комбинаций, прошедших ближе всего к цели.
+        """
+
+        misses = np.nonzero(self.status != RAY_ACHIEVED)[0]
+        return misses[np.argsort(self.closest[misses], kind = "stable")][:count]
+
+    def get_row(self, idx):
+        """
+            Возвращает комбинацию idx в виде словаря.
+        """
+
+        return {
+            "mirror" : int(self.mirror_indices[idx]),
+            "local_pos" : round(float(self.local_poses[idx]), 10),
+            "light_direction" : round(float(self.light_directions[idx]), 10),
+            "result" : "hit" if self.status[idx] == RAY_ACHIEVED else "miss",
+            "status" : STATUS_NAMES[int(self.status[idx])],
+            "bounces" : int(self.bounces[idx]),
+            "closest" : float(self.closest[idx])
+        }
+
+
+class ParameterSweep:
+
+    def __init__(self, experiment, local_poses, light_directions, mirror_indices = None, max_bounces = 300):
+        """
+            Конструктор перебора параметров источника света по сетке.
+            Параметры:
+                experiment (Experiment): эксперимент с зеркалами, источником и целью
+                local_poses (iterable): значения относительного положения на зеркале
+                light_directions (iterable): значения угла выхода света в градусах
+                mirror_indices (iterable): номера зеркал для источника. По умолчанию все зеркала
+                max_bounces (int): максимальное число отражений. По умолчанию 300
+        """
+
+        self.experiment = experiment
+        self.local_poses = np.asarray(local_poses, dtype = np.float64)
+        self.light_directions = np.asarray(light_directions, dtype = np.float64)
+        if mirror_indices is None:
+            mirror_indices = range(len(experiment.mirrors))
+        self.mirror_indices = list(mirror_indices)
+        self.max_bounces = max_bounces
+
+    def get_tasks(self, rays_per_task = 50000):
+        """
+            Разбиение сетки на задачи: зеркало источника и часть значений положения на нём.
+        """
+
+        rows = max(1, rays_per_task // max(len(self.light_directions), 1))
+        tasks = []
+        for mirror_idx in self.mirror_indices:
+            for lo in range(0, len(self.local_poses), rows):
+                tasks.append((mirror_idx, self.local_poses[lo:lo + rows]))
+        return tasks
+
+    def run(self, jobs = None, rays_per_task = 50000):
+        """
+            Вычисление всех комбинаций параллельно.
+            Параметры:
+                jobs (int): число процессов. По умолчанию все ядра; 1 - без дополнительных процессов
+                rays_per_task (int): примерное число лучей в одной задаче. По умолчанию 50000
+            Возвращает:
+                SweepResult: результаты по всем комбинациям
+        """
+
+        exp = self.experiment
+        tasks = self.get_tasks(rays_per_task)
+        scene = (exp.mirrors, exp.light_source, exp.light_destination)
+
+        args = ([scene] * len(tasks), [t[0] for t in tasks], [t[1] for t in tasks],
+                [self.light_directions] * len(tasks), [self.max_bounces] * len(tasks))
+
+        if jobs == 1 or len(tasks) == 1:
+            parts = list(map(evaluate_task, *args))
+        else:
+            with ProcessPoolExecutor(max_workers = jobs or os.cpu_count()) as executor:
+                parts = list(executor.map(evaluate_task, *args))
+
+        return SweepResult(*(np.concatenate([part[i] for part in parts]) for i in range(6)))
+
+
+def evaluate_task(scene, mirror_idx, local_poses, light_directions, max_bounces):
+    """
+        Трассировка всех комбинаций положений local_poses и углов light_directions для источника
+            на зеркале mirror_idx одним пучком лучей.
+    """
+
+    mirrors, light_source, light_destination = scene
+
+    grid_poses, grid_directions = np.meshgrid(local_poses, light_directions, indexing = "ij")
+    grid_poses, grid_directions = grid_poses.ravel(), grid_directions.ravel()
+
+    bundle = RayBundle.from_light_source(light_source, grid_directions, grid_poses, mirrors[mirror_idx])
+    BundleTracer(mirrors, light_destination).trace(bundle, max_bounces)
+
+    return (np.full(len(bundle), mirror_idx, dtype = np.int32), grid_poses, grid_directions,
+            bundle.status, bundle.bounces, bundle.closest)
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+import pygame as pg
+from pygame import Color
+
+
+class TextCache:
+
+    def __init__(self, max_size = 256):
+        """
+            Конструктор кэша надписей: общий реестр шрифтов и LRU-кэш уже отрисованных строк.
+            Параметры:
+                max_size (int): наибольшее число хранимых надписей. По умолчанию 256
+        """
+
+        self.max_size = max_size
+        self.fonts = {} # Размер -> шрифт
+        self.surfaces = OrderedDict() # (строка, цвет, размер, фон) -> отрисованная надпись
+
+    def get_font(self, size):
+        """
+            Шрифт по умолчанию размера size. Создаётся один раз.
+        """
+
+        font = self.fonts.get(size)
+        if font is None:
+            font = pg.font.Font(None, size)
+            self.fonts[size] = font
+
+        return font
+
+    def render(self, text, color, size, background = None):
+        """
+            Отрисованная надпись text цвета color размера size (на фоне background, если задан).
+                Повторные запросы той же надписи берутся из кэша.
+            Возвращает:
+                Surface: надпись (не изменять, она общая)
+        """
+
+        key = (text, tuple(Color(color)), size, None if background is None else tuple(Color(background)))
+
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        surface = self.get_font(size).render(text, True, color, background)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last = False)
+
+        return surface
+
+    def clear(self):
+        """
+            Очистить кэш надписей.
+        """
+
+        self.surfaces.clear()
+
+
+text_cache = TextCache() # Общий кэш для кнопок и рисовальщика
@@ -0,0 +1,214 @@
+import math
+
+from classes.light import MOMENTUM_RATE, MAX_MOMENTUM
+
+
+class TraceResult:
+
+    def __init__(self, velocity = 100.0):
+        """
+            Результат точной трассировки луча.
+            Параметры:
+                velocity (float): скорость распространения света. По умолчанию 100.0
+        """
+
+        self.velocity = velocity
+        self.points = [] # Точки отражения света (образуют ломаную), начиная с источника
+        self.mirror_indices = [] # Номера зеркал, от которых свет отразился, по порядку
+        self.length = 0.0 # Пройденный путь
+        self.bounces = 0 # Количество отражений
+        self.closest = math.inf # Наименьшее расстояние от пути луча до центра цели
+        self.direction = None # Направление луча в конце пути
+        self.period = None # Период замкнутой траектории (число отражений), если луч в неё попал
+        self.orbit_mirrors = [] # Номера зеркал замкнутой траектории по порядку
+        self.status = None # "achieved" - цель достигнута, "escaped" - луч ушёл из конфигурации,
+                           # "exhausted" - исчерпан лимит отражений или момента,
+                           # "periodic" - луч движется по замкнутой траектории
+
+    def is_achieved(self):
+        """
+            Возвращает True, если луч достиг цели.
+        """
+
+        return self.status == "achieved"
+
+    def get_time(self):
+        """
+            Возвращает время симуляции, за которое свет проходит весь путь.
+        """
+
+        return self.length / self.velocity
+
+    def get_momentum(self):
+        """
+            Возвращает момент света, накопленный за весь путь.
+        """
+
+        return self.length / self.velocity * MOMENTUM_RATE
+
+
+class Tracer:
+
+    def __init__(self, mirrors, light_destination = None, mirror_index = None, orbit_quantum = 1e-6):
+        """
+            Конструктор точного трассировщика. Вместо пошагового движения луч сразу переносится
+                в ближайшую точку пересечения с зеркалом (отрезком или дугой).
+            Параметры:
+                mirrors (List[Mirror]): зеркала эксперимента
+                light_destination (LightDestination): цель света. По умолчанию None
+                mirror_index (MirrorGrid): пространственный индекс зеркал. Если задан, проверяются
+                    только зеркала в клетках вдоль луча. По умолчанию None
+                orbit_quantum (float): шаг округления точки и направления отражения при поиске
+                    замкнутых траекторий. None - не искать. По умолчанию 1e-6
+        """
+
+        self.mirrors = mirrors
+        self.orbit_quantum = orbit_quantum
+        self.light_destination = light_destination
+        self.mirror_index = mirror_index
+
+    def find_hit(self, point, direction):
+        """
+            Поиск ближайшего зеркала на пути луча.
+            Параметры:
+                point (float, float): начало луча
+                direction (float, float): единичный вектор направления луча
+            Возвращает:
+                float, int: расстояние до точки пересечения и номер зеркала; None, None, если луч ни во что не попадает
+        """
+
+        nearest_t, nearest_idx = None, None
+
+        if self.mirror_index is None:
+            for idx, mirror in enumerate(self.mirrors):
+                t = mirror.intersect_ray(point, direction)
+                if t is not None and (nearest_t is None or t < nearest_t):
+                    nearest_t, nearest_idx = t, idx
+            return nearest_t, nearest_idx
+
+        tested = set()
+        for t_exit, cell in self.mirror_index.iter_ray_cells(point, direction):
+            for idx in cell:
+                if idx in tested:
+                    continue
+                tested.add(idx)
+                t = self.mirrors[idx].intersect_ray(point, direction)
+                if t is not None and (nearest_t is None or t < nearest_t or (t == nearest_t and idx < nearest_idx)):
+                    nearest_t, nearest_idx = t, idx
+            # Дальние клетки не могут дать пересечения ближе найденного
+            if nearest_t is not None and nearest_t <= t_exit:
+                break
+
+        return nearest_t, nearest_idx
+
+    def find_destination(self, point, direction, limit = None):
+        """
+            Проходит ли луч через цель раньше, чем на расстоянии limit.
+            Возвращает:
+                (float, float): расстояния входа в зону цели и выхода из неё; иначе None
+        """
+
+        if self.light_destination is None:
+            return None
+
+        crossing = self.light_destination.intersect_ray(point, direction)
+        if crossing is None or (limit is not None and crossing[0] > limit):
+            return None
+
+        return crossing
+
+    def update_closest(self, result, point, direction, seg_length):
+        """
+            Учесть отрезок пути длиной seg_length в наименьшем расстоянии до цели.
+        """
+
+        if self.light_destination is None:
+            return
+
+        cx, cy = self.light_destination.pos[0] - point[0], self.light_destination.pos[1] - point[1]
+        along = min(max(cx * direction[0] + cy * direction[1], 0.0), max(seg_length, 0.0))
+        dist = math.sqrt((cx - along * direction[0]) ** 2 + (cy - along * direction[1]) ** 2)
+        result.closest = min(result.closest, dist)
+
+    def trace(self, light_source, max_bounces = 1000, max_momentum = MAX_MOMENTUM):
+        """
+            Полная трассировка луча из источника без окна и анимации.
+            Параметры:
+                light_source (LightSource): источник света
+                max_bounces (int): максимальное число отражений. По умолчанию 1000
+                max_momentum (float): максимальный момент света. По умолчанию MAX_MOMENTUM
+            Возвращает:
+                TraceResult: путь луча и итог эксперимента
+        """
+
+        result = TraceResult(light_source.velocity)
+
+        point = light_source.get_absolute_pos()
+        direction = normalize(light_source.get_direction_vec())
+        max_length = max_momentum / MOMENTUM_RATE * light_source.velocity
+
+        result.points.append(point)
+
+        visited = {} # Состояние луча после отражения -> номер отражения
+
+        while True:
+
+            t, idx = self.find_hit(point, direction)
+
+            self.update_closest(result, point, direction, min(t if t is not None else math.inf, max_length - result.length))
+
+            crossing = self.find_destination(point, direction, t)
+            if crossing is not None and result.length + crossing[0] <= max_length:
+                point = (point[0] + crossing[0] * direction[0], point[1] + crossing[0] * direction[1])
+                result.length += crossing[0]
+                result.points.append(point)
+                result.status = "achieved"
+                break
+
+            if t is None:
+                result.status = "escaped"
+                break
+
+            if result.bounces >= max_bounces or result.length + t > max_length:
+                result.status = "exhausted"
+                break
+
+            point = (point[0] + t * direction[0], point[1] + t * direction[1])
+            direction = normalize(self.mirrors[idx].reflect_direction(point, direction))
+
+            result.length += t
+            result.bounces += 1
+            result.points.append(point)
+            result.mirror_indices.append(idx)
+
+            # Повтор состояния означает замкнутую траекторию: дальше луч будет ходить по кругу
+            if self.orbit_quantum is not None:
+                state = self.get_state(idx, point, direction)
+                if state in visited:
+                    result.period = result.bounces - visited[state]
+                    result.orbit_mirrors = result.mirror_indices[-result.period:]
+                    result.status = "periodic"
+                    break
+                visited[state] = result.bounces
+
+        result.direction = direction
+
+        return result
+
+    def get_state(self, idx, point, direction):
+        """
+            Округлённое состояние луча сразу после отражения от зеркала idx в точке point.
+        """
+
+        quantum = self.orbit_quantum
+        return (idx, round(point[0] / quantum), round(point[1] / quantum),
+                round(direction[0] / quantum), round(direction[1] / quantum))
+
+
+def normalize(vec):
+    """
+        Возвращает единичный вектор того же направления.
+    """
+
+    norm = math.sqrt(vec[0] ** 2 + vec[1] ** 2)
+    return (vec[0] / norm, vec[1] / norm)
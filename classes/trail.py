@@ -0,0 +1,143 @@
+import math
+from collections import deque
+
+TRAIL_POINTS = 4096 # Сколько последних точек отражения луча хранится в памяти
+
+
+class PointRing:
+
+    def __init__(self, max_points = TRAIL_POINTS, points = ()):
+        """
+            Кольцевой буфер точек ломаной: хранит только max_points последних точек, более
+                старые вытесняются. Общее число добавленных точек при этом продолжает считаться.
+            Параметры:
+                max_points (int): наибольшее число хранимых точек. По умолчанию TRAIL_POINTS
+                points (iterable): начальные точки. По умолчанию нет
+        """
+
+        self.points = deque(maxlen = max_points)
+        self.total = 0 # Число точек, добавленных за всё время
+
+        for point in points:
+            self.append(point)
+
+    def __len__(self):
+
+        return len(self.points)
+
+    def __getitem__(self, idx):
+
+        return self.points[idx]
+
+    def __iter__(self):
+
+        return iter(self.points)
+
+    def append(self, point):
+        """
+            Добавить точку, вытеснив самую старую при переполнении.
+        """
+
+        self.points.append(point)
+        self.total += 1
+
+    def since(self, count):
+        """
+            Точки, добавленные после того, как всего было добавлено count точек
+                (только те из них, что ещё хранятся).
+        """
+
+        new = min(self.total - count, len(self.points))
+        if new <= 0:
+            return []
+
+        return [self.points[idx] for idx in range(len(self.points) - new, len(self.points))]
+
+
+class ReflectionWriter:
+
+    def __init__(self, path, flush_every = 256):
+        """
+            Потоковая запись событий отражения в CSV-файл по мере их появления: время, точка,
+                номер зеркала, направление после отражения и номер источника. В памяти ничего не накапливается.
+            Параметры:
+                path (str): путь к файлу (перезаписывается)
+                flush_every (int): через сколько событий сбрасывать буфер на диск. По умолчанию 256
+        """
+
+        self.path = path
+        self.flush_every = flush_every
+        self.count = 0 # Число записанных событий
+
+        self.file = open(path, "w", encoding = "utf-8")
+        self.file.write("time,x,y,mirror,dx,dy,source\n")
+
+    def write(self, time, point, mirror_idx, direction, source_idx = 0):
+        """
+            Записать событие отражения. mirror_idx = -1, если зеркало неизвестно.
+        """
+
+        self.file.write(f"{time!r},{point[0]!r},{point[1]!r},{mirror_idx},{direction[0]!r},{direction[1]!r},{source_idx}\n")
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.file.flush()
+
+    def close(self):
+        """
+            Закрыть файл.
+        """
+
+        if not self.file.closed:
+            self.file.close()
+
+
+def simplify_polyline(points, tolerance = 1.0):
+    """
+        Упрощение ломаной: сначала убираются точки, лежащие ближе tolerance к предыдущей, затем
+            алгоритмом Дугласа-Пекера - вершины, отклоняющиеся от упрощённой ломаной не больше
+            чем на tolerance. Первая и последняя точки сохраняются.
+        Параметры:
+            points (List[(float, float)]): вершины ломаной
+            tolerance (float): допустимое отклонение (в пикселях для экранных координат). По умолчанию 1.0
+        Возвращает:
+            List[(float, float)]: вершины упрощённой ломаной
+    """
+
+    if len(points) < 3:
+        return list(points)
+
+    # Сначала отбрасываются точки ближе tolerance к предыдущей оставленной (скопления в одном пикселе)
+    last_point = points[-1]
+    reduced = [points[0]]
+    for point in points[1:-1]:
+        prev = reduced[-1]
+        if (point[0] - prev[0]) ** 2 + (point[1] - prev[1]) ** 2 > tolerance ** 2:
+            reduced.append(point)
+    reduced.append(last_point)
+    points = reduced
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, len(points) - 1)] # Без рекурсии: следы бывают из десятков тысяч точек
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        dx, dy = x2 - x1, y2 - y1
+        norm2 = dx ** 2 + dy ** 2
+
+        farthest, max_dist = None, tolerance
+        for idx in range(first + 1, last):
+            x, y = points[idx]
+            # Расстояние до отрезка, а не до прямой: иначе потеряется луч, отразившийся назад
+            k = min(max(((x - x1) * dx + (y - y1) * dy) / norm2, 0.0), 1.0) if norm2 > 0 else 0.0
+            dist = math.sqrt((x - x1 - k * dx) ** 2 + (y - y1 - k * dy) ** 2)
+            if dist > max_dist:
+                farthest, max_dist = idx, dist
+
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
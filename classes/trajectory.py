@@ -0,0 +1,89 @@
+import bisect
+import math
+
+
+class Trajectory:
+
+    def __init__(self, points, achieved = False, mirror_indices = None):
+        """
+            Конструктор заранее рассчитанной траектории луча (ломаной линии).
+            Параметры:
+                points (List[(float, float)]): вершины ломаной, начиная с источника
+                achieved (bool): заканчивается ли траектория в цели. По умолчанию False
+                mirror_indices (List[int]): номера зеркал для вершин points[1:], где свет отражается.
+                    По умолчанию неизвестны
+        """
+
+        self.points = points
+        self.achieved = achieved
+        self.mirror_indices = mirror_indices if mirror_indices is not None else []
+
+        # Длина пути от источника до каждой вершины
+        self.lengths = [0.0]
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            self.lengths.append(self.lengths[-1] + math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2))
+
+        self.length = self.lengths[-1] # Полная длина траектории
+
+    @classmethod
+    def from_trace(cls, result, escape_length = 5000.0):
+        """
+            Траектория по результату трассировки TraceResult. Если луч ушёл из конфигурации,
+                последний отрезок продлевается на escape_length.
+        """
+
+        points = list(result.points)
+        if result.status == "escaped":
+            x, y = points[-1]
+            points.append((x + escape_length * result.direction[0], y + escape_length * result.direction[1]))
+
+        return cls(points, result.is_achieved(), result.mirror_indices)
+
+    def locate(self, distance):
+        """
+            Положение на траектории после пути distance.
+            Возвращает:
+                (float, float), int: точка и номер последней пройденной вершины
+        """
+
+        if distance >= self.length:
+            return self.points[-1], len(self.points) - 1
+
+        idx = max(bisect.bisect_right(self.lengths, distance) - 1, 0)
+        (x1, y1), (x2, y2) = self.points[idx], self.points[idx + 1]
+        segment = self.lengths[idx + 1] - self.lengths[idx]
+        k = (distance - self.lengths[idx]) / segment if segment > 0 else 0.0
+
+        return (x1 + (x2 - x1) * k, y1 + (y2 - y1) * k), idx
+
+    def is_finished(self, distance):
+        """
+            Возвращает True, если путь distance покрывает всю траекторию.
+        """
+
+        return distance >= self.length
+
+    def get_mirror_index(self, idx):
+        """
+            Номер зеркала, от которого свет отражается в вершине idx (-1, если это не отражение).
+        """
+
+        if 1 <= idx <= len(self.mirror_indices):
+            return self.mirror_indices[idx - 1]
+
+        return -1
+
+    def get_direction(self, idx):
+        """
+            Единичное направление отрезка, выходящего из вершины idx (None для последней вершины).
+        """
+
+        if idx + 1 >= len(self.points):
+            return None
+
+        segment = self.lengths[idx + 1] - self.lengths[idx]
+        if segment <= 0:
+            return None
+
+        (x1, y1), (x2, y2) = self.points[idx], self.points[idx + 1]
+        return (x2 - x1) / segment, (y2 - y1) / segment
@@ -0,0 +1,444 @@
+import math
+
+import numpy as np
+
+from classes.light import MOMENTUM_RATE, MAX_MOMENTUM
+from classes.mirror import RAY_EPS, SphericalMirror
+from classes.polyline import PolylineMirror
+from classes.mirrorarrays import MirrorArrays, MirrorList, MIRROR_FLAT, MIRROR_CONVEX, MIRROR_CONCAVE, MIRROR_POLYLINE
+
+# Состояния лучей в пучке
+RAY_ACTIVE = 0 # Луч ещё движется
+RAY_ACHIEVED = 1 # Луч достиг цели
+RAY_ESCAPED = 2 # Луч ушёл из конфигурации
+RAY_EXHAUSTED = 3 # Исчерпан лимит отражений или момента
+
+STATUS_NAMES = {RAY_ACTIVE : None, RAY_ACHIEVED : "achieved", RAY_ESCAPED : "escaped", RAY_EXHAUSTED : "exhausted"}
+
+
+class RayBundle:
+
+    def __init__(self, positions, directions, velocity = 100.0):
+        """
+            Конструктор пучка лучей. Лучи хранятся как структура массивов.
+            Параметры:
+                positions (ndarray N x 2): начальные точки лучей
+                directions (ndarray N x 2): направления лучей (нормируются)
+                velocity (float): скорость распространения света. По умолчанию 100.0
+        """
+
+        self.positions = np.array(positions, dtype = np.float64).reshape(-1, 2)
+        directions = np.array(directions, dtype = np.float64).reshape(-1, 2)
+        self.directions = directions / np.linalg.norm(directions, axis = 1)[:, None]
+        self.velocity = velocity
+
+        count = len(self.positions)
+        self.origins = self.positions.copy() # Точки выхода лучей
+        self.active = np.ones(count, dtype = bool) # Маска движущихся лучей
+        self.status = np.full(count, RAY_ACTIVE, dtype = np.int8)
+        self.bounces = np.zeros(count, dtype = np.int32) # Число отражений каждого луча
+        self.lengths = np.zeros(count, dtype = np.float64) # Пройденный путь каждого луча
+        self.last_mirror = np.full(count, -1, dtype = np.int32) # Номер последнего зеркала, от которого отразился луч
+        self.closest = np.full(count, np.inf) # Наименьшее расстояние от пути луча до центра цели
+
+    def __len__(self):
+
+        return len(self.positions)
+
+    @classmethod
+    def from_light_source(cls, light_source, light_directions = None, local_poses = None, mirror = None):
+        """
+            Веер лучей из источника света. Параметры источника заменяются массивами значений
+                (они приводятся друг к другу по правилам broadcasting NumPy).
+            Параметры:
+                light_source (LightSource): источник света
+                light_directions (ndarray): углы выхода в градусах. По умолчанию угол источника
+                local_poses (ndarray): относительные положения на зеркале. По умолчанию положение источника
+                mirror (Mirror): зеркало источника. По умолчанию зеркало light_source
+            Возвращает:
+                RayBundle: пучок лучей
+        """
+
+        if light_directions is None:
+            light_directions = light_source.light_direction
+        if local_poses is None:
+            local_poses = light_source.local_pos
+        if mirror is None:
+            mirror = light_source.mirror
+
+        light_directions, local_poses = np.broadcast_arrays(
+            np.asarray(light_directions, dtype = np.float64), np.asarray(local_poses, dtype = np.float64))
+
+        positions = source_positions(mirror, local_poses.ravel())
+        directions = source_directions(mirror, light_directions.ravel())
+
+        return cls(positions, directions, light_source.velocity)
+
+    def get_status_names(self):
+        """
+            Возвращает список состояний лучей в виде строк, как у TraceResult.status.
+        """
+
+        return [STATUS_NAMES[code] for code in self.status]
+
+
+class BundleTracer:
+
+    def __init__(self, mirrors, light_destination = None, chunk_size = 1 << 22):
+        """
+            Конструктор векторизованного трассировщика: все лучи пучка пересекаются со всеми
+                зеркалами за одну операцию NumPy на каждое отражение.
+            Параметры:
+                mirrors (List[Mirror]): зеркала эксперимента
+                light_destination (LightDestination): цель света. По умолчанию None
+                chunk_size (int): наибольшее число пар (луч, зеркало), обрабатываемых за раз. По умолчанию 2^22
+        """
+
+        self.light_destination = light_destination
+        self.chunk_size = chunk_size
+
+        # Массивы зеркал файла сцены используются напрямую, без создания объектов зеркал
+        if isinstance(mirrors, MirrorList) and mirrors.is_pristine():
+            arrays = mirrors.arrays
+        else:
+            arrays = MirrorArrays.from_mirrors(mirrors)
+
+        self.pack_arrays(arrays)
+
+    def pack_arrays(self, arrays):
+        """
+            Подготовка данных для пересечений по массивам зеркал arrays (MirrorArrays).
+        """
+
+        self.mirror_count = len(arrays)
+
+        types = np.asarray(arrays.types)
+        left_corners = np.asarray(arrays.left_corners, dtype = np.float64)
+        right_corners = np.asarray(arrays.right_corners, dtype = np.float64)
+
+        # Нормаль к отрезку от левого края к правому (как Mirror.get_dir_norm_vecs)
+        chords = right_corners - left_corners
+        normals = np.stack([-chords[:, 1], chords[:, 0]], axis = -1)
+        normals /= np.linalg.norm(normals, axis = 1)[:, None]
+
+        flat = types == MIRROR_FLAT
+        spherical = (types == MIRROR_CONVEX) | (types == MIRROR_CONCAVE)
+
+        # Плоские зеркала: левый край, вектор до правого края, нормаль
+        self.flat_indices = np.nonzero(flat)[0].astype(np.int32)
+        self.flat_starts = left_corners[flat]
+        self.flat_edges = chords[flat]
+        self.flat_normals = normals[flat]
+
+        # Сферические зеркала: центр, радиус, середина отрезка между краями и сторона, куда выгнута дуга
+        self.sph_indices = np.nonzero(spherical)[0].astype(np.int32)
+        self.sph_radii = np.asarray(arrays.radii, dtype = np.float64)[spherical]
+        self.sph_middles = (left_corners[spherical] + right_corners[spherical]) / 2
+        sides = np.where((types[spherical] == MIRROR_CONVEX)[:, None], normals[spherical], -normals[spherical])
+        radius_dist = np.sqrt(self.sph_radii ** 2 - np.sum((chords[spherical] / 2) ** 2, axis = 1))
+        self.sph_centers = self.sph_middles - radius_dist[:, None] * sides
+        self.sph_sides = sides
+
+        self.pack_polylines(arrays, types, left_corners, chords, normals)
+
+        # Число столбцов (отрезков и дуг), с которыми пересекается каждый луч
+        self.column_count = len(self.flat_indices) + len(self.sph_indices) + len(self.poly_indices)
+
+    def pack_polylines(self, arrays, types, left_corners, chords, normals):
+        """
+            Отрезки всех зеркал-ломаных одним массивом (как у плоских зеркал), с номером зеркала
+                и нормалями в обеих вершинах для интерполяции (как PolylineMirror.build).
+                Иерархии отрезков здесь нет: каждый луч пересекается со всеми отрезками сразу.
+        """
+
+        polylines = np.nonzero(types == MIRROR_POLYLINE)[0]
+        offsets = np.asarray(arrays.profile_offsets, dtype = np.int64)
+        counts = offsets[polylines + 1] - offsets[polylines]
+
+        # Вершины ломаных: левый край + u * (правый край - левый край) + v * нормаль
+        owners = np.repeat(polylines, counts)
+        rows = np.concatenate([np.arange(offsets[idx], offsets[idx + 1]) for idx in polylines]).astype(np.int64) \
+            if len(polylines) else np.zeros(0, dtype = np.int64)
+        profile = np.asarray(arrays.profile_points, dtype = np.float64)[rows].reshape(-1, 2)
+        points = left_corners[owners] + profile[:, 0:1] * chords[owners] + profile[:, 1:2] * normals[owners]
+
+        # Отрезок соединяет соседние вершины одного зеркала
+        first = np.nonzero(owners[:-1] == owners[1:])[0]
+        edges = points[first + 1] - points[first]
+        seg_normals = np.stack([-edges[:, 1], edges[:, 0]], axis = -1)
+        seg_norms = np.linalg.norm(seg_normals, axis = 1)
+        seg_normals /= np.where(seg_norms > 0, seg_norms, 1.0)[:, None]
+
+        # Нормаль в вершине - средняя нормалей соседних отрезков
+        vertex_normals = np.zeros_like(points)
+        np.add.at(vertex_normals, first, seg_normals)
+        np.add.at(vertex_normals, first + 1, seg_normals)
+        vertex_norms = np.linalg.norm(vertex_normals, axis = 1)
+        vertex_normals = np.where((vertex_norms > 0)[:, None], vertex_normals / np.where(vertex_norms > 0, vertex_norms, 1.0)[:, None],
+                                  normals[owners])
+
+        self.poly_indices = owners[first].astype(np.int32)
+        self.poly_starts = points[first]
+        self.poly_edges = edges
+        self.poly_normals = seg_normals
+        self.poly_start_normals = vertex_normals[first]
+        self.poly_end_normals = vertex_normals[first + 1]
+
+    def find_hits(self, positions, directions):
+        """
+            Ближайшие зеркала на пути лучей.
+            Параметры:
+                positions (ndarray N x 2): начала лучей
+                directions (ndarray N x 2): единичные направления лучей
+            Возвращает:
+                ndarray N: расстояния до пересечений (inf, если пересечения нет)
+                ndarray N: номера зеркал (-1, если пересечения нет)
+                ndarray N x 2: нормали в точках пересечения
+        """
+
+        count = len(positions)
+        best_t = np.full(count, np.inf)
+        best_idx = np.full(count, -1, dtype = np.int32)
+        normals = np.zeros((count, 2))
+
+        step = max(1, self.chunk_size // max(self.column_count, 1))
+
+        for lo in range(0, count, step):
+            hi = min(lo + step, count)
+            self._find_hits_chunk(positions[lo:hi], directions[lo:hi], best_t[lo:hi], best_idx[lo:hi], normals[lo:hi])
+
+        return best_t, best_idx, normals
+
+    def _find_hits_chunk(self, positions, directions, best_t, best_idx, normals):
+
+        px, py = positions[:, 0:1], positions[:, 1:2]
+        dx, dy = directions[:, 0:1], directions[:, 1:2]
+
+        if len(self.flat_indices):
+
+            ex, ey = self.flat_edges[:, 0], self.flat_edges[:, 1]
+            wx, wy = self.flat_starts[:, 0] - px, self.flat_starts[:, 1] - py
+
+            with np.errstate(divide = "ignore", invalid = "ignore"):
+                denom = dx * ey - dy * ex
+                t = (wx * ey - wy * ex) / denom
+                s = (wx * dy - wy * dx) / denom
+
+            t = np.where((denom != 0) & (t > RAY_EPS) & (s >= 0.0) & (s <= 1.0), t, np.inf)
+
+            col = np.argmin(t, axis = 1)
+            t_min = t[np.arange(len(t)), col]
+            better = t_min < best_t
+            best_t[better] = t_min[better]
+            best_idx[better] = self.flat_indices[col[better]]
+            normals[better] = self.flat_normals[col[better]]
+
+        if len(self.sph_indices):
+
+            fx, fy = px - self.sph_centers[:, 0], py - self.sph_centers[:, 1]
+            b = fx * dx + fy * dy
+            disc = b * b - (fx * fx + fy * fy - self.sph_radii ** 2)
+            root = np.sqrt(np.maximum(disc, 0.0))
+
+            t = np.full(b.shape, np.inf)
+            for sign in (1.0, -1.0): # Сначала дальний корень, чтобы ближний его перезаписал
+                t_root = -b + sign * root
+                hx, hy = px + t_root * dx, py + t_root * dy
+                on_arc = (hx - self.sph_middles[:, 0]) * self.sph_sides[:, 0] + \
+                         (hy - self.sph_middles[:, 1]) * self.sph_sides[:, 1] >= 0
+                t = np.where((disc >= 0) & (t_root > RAY_EPS) & on_arc, t_root, t)
+
+            col = np.argmin(t, axis = 1)
+            t_min = t[np.arange(len(t)), col]
+            better = t_min < best_t
+            best_t[better] = t_min[better]
+            best_idx[better] = self.sph_indices[col[better]]
+
+            # Нормаль к дуге направлена по радиусу
+            centers = self.sph_centers[col[better]]
+            hit = positions[better] + t_min[better, None] * directions[better]
+            radial = hit - centers
+            normals[better] = radial / np.linalg.norm(radial, axis = 1)[:, None]
+
+        if len(self.poly_indices):
+
+            ex, ey = self.poly_edges[:, 0], self.poly_edges[:, 1]
+            wx, wy = self.poly_starts[:, 0] - px, self.poly_starts[:, 1] - py
+
+            with np.errstate(divide = "ignore", invalid = "ignore"):
+                denom = dx * ey - dy * ex
+                t = (wx * ey - wy * ex) / denom
+                s = (wx * dy - wy * dx) / denom
+
+            t = np.where((denom != 0) & (t > RAY_EPS) & (s >= 0.0) & (s <= 1.0), t, np.inf)
+
+            col = np.argmin(t, axis = 1)
+            rows = np.arange(len(t))
+            t_min = t[rows, col]
+            better = t_min < best_t
+            best_t[better] = t_min[better]
+            best_idx[better] = self.poly_indices[col[better]]
+
+            # Нормаль интерполируется между вершинами отрезка (как PolylineMirror.get_normal)
+            col, s_min = col[better], s[rows, col][better]
+            start_normals, end_normals = self.poly_start_normals[col], self.poly_end_normals[col]
+            interpolated = start_normals + (end_normals - start_normals) * s_min[:, None]
+            interpolated /= np.linalg.norm(interpolated, axis = 1)[:, None]
+
+            # Отражённый луч не должен уходить за отрезок (как PolylineMirror.reflect_direction)
+            seg_normals = self.poly_normals[col]
+            dirs = directions[better]
+            dot = np.sum(dirs * interpolated, axis = 1)
+            reflected = dirs - 2 * dot[:, None] * interpolated
+            through = np.sum(dirs * seg_normals, axis = 1) * np.sum(reflected * seg_normals, axis = 1) > 0
+            normals[better] = np.where(through[:, None], seg_normals, interpolated)
+
+    def find_destination(self, positions, directions):
+        """
+            Расстояния до входа лучей в зону цели (inf, если луч через неё не проходит).
+        """
+
+        if self.light_destination is None:
+            return np.full(len(positions), np.inf)
+
+        fx = positions[:, 0] - self.light_destination.pos[0]
+        fy = positions[:, 1] - self.light_destination.pos[1]
+        b = fx * directions[:, 0] + fy * directions[:, 1]
+        disc = b * b - (fx * fx + fy * fy - self.light_destination.radius ** 2)
+        root = np.sqrt(np.maximum(disc, 0.0))
+
+        t_in = np.maximum(-b - root, 0.0)
+        return np.where((disc > 0) & (-b + root > 0), t_in, np.inf)
+
+    def update_closest(self, bundle, idx, seg_lengths):
+        """
+            Учесть очередные отрезки пути лучей idx длиной seg_lengths в наименьшем расстоянии до цели.
+        """
+
+        if self.light_destination is None:
+            return
+
+        positions, directions = bundle.positions[idx], bundle.directions[idx]
+        to_center = np.asarray(self.light_destination.pos, dtype = np.float64) - positions
+        along = np.clip(np.sum(to_center * directions, axis = 1), 0.0, np.maximum(seg_lengths, 0.0))
+        dist = np.linalg.norm(to_center - along[:, None] * directions, axis = 1)
+        bundle.closest[idx] = np.minimum(bundle.closest[idx], dist)
+
+    def step(self, bundle, max_length = np.inf):
+        """
+            Одно отражение всех движущихся лучей пучка.
+            Возвращает:
+                int: число лучей, которые всё ещё движутся
+        """
+
+        idx = np.nonzero(bundle.active)[0]
+        if len(idx) == 0:
+            return 0
+
+        positions = bundle.positions[idx]
+        directions = bundle.directions[idx]
+
+        t, mirror_idx, normals = self.find_hits(positions, directions)
+        t_dest = self.find_destination(positions, directions)
+        self.update_closest(bundle, idx, np.minimum(t, max_length - bundle.lengths[idx]))
+
+        # Цель раньше зеркала
+        achieved = (t_dest <= t) & (bundle.lengths[idx] + t_dest <= max_length)
+        escaped = ~achieved & (mirror_idx < 0)
+        exhausted = ~achieved & ~escaped & (bundle.lengths[idx] + t > max_length)
+        reflected = ~(achieved | escaped | exhausted)
+
+        hit_ids = idx[achieved]
+        bundle.positions[hit_ids] += t_dest[achieved, None] * directions[achieved]
+        bundle.lengths[hit_ids] += t_dest[achieved]
+        bundle.status[hit_ids] = RAY_ACHIEVED
+        bundle.status[idx[escaped]] = RAY_ESCAPED
+        bundle.status[idx[exhausted]] = RAY_EXHAUSTED
+
+        # Отражение: new_dir = dir - 2 (dir . n) n, как в reflect_direction
+        ref_ids = idx[reflected]
+        t_ref = t[reflected]
+        dirs = directions[reflected]
+        nrm = normals[reflected]
+        dot = np.sum(dirs * nrm, axis = 1)
+        new_dirs = dirs - 2 * dot[:, None] * nrm
+
+        bundle.positions[ref_ids] += t_ref[:, None] * dirs
+        bundle.directions[ref_ids] = new_dirs / np.linalg.norm(new_dirs, axis = 1)[:, None]
+        bundle.lengths[ref_ids] += t_ref
+        bundle.bounces[ref_ids] += 1
+        bundle.last_mirror[ref_ids] = mirror_idx[reflected]
+
+        bundle.active[idx[~reflected]] = False
+
+        return len(ref_ids)
+
+    def trace(self, bundle, max_bounces = 1000, max_momentum = MAX_MOMENTUM):
+        """
+            Трассировка всех лучей пучка до цели, выхода из конфигурации или исчерпания лимитов.
+            Параметры:
+                bundle (RayBundle): пучок лучей (изменяется на месте)
+                max_bounces (int): максимальное число отражений. По умолчанию 1000
+                max_momentum (float): максимальный момент света. По умолчанию MAX_MOMENTUM
+            Возвращает:
+                RayBundle: тот же пучок
+        """
+
+        max_length = max_momentum / MOMENTUM_RATE * bundle.velocity
+
+        for _ in range(max_bounces):
+            if self.step(bundle, max_length) == 0:
+                break
+
+        # Лучи, которые ещё движутся, могут достичь цели до следующего зеркала
+        idx = np.nonzero(bundle.active)[0]
+        if len(idx):
+            positions, directions = bundle.positions[idx], bundle.directions[idx]
+            t, mirror_idx, _ = self.find_hits(positions, directions)
+            t_dest = self.find_destination(positions, directions)
+            self.update_closest(bundle, idx, np.minimum(t, max_length - bundle.lengths[idx]))
+            achieved = (t_dest <= t) & (bundle.lengths[idx] + t_dest <= max_length)
+            bundle.positions[idx[achieved]] += t_dest[achieved, None] * directions[achieved]
+            bundle.lengths[idx[achieved]] += t_dest[achieved]
+            bundle.status[idx] = np.where(achieved, RAY_ACHIEVED, np.where(mirror_idx < 0, RAY_ESCAPED, RAY_EXHAUSTED))
+            bundle.active[idx] = False
+
+        return bundle
+
+
+def source_positions(mirror, local_poses):
+    """
+        Точки выхода света для массива относительных положений на зеркале (как LightSource.get_absolute_pos).
+    """
+
+    local_poses = np.asarray(local_poses, dtype = np.float64)
+
+    if isinstance(mirror, SphericalMirror):
+        if mirror.mirror_type == "concave":
+            local_poses = 1.0 - local_poses
+        angles = -(mirror.start_angle + (mirror.stop_angle - mirror.start_angle) * local_poses)
+        return np.stack([mirror.center[0] + mirror.curv_radius * np.cos(angles),
+                         mirror.center[1] + mirror.curv_radius * np.sin(angles)], axis = -1)
+
+    if isinstance(mirror, PolylineMirror):
+        distances = mirror.arc_lengths[-1] * np.clip(local_poses, 0.0, 1.0)
+        points = np.asarray(mirror.points, dtype = np.float64)
+        return np.stack([np.interp(distances, mirror.arc_lengths, points[:, 0]),
+                         np.interp(distances, mirror.arc_lengths, points[:, 1])], axis = -1)
+
+    x1, y1 = mirror.left_corner
+    x2, y2 = mirror.right_corner
+    return np.stack([x1 + (x2 - x1) * local_poses, y1 + (y2 - y1) * local_poses], axis = -1)
+
+
+def source_directions(mirror, light_directions):
+    """
+        Направления выхода света для массива углов в градусах (как LightSource.get_direction_vec).
+    """
+
+    rad = np.asarray(light_directions, dtype = np.float64) * math.pi / 180
+
+    (pvecx, pvecy), _ = mirror.get_dir_norm_vecs()
+
+    return np.stack([pvecx * np.cos(rad) - pvecy * np.sin(rad),
+                     pvecx * np.sin(rad) + pvecy * np.cos(rad)], axis = -1)
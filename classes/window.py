@@ -2,12 +2,15 @@ import pygame as pg
 import easygui
 
 import os
-import time
 
 from classes.button import Button
+from classes.catalog import SceneCatalog, describe_entry
+from classes.heatmap import get_reachability_map
+from classes.aim import AimSolver
 from classes.drawspace import DrawSpace
 from classes.light import LightDestination
 from classes.mirror import FlatMirror, SphericalMirror
+from classes.polyline import PolylineMirror, load_profile
 
 class Window:
 
@@ -45,10 +48,10 @@ class Window:
         """
 
         self.experiment.global_mirror_poses = []
-        self.screen.fill(self.drawspace.bg_color)
+        self.drawspace.fill_background()
         for button in self.exp_mode_buttons:
             self.screen.blit(button.up_surface, button.pos)
-        pg.display.flip()
+        self.drawspace.present()
 
     def load_save(self):
         """
@@ -60,48 +63,123 @@ class Window:
 
         exp_config = self.experiment.load(
             file_path = self.saves_path, 
-            load_name = easygui.fileopenbox(
-                msg = "Загрузить эксперимент",
-                default = os.path.join(self.root_path, self.saves_path, "*.exp")
-            )
+            load_name = self.browse_saves()
         )
 
         if exp_config:
+            self.drawspace.invalidate_scene()
             self.clear_main()
             self.experiment.ready = True
 
+    def browse_saves(self):
+        """
+            Выбор сохранения по каталогу: список с числом зеркал и итогом трассировки, затем
+                миниатюра выбранной сцены. Файлы вне папки сохранений выбираются обычным окном.
+            Возвращает:
+                str: имя или путь выбранного файла (None, если выбор отменён)
+        """
+
+        other_file = "Другой файл..."
+
+        catalog = SceneCatalog(os.path.join(self.root_path, self.saves_path))
+        entries = catalog.update()
+        names = {describe_entry(name, entry) : name for name, entry in entries}
+
+        while names:
+
+            choice = easygui.choicebox(
+                msg = "Загрузить эксперимент",
+                title = "Сохранения",
+                choices = list(names) + [other_file]
+            )
+            if choice is None:
+                return None
+            if choice == other_file:
+                break
+
+            thumbnail_path = catalog.get_thumbnail_path(names[choice])
+            answer = easygui.buttonbox(
+                msg = choice,
+                title = "Сохранения",
+                image = thumbnail_path if os.path.exists(thumbnail_path) else None,
+                choices = ["Загрузить", "Назад"]
+            )
+            if answer == "Загрузить":
+                return names[choice]
+
+        return easygui.fileopenbox(
+            msg = "Загрузить эксперимент",
+            default = os.path.join(self.root_path, self.saves_path, "*.exp")
+        )
+
+    def show_heatmap(self):
+        """
+            Показ карты достижимости цели по положению и углу источника (см. ReachabilityMap).
+                Карта кэшируется по хэшу сцены, поэтому для уже открывавшейся сцены показывается сразу.
+        """
+
+        experiment = self.experiment
+
+        if experiment.light_source is None or experiment.light_destination is None:
+            easygui.msgbox(msg = "Сначала задайте источник света и цель в параметрах.", title = "Карта попаданий")
+            return
+
+        cache_dir = os.path.join(self.root_path, self.saves_path, ".heatmaps")
+        reachability = get_reachability_map(experiment, cache_dir)
+
+        image_path = os.path.join(cache_dir, "current.png")
+        pg.image.save(reachability.render(light_source = experiment.light_source), image_path)
+
+        easygui.msgbox(
+            msg = f"Попаданий: {reachability.get_hit_count()} из {reachability.status.size}.\n"
+                  "По горизонтали - угол выхода от 0 до 180, по вертикали - положение на зеркале от 0 до 1.\n"
+                  "Жёлтым - попадания за несколько отражений, тёмно-красным - за много, серым - промахи. "
+                  "Крест - текущие параметры источника.",
+            title = "Карта попаданий",
+            image = image_path
+        )
+
+    def toggle_caustics(self):
+        """
+            Включение и выключение карты плотности света (каустики) на фоне основного режима:
+                из каждого источника выпускается плотный веер лучей (см. CausticMap).
+        """
+
+        # Выключить карту можно всегда, даже если источников уже нет
+        if not self.drawspace.caustics_enabled and not self.experiment.light_sources:
+            easygui.msgbox(msg = "Сначала задайте источник света в параметрах.", title = "Каустика")
+            return
+
+        self.drawspace.caustics_enabled = not self.drawspace.caustics_enabled
+
     def boot_settings(self):
         """
             Запуск режима настроек.
         """
-        self.screen.fill(self.drawspace.bg_color)
+        self.drawspace.fill_background()
         self.drawspace.draw_mirrors()
         self.drawspace.draw_light_destination()
         for button in self.settings_mode_buttons:
             button.is_up = False
-        last_tick = time.time()
-        while time.time() - last_tick < 0.05:
-            pass
+        self.experiment.scheduler.pause(0.05)
         for button in self.settings_mode_buttons:
             button.is_up = True
             self.screen.blit(button.up_surface, button.pos)
-        pg.display.flip()
+        self.drawspace.present()
         self.experiment.turn_settings()
 
     def deboot_settings(self):
         """
             Выключение режима настроек.
         """
-        self.screen.fill(self.drawspace.bg_color)
+        self.drawspace.fill_background()
         for button in self.exp_mode_buttons:
             button.is_up = False
-        last_tick = time.time()
-        while time.time() - last_tick < 0.05:
-            pass
+        self.experiment.scheduler.pause(0.05)
         for button in self.exp_mode_buttons:
             button.is_up = True
             self.screen.blit(button.up_surface, button.pos)
-        pg.display.flip()
+        self.drawspace.present()
         self.experiment.turn_settings()
 
     def clear_field(self):
@@ -111,15 +189,16 @@ class Window:
         self.global_mirror_poses = []
         del self.experiment.mirrors
         self.experiment.mirrors = []
-        del self.experiment.light_source
-        self.experiment.light_source = None
+        del self.experiment.light_sources
+        self.experiment.light_sources = []
         del self.experiment.light_destination
         self.experiment.light_destination = None
 
-        self.screen.fill(self.drawspace.bg_color)
+        self.drawspace.invalidate_scene()
+        self.drawspace.fill_background()
         for button in self.settings_mode_buttons:
             self.screen.blit(button.up_surface, button.pos)
-        pg.display.flip()
+        self.drawspace.present()
 
     def setup_buttons(self, margin = 30, button_width = 150, button_height = 50):
         """
@@ -147,6 +226,18 @@ class Window:
                               font_size = 32,
                               action = lambda : self.load_save())
 
+        self.heatmap_button = Button( pos = (margin, margin + (button_height + margin / 2) * 2), 
+                              size = (button_width, button_height), 
+                              text = "Карта", 
+                              font_size = 32,
+                              action = lambda : self.show_heatmap())
+
+        self.caustics_button = Button( pos = (margin, margin + (button_height + margin / 2) * 3), 
+                              size = (button_width, button_height), 
+                              text = "Каустика", 
+                              font_size = 32,
+                              action = lambda : self.toggle_caustics())
+
         self.settings_button = Button(pos = (self.screen.get_width() - button_width - margin, margin),
             size = (button_width, button_height), 
             text = "Параметры", 
@@ -188,7 +279,8 @@ class Window:
         )
 
         # Кнопки основного режима
-        self.exp_mode_buttons = [self.quit_button, self.save_button, self.load_button, self.settings_button, self.start_button]
+        self.exp_mode_buttons = [self.quit_button, self.save_button, self.load_button, self.heatmap_button, self.caustics_button,
+            self.settings_button, self.start_button]
 
         # Кнопки режима настроек
         self.settings_mode_buttons = [self.save_settings_button, self.clear_button]
@@ -217,8 +309,8 @@ class Window:
 
                     button_pressed = True
 
-                    self.screen.blit(button.down_surface, button.pos)
-                    pg.display.flip()
+                    self.drawspace.mark_dirty(self.screen.blit(button.down_surface, button.pos))
+                    self.drawspace.present()
                     button.is_up = False
 
                     button.action()
@@ -237,11 +329,16 @@ class Window:
                 preselection = 1
             elif mirror.mirror_type == "convex":
                 preselection = 2
+        elif isinstance(mirror, PolylineMirror):
+            preselection = 3
 
         choice = easygui.choicebox(
-            msg = "Выберите тип зеркала.",
+            msg = "Выберите тип зеркала.\n"\
+                    " Параболическое зеркало задаётся ломаной; его глубину можно изменить в параметрах.\n"\
+                    " Из файла - профиль из текстового файла со строками \"u,v\": u от 0 до 1 вдоль зеркала\n"\
+                    " от левого края, v - отступ в пикселях (положительный - в сторону корпуса).",
             title = "Изменить тип зеркала",
-            choices = ["Плоское", "Вогнутое", "Выпуклое"],
+            choices = ["Плоское", "Вогнутое", "Выпуклое", "Параболическое", "Из файла..."],
             preselect = preselection
         )
 
@@ -251,7 +348,7 @@ class Window:
                 return FlatMirror(mirror.left_corner, mirror.right_corner)
 
             elif choice == "Вогнутое":
-                if isinstance(mirror, FlatMirror):
+                if isinstance(mirror, (FlatMirror, PolylineMirror)):
 
                     return SphericalMirror(mirror.left_corner, mirror.right_corner, "concave", 2 * mirror.get_flat_length())
 
@@ -260,13 +357,30 @@ class Window:
                     return SphericalMirror(mirror.left_corner, mirror.right_corner, "concave", mirror.curv_radius)
 
             elif choice == "Выпуклое":
-                if isinstance(mirror, FlatMirror):
+                if isinstance(mirror, (FlatMirror, PolylineMirror)):
 
                     return SphericalMirror(mirror.left_corner, mirror.right_corner, "convex", 2 * mirror.get_flat_length())
 
                 elif isinstance(mirror, SphericalMirror) and mirror.mirror_type == "concave":
                     
                     return SphericalMirror(mirror.left_corner, mirror.right_corner, "convex", mirror.curv_radius)
+
+            elif choice == "Параболическое" and not isinstance(mirror, PolylineMirror):
+
+                return PolylineMirror(mirror.left_corner, mirror.right_corner)
+
+            elif choice == "Из файла...":
+
+                path = easygui.fileopenbox(msg = "Выберите файл профиля зеркала.", title = "Профиль зеркала", default = "*.csv")
+                if path is None:
+                    return None
+                try:
+                    profile = load_profile(path)
+                except (OSError, ValueError) as error:
+                    easygui.msgbox(msg = f"Ошибка: не удалось прочитать профиль ({error}).", title = "Профиль зеркала")
+                    return None
+
+                return PolylineMirror(mirror.left_corner, mirror.right_corner, profile)
         return None
 
     def edit_mirror(self, is_button_down, mirror):
@@ -282,6 +396,8 @@ class Window:
         left_corner, right_corner = mirror.left_corner, mirror.right_corner
         if isinstance(mirror, SphericalMirror):
             radius = mirror.curv_radius
+        if isinstance(mirror, PolylineMirror):
+            depth = mirror.get_depth()
 
         if is_button_down:
 
@@ -295,6 +411,10 @@ class Window:
                 msg += "\nРадиус кривизны зеркала - от 10e-5 до 1000."
                 fields.append("Радиус кривизны")
                 values.append(radius)
+            if isinstance(mirror, PolylineMirror):
+                msg += "\nГлубина изгиба - от -1000 до 1000 (положительная - зеркало вогнуто)."
+                fields.append("Глубина изгиба")
+                values.append(depth)
 
             newvals = easygui.multenterbox(
                 title = "Редактирование зеркала",
@@ -325,12 +445,23 @@ class Window:
                     except ValueError:
                         errmsg += "\n\nОшибка. Радиус - вещественное число."
 
+                if isinstance(mirror, PolylineMirror):
+                    depth = newvals[-1]
+                    try:
+                        depth = float(depth)
+                        if abs(depth) > 1000:
+                            errmsg += "\n\nОшибка. Глубина изгиба ограничена 1000 по модулю."
+                    except ValueError:
+                        errmsg += "\n\nОшибка. Глубина изгиба - вещественное число."
+
                 if errmsg == "":
                     break
                 else:
                     values = [left_corner[0], left_corner[1], right_corner[0], right_corner[1]]
                     if isinstance(mirror, SphericalMirror):
                         values.append(radius)
+                    if isinstance(mirror, PolylineMirror):
+                        values.append(depth)
                     newvals = easygui.multenterbox(
                         title = "Редактирование зеркала",
                         msg = msg + errmsg,
@@ -344,6 +475,8 @@ class Window:
                 highlighted.right_corner = int(newvals[2]), int(newvals[3])
                 if isinstance(mirror, SphericalMirror):
                     highlighted.curv_radius = radius
+                if isinstance(mirror, PolylineMirror):
+                    highlighted.set_depth(depth)
                 highlighted.recalculate_points()
 
                 experiment.mirrors[(experiment.mirrors.index(highlighted) - 1) % \
@@ -421,19 +554,157 @@ class Window:
         else:
             experiment.light_destination = LightDestination(event_pos, 10)
 
+    def aim_light_source(self, light_source, max_bounces = 100, max_choices = 50):
+        """
+            Подбор угла выхода света, при котором луч из текущего положения источника попадает
+                в цель (см. AimSolver). Найденные углы предлагаются списком.
+            Параметры:
+                light_source (LightSource): наводимый источник
+                max_bounces (int): наибольшее число отражений до цели. По умолчанию 100
+                max_choices (int): сколько углов показать. По умолчанию 50
+        """
+
+        experiment = self.experiment
+
+        if experiment.light_destination is None:
+            easygui.msgbox(msg = "Сначала задайте цель: нажмите на пустое место в режиме настроек.", title = "Навести на цель")
+            return
+
+        solver = AimSolver(experiment.mirrors, experiment.light_destination, experiment.get_mirror_index(), max_bounces)
+        solutions = solver.solve(light_source)
+
+        if not solutions:
+            easygui.msgbox(msg = f"Не найдено углов выхода, при которых свет достигает цели не более чем за {max_bounces} отражений.",
+                           title = "Навести на цель")
+            return
+
+        keep = "Оставить как есть"
+        choices = {}
+        for angle, result in solutions[:max_choices]:
+            choices[f"Угол {angle:.6f}: отражений {result.bounces}, время до цели {result.get_time():.1f} с"] = angle
+
+        choice = easygui.choicebox(
+            msg = f"Найдено углов: {len(solutions)}. Выберите угол выхода света:",
+            title = "Навести на цель",
+            choices = list(choices) + [keep]
+        )
+
+        if choice in choices:
+            light_source.light_direction = choices[choice]
+
+    def select_light_source(self, title):
+        """
+            Выбор одного из источников света эксперимента. Если источник один, он и возвращается.
+            Возвращает:
+                LightSource: выбранный источник; None, если выбор отменён
+        """
+
+        experiment = self.experiment
+
+        if len(experiment.light_sources) == 1:
+            return experiment.light_sources[0]
+
+        choices = {}
+        for idx, light_source in enumerate(experiment.light_sources):
+            choices[f"Источник {idx + 1}: зеркало {experiment.mirrors.index(light_source.mirror)}, "
+                    f"положение {light_source.local_pos}, угол {light_source.light_direction}"] = light_source
+
+        choice = easygui.choicebox(msg = "Выберите источник:", title = title, choices = list(choices))
+
+        return choices.get(choice)
+
+    def edit_success_mode(self):
+        """
+            Выбор условия успеха эксперимента с несколькими источниками.
+        """
+
+        modes = {"Хотя бы один луч" : "any", "Все лучи" : "all"}
+
+        choice = easygui.buttonbox(
+            msg = "Эксперимент успешен, когда цели достигнет:",
+            title = "Условие успеха",
+            choices = list(modes)
+        )
+
+        if choice in modes:
+            self.experiment.success_mode = modes[choice]
+
+    def edit_simulation_speed(self):
+        """
+            Изменить скорость симуляции: во сколько раз время эксперимента идёт быстрее реального
+                (см. SimulationClock).
+        """
+
+        clock = self.experiment.clock
+        msg = "Во сколько раз время эксперимента идёт быстрее реального (например, 0.5 - вдвое медленнее):"
+
+        value = easygui.enterbox(msg = msg, title = "Скорость симуляции", default = str(clock.speed))
+        while value is not None:
+            try:
+                speed = float(value)
+                if speed > 0.0:
+                    clock.speed = speed
+                    return
+                errmsg = "Ошибка: Скорость симуляции должна быть больше нуля."
+            except ValueError:
+                errmsg = "Ошибка: Скорость симуляции задана не числом."
+            value = easygui.enterbox(msg = msg + "\n\n" + errmsg, title = "Скорость симуляции", default = value)
+
     def edit_light_source(self):
         """
-            Изменить источник света. Запускается окно с изменением параметров света.
+            Изменить источники света: параметры, наведение на цель, добавление и удаление источников,
+                условие успеха при нескольких источниках, скорость симуляции.
         """
 
         experiment = self.experiment
 
-        light_source = experiment.light_source
+        success = "все лучи" if experiment.success_mode == "all" else "хотя бы один луч"
+        action = easygui.buttonbox(
+            msg = f"Источников: {len(experiment.light_sources)}; эксперимент успешен, когда цели достигнет {success}.\n"
+                  "Задать параметры источника вручную, подобрать угол выхода, при котором свет попадает в цель, "
+                  f"или добавить, удалить источник? Скорость симуляции: {experiment.clock.speed:g}x.",
+            title = "Редактирование источника",
+            choices = ["Изменить параметры", "Навести на цель", "Добавить источник", "Удалить источник", "Условие успеха",
+                       "Скорость симуляции", "Отмена"]
+        )
+
+        if action == "Добавить источник":
+            self.edit_light_source_params(experiment.add_light_source(experiment.mirrors[0]))
+            return
+        if action == "Условие успеха":
+            self.edit_success_mode()
+            return
+        if action == "Скорость симуляции":
+            self.edit_simulation_speed()
+            return
+        if action not in ("Изменить параметры", "Навести на цель", "Удалить источник"):
+            return
+        if action == "Удалить источник" and len(experiment.light_sources) == 1:
+            easygui.msgbox(msg = "Нельзя удалить единственный источник: эксперименту нужен хотя бы один.", title = "Удалить источник")
+            return
+
+        light_source = self.select_light_source(action)
+        if light_source is None:
+            return
+
+        if action == "Навести на цель":
+            self.aim_light_source(light_source)
+        elif action == "Удалить источник":
+            experiment.light_sources.remove(light_source)
+        else:
+            self.edit_light_source_params(light_source)
+
+    def edit_light_source_params(self, light_source):
+        """
+            Изменить параметры источника света light_source. Запускается окно с изменением параметров света.
+        """
+
+        experiment = self.experiment
 
-        light_pos = experiment.light_source.local_pos
-        light_dir = experiment.light_source.light_direction
-        light_velocity = experiment.light_source.velocity
-        mirror_idx = experiment.mirrors.index(experiment.light_source.mirror)
+        light_pos = light_source.local_pos
+        light_dir = light_source.light_direction
+        light_velocity = light_source.velocity
+        mirror_idx = experiment.mirrors.index(light_source.mirror)
 
         msg = "Свет задаётся в относительном диапазоне [0..1] от левого края;\n"\
               " направление - от 0 до 180 от правого края против часовой стрелки.\n"\
@@ -521,13 +792,13 @@ class Window:
         if newvals is not None:
 
             if light_pos != "":
-                if light_pos != experiment.light_source.local_pos or \
-                   light_dir != experiment.light_source.light_direction:
-                    experiment.light_source.local_pos = light_pos
-                    experiment.light_source.light_direction = light_dir
+                if light_pos != light_source.local_pos or \
+                   light_dir != light_source.light_direction:
+                    light_source.local_pos = light_pos
+                    light_source.light_direction = light_dir
             if light_velocity != "":
-                experiment.light_source.velocity = light_velocity
+                light_source.velocity = light_velocity
             else:
-                experiment.light_source.velocity = 80.0
+                light_source.velocity = 80.0
             if mirror_idx != "":
-                experiment.light_source.mirror = experiment.mirrors[mirror_idx]
+                light_source.mirror = experiment.mirrors[mirror_idx]
@@ -0,0 +1,38 @@
+import argparse
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame as pg
+
+from classes import Experiment, get_reachability_map
+
+# Карта достижимости цели по положению и углу источника
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Карта положений и углов источника, при которых свет достигает цели.")
+    parser.add_argument("scene", help = "файл эксперимента .exp")
+    parser.add_argument("-o", "--output", default = "heatmap.png", help = "файл изображения (по умолчанию heatmap.png)")
+    parser.add_argument("--positions", type = int, default = 201, help = "число значений положения на зеркале в [0..1] (по умолчанию 201)")
+    parser.add_argument("--angles", type = int, default = 181, help = "число значений угла выхода в [0..180] (по умолчанию 181)")
+    parser.add_argument("--max-bounces", type = int, default = 300, help = "лимит отражений (по умолчанию 300)")
+    parser.add_argument("--scale", type = int, default = 3, help = "размер клетки карты в пикселях (по умолчанию 3)")
+    parser.add_argument("-j", "--jobs", type = int, default = None, help = "число процессов (по умолчанию все ядра)")
+    parser.add_argument("--cache-dir", default = os.path.join("saves", ".heatmaps"),
+                        help = "папка кэша карт (по умолчанию saves/.heatmaps)")
+    parser.add_argument("--no-cache", action = "store_true", help = "не использовать кэш")
+    args = parser.parse_args(argv)
+
+    exp = Experiment(mirrors = [])
+    exp.load(os.path.dirname(args.scene), os.path.basename(args.scene))
+
+    reachability = get_reachability_map(exp, None if args.no_cache else args.cache_dir,
+                                        args.positions, args.angles, args.max_bounces, args.jobs)
+
+    pg.image.save(reachability.render(args.scale, exp.light_source), args.output)
+
+    print(f"Попаданий: {reachability.get_hit_count()} из {reachability.status.size}. Карта сохранена в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,34 @@
-from classes import Experiment, Window
+import argparse
+
+from classes import Experiment, Window, FrameProfiler, SimulationClock
 
 # Создание окна и эксперимента
-def setup():
+def setup(args):
+
+    profiler = None
+    if args.profile is not None or args.hud:
+        profiler = FrameProfiler(args.profile, hud = args.hud)
 
-    exp = Experiment()
+    exp = Experiment(clock = SimulationClock(speed = args.speed), reflection_log = args.reflection_log, profiler = profiler)
     window = Window(exp)
     return exp, window
 
 # Запуск программы
-def main():
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Эксперимент с лучом света в конфигурации зеркал.")
+    parser.add_argument("--profile", default = None, metavar = "FILE",
+                        help = "JSONL-файл с покадровыми замерами фаз главного цикла (события, физика, рисование, вывод)")
+    parser.add_argument("--hud", action = "store_true", help = "показывать замеры фаз кадра поверх эксперимента")
+    parser.add_argument("--reflection-log", default = None, metavar = "FILE",
+                        help = "CSV-файл, куда пишутся все отражения запущенного эксперимента")
+    parser.add_argument("--speed", type = float, default = 1.0,
+                        help = "во сколько раз время эксперимента идёт быстрее реального (по умолчанию 1.0)")
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed должна быть больше нуля")
 
-    exp, window = setup()
+    exp, window = setup(args)
     exp.run(window)
 
 
@@ -0,0 +1,62 @@
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from classes import Experiment, ParameterSweep
+
+FIELDS = ["mirror", "local_pos", "light_direction", "result", "status", "bounces", "closest"]
+
+# Перебор параметров источника света по сетке
+def main(argv = None):
+
+    parser = argparse.ArgumentParser(description = "Поиск положений и углов источника, при которых свет достигает цели.")
+    parser.add_argument("scene", help = "файл эксперимента .exp")
+    parser.add_argument("--positions", type = int, default = 101, help = "число значений положения на зеркале в [0..1] (по умолчанию 101)")
+    parser.add_argument("--angles", type = int, default = 181, help = "число значений угла выхода в [0..180] (по умолчанию 181)")
+    parser.add_argument("--mirrors", type = int, nargs = "*", default = None, help = "номера зеркал источника (по умолчанию все)")
+    parser.add_argument("--max-bounces", type = int, default = 300, help = "лимит отражений (по умолчанию 300)")
+    parser.add_argument("-j", "--jobs", type = int, default = None, help = "число процессов (по умолчанию все ядра)")
+    parser.add_argument("--hits", type = int, default = 20, help = "сколько попаданий показать (по умолчанию 20)")
+    parser.add_argument("--misses", type = int, default = 10, help = "сколько ближайших промахов показать (по умолчанию 10)")
+    parser.add_argument("-o", "--output", default = None, help = "CSV-файл со всеми комбинациями")
+    args = parser.parse_args(argv)
+
+    exp = Experiment(mirrors = [])
+    exp.load(os.path.dirname(args.scene), os.path.basename(args.scene))
+
+    sweep = ParameterSweep(
+        exp,
+        local_poses = np.linspace(0.0, 1.0, args.positions),
+        light_directions = np.linspace(0.0, 180.0, args.angles),
+        mirror_indices = args.mirrors,
+        max_bounces = args.max_bounces
+    )
+    result = sweep.run(jobs = args.jobs)
+
+    if args.output:
+        with open(args.output, "w", newline = "") as output:
+            writer = csv.DictWriter(output, fieldnames = FIELDS)
+            writer.writeheader()
+            for idx in range(len(result)):
+                writer.writerow(result.get_row(idx))
+
+    hits = result.get_hits()
+    writer = csv.DictWriter(sys.stdout, fieldnames = FIELDS)
+    print(f"Попаданий: {len(hits)} из {len(result)}")
+    writer.writeheader()
+    for idx in hits[:args.hits]:
+        writer.writerow(result.get_row(idx))
+
+    print("\nБлижайшие промахи:")
+    writer.writeheader()
+    for idx in result.get_closest_misses(args.misses):
+        writer.writerow(result.get_row(idx))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import glob
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Окно не открывается; картинки окна загружаются относительно папки проекта ещё при импорте classes
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.chdir(ROOT)
+
+import pytest
+
+SAVES = sorted(glob.glob(os.path.join(ROOT, "saves", "*.exp"))) # Сохранения, на которых проверяются трассировщики
+
+
+@pytest.fixture(params = SAVES, ids = os.path.basename)
+def save_path(request):
+
+    return request.param
@@ -0,0 +1,43 @@
+import pytest
+
+from classes import AimSolver, LightSource, read_scene
+
+
+def test_solutions_reach_destination(save_path):
+
+    config = read_scene(save_path)
+    light_source = config["light_sources"][0]
+    solver = AimSolver(config["mirrors"], config["light_destination"], max_bounces = 20, samples = 180)
+
+    solutions = solver.solve(light_source)
+
+    assert solutions
+    assert [result.bounces for _, result in solutions] == sorted(result.bounces for _, result in solutions)
+    # Каждое решение - своя последовательность зеркал
+    assert len({tuple(result.mirror_indices) for _, result in solutions}) == len(solutions)
+
+    for angle, result in solutions:
+        assert 0.0 <= angle <= 180.0
+        assert result.is_achieved()
+        # Повторная трассировка под найденным углом даёт тот же путь
+        aimed = LightSource(light_source.mirror, light_source.local_pos, angle, light_source.velocity)
+        assert solver.tracer.trace(aimed, 20).mirror_indices == result.mirror_indices
+
+
+# Уточнённые углы проходят через цель почти по центру
+def test_bisection_hits_center(save_path):
+
+    config = read_scene(save_path)
+    solver = AimSolver(config["mirrors"], config["light_destination"], max_bounces = 10, samples = 90)
+
+    solutions = solver.solve(config["light_sources"][0])
+
+    assert min(result.closest for _, result in solutions) == pytest.approx(0.0, abs = 1e-6)
+
+
+def test_no_destination(save_path):
+
+    config = read_scene(save_path)
+    solver = AimSolver(config["mirrors"], None)
+
+    assert solver.solve(config["light_sources"][0]) == []
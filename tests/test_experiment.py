@@ -0,0 +1,92 @@
+import csv
+import math
+import os
+
+import pytest
+
+from classes import Experiment, SimulationClock, read_scene
+
+
+def make_experiment(save_path, **kwargs):
+
+    config = read_scene(save_path)
+    return Experiment(mirrors = config["mirrors"], light_sources = config["light_sources"],
+                      light_destination = config["light_destination"], **kwargs)
+
+
+@pytest.mark.parametrize("statuses, expected", [
+    ([None, None], None),
+    ([None, "achieved"], "achieved"),
+    (["escaped", None], None),
+    (["escaped", "exhausted"], "escaped"),
+    (["achieved", "escaped"], "achieved"),
+    ([], None),
+])
+def test_status_any(statuses, expected):
+
+    exp = Experiment(mirrors = [])
+    exp.light_statuses = statuses
+
+    assert exp.get_status() == expected
+
+
+@pytest.mark.parametrize("statuses, expected", [
+    ([None, None], None),
+    (["achieved", None], None),
+    (["achieved", "achieved"], "achieved"),
+    ([None, "periodic"], "periodic"),
+    (["achieved", "escaped"], "escaped"),
+    ([], None),
+])
+def test_status_all(statuses, expected):
+
+    exp = Experiment(mirrors = [])
+    exp.success_mode = "all"
+    exp.light_statuses = statuses
+
+    assert exp.get_status() == expected
+
+
+def test_start_without_sources():
+
+    exp = Experiment(mirrors = [])
+    exp.start()
+
+    assert not exp.advancing
+    assert exp.lights == []
+    assert exp.get_status() is None
+
+
+def test_load_does_not_restore_light(save_path):
+
+    exp = Experiment(mirrors = [])
+    exp.lights = ["stale"]
+    exp.load(*os.path.split(save_path))
+
+    assert exp.lights == []
+    assert exp.light_sources
+    exp.start()
+    assert len(exp.lights) == len(exp.light_sources)
+
+
+# Проигрывание рассчитанного пути шагами часов доходит до цели за время, которое дал трассировщик
+def test_exact_run_reaches_destination(save_path, tmp_path):
+
+    log_path = tmp_path / "reflections.csv"
+    exp = make_experiment(save_path, clock = SimulationClock(), reflection_log = str(log_path))
+    exp.start()
+    result = exp.trace_results[0]
+
+    steps = 0
+    while exp.step_light(None) is None:
+        steps += 1
+        assert steps <= math.ceil(result.get_time() / exp.clock.step) + 1
+    exp.close_reflection_log()
+
+    assert exp.get_status() == "achieved"
+    assert exp.lights[0].reflection_points.total == len(result.points)
+
+    # В журнал попадают только отражения, без точки входа в цель
+    with open(log_path, newline = "") as log_file:
+        rows = list(csv.DictReader(log_file))
+    assert [int(row["mirror"]) for row in rows] == result.mirror_indices
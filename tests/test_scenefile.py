@@ -0,0 +1,92 @@
+import json
+import pickle
+
+import pytest
+
+from classes import (FlatMirror, SphericalMirror, PolylineMirror, LightSource, LightDestination, MirrorList,
+                     dump_scene, load_scene, read_scene, write_scene, write_mirror_arrays, parabolic_profile)
+from classes.scenefile import SCENE_MAGIC, SCENE_VERSION
+
+
+# Сцена со всеми типами зеркал, двумя источниками и целью
+def make_scene():
+
+    mirrors = [
+        FlatMirror((100.0, 100.0), (400.0, 120.0)),
+        SphericalMirror((500.0, 100.0), (600.0, 300.0), "convex", 150.0),
+        SphericalMirror((150.0, 500.0), (450.0, 520.0), "concave", 400.0),
+        PolylineMirror((700.0, 400.0), (800.0, 200.0), parabolic_profile(20.0, 9))
+    ]
+    light_sources = [LightSource(mirrors[0], 0.25, 60.0, 120.0), LightSource(mirrors[3], 0.5, 100.0)]
+    light_destination = LightDestination((350.0, 300.0), 25.0)
+
+    return mirrors, light_sources, light_destination
+
+
+def test_scene_round_trip(tmp_path):
+
+    mirrors, light_sources, light_destination = make_scene()
+    path = tmp_path / "scene.exp"
+    write_scene(path, mirrors, light_sources, light_destination, "all")
+
+    config = read_scene(path)
+
+    assert [type(mirror) for mirror in config["mirrors"]] == [type(mirror) for mirror in mirrors]
+    assert config["success_mode"] == "all"
+    assert config["light"] is None
+    assert config["light_source"] is config["light_sources"][0]
+    assert config["light_sources"][1].mirror is config["mirrors"][3]
+    # Всё сохраняемое совпадает: повторная запись даёт тот же файл
+    assert dump_scene(config["mirrors"], config["light_sources"], config["light_destination"], config["success_mode"]) == \
+        dump_scene(mirrors, light_sources, light_destination, "all")
+
+
+def test_mirror_arrays_round_trip(tmp_path):
+
+    mirrors, light_sources, light_destination = make_scene()
+    path = tmp_path / "scene.mirrors"
+    write_mirror_arrays(path, mirrors, light_sources, light_destination, "all")
+
+    config = read_scene(path)
+
+    assert isinstance(config["mirrors"], MirrorList)
+    assert dump_scene(config["mirrors"], config["light_sources"], config["light_destination"], config["success_mode"]) == \
+        dump_scene(mirrors, light_sources, light_destination, "all")
+
+
+def test_version_1_scene_has_single_source():
+
+    mirrors, light_sources, light_destination = make_scene()
+    scene = json.loads(dump_scene(mirrors, light_sources[:1], light_destination).partition(b"\n")[2])
+    scene["light_source"] = scene.pop("light_sources")[0]
+    del scene["success_mode"]
+
+    config = load_scene(SCENE_MAGIC + b" 1\n" + json.dumps(scene).encode())
+
+    assert len(config["light_sources"]) == 1
+    assert config["light_source"].local_pos == light_sources[0].local_pos
+    assert config["success_mode"] == "any"
+
+
+def test_newer_scene_version_is_rejected():
+
+    with pytest.raises(ValueError):
+        load_scene(SCENE_MAGIC + f" {SCENE_VERSION + 1}\n{{}}".encode())
+
+
+# Старые сохранения - pickle словаря с единственным источником и объектами зеркал
+def test_pickle_fallback(tmp_path):
+
+    mirrors, light_sources, light_destination = make_scene()
+    path = tmp_path / "old.exp"
+    with open(path, "wb") as old_file:
+        pickle.dump({"light" : None, "mirrors" : mirrors, "light_source" : light_sources[0],
+                     "light_destination" : light_destination}, old_file)
+
+    config = read_scene(path)
+
+    assert len(config["light_sources"]) == 1
+    assert config["light_sources"][0].mirror is config["mirrors"][0]
+    assert config["success_mode"] == "any"
+    assert dump_scene(config["mirrors"], config["light_sources"], config["light_destination"]) == \
+        dump_scene(mirrors, light_sources[:1], light_destination)
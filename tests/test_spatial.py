@@ -0,0 +1,75 @@
+import numpy as np
+
+from classes import FlatMirror, PolylineMirror, MirrorGrid, MirrorArrays, MirrorList, Tracer, read_scene
+from classes.spatial import get_bounding_box
+from tests.test_scenefile import make_scene
+
+
+def test_grid_query_finds_mirror():
+
+    mirrors, _, _ = make_scene()
+    grid = MirrorGrid(mirrors)
+
+    for mirror in mirrors:
+        assert mirror in grid.query_point(mirror.central_point)
+
+
+def test_grid_invalidated_by_mirror_changes():
+
+    mirrors, _, _ = make_scene()
+    grid = MirrorGrid(mirrors)
+    assert grid.is_valid(mirrors)
+
+    # Пересчёт зеркала увеличивает Mirror.generation
+    mirrors[0].right_corner = (420.0, 140.0)
+    mirrors[0].recalculate_points()
+    assert not grid.is_valid(mirrors)
+
+    grid = MirrorGrid(mirrors)
+    mirrors.append(FlatMirror((0.0, 0.0), (10.0, 10.0)))
+    assert not grid.is_valid(mirrors)
+    assert not grid.is_valid(list(mirrors))
+
+
+# Создание представлений MirrorList не считается изменением геометрии
+def test_grid_survives_mirror_list_views():
+
+    mirrors, _, _ = make_scene()
+    mirror_list = MirrorList(MirrorArrays.from_mirrors(mirrors))
+    grid = MirrorGrid(mirror_list)
+
+    mirror_list[2]
+    assert grid.is_valid(mirror_list)
+    assert mirror_list.is_pristine()
+
+
+def test_array_bounding_boxes(save_path):
+
+    mirrors, _, _ = make_scene()
+    mirrors = mirrors + list(read_scene(save_path)["mirrors"])
+
+    boxes = MirrorArrays.from_mirrors(mirrors).get_bounding_boxes()
+
+    for box, mirror in zip(boxes, mirrors):
+        exact = get_bounding_box(mirror)
+        # Прямоугольник по массивам содержит настоящий (у ломаных он чуть больше)
+        assert np.all(box[:2] <= np.add(exact[:2], 1e-9)) and np.all(box[2:] >= np.subtract(exact[2:], 1e-9))
+        if not isinstance(mirror, PolylineMirror):
+            assert np.allclose(box, exact)
+
+
+# Сетка над неизменённым MirrorList строится по массивам, зеркала создаются только вдоль луча
+def test_grid_over_mirror_list_is_lazy(save_path):
+
+    config = read_scene(save_path)
+    mirror_list = MirrorList(MirrorArrays.from_mirrors(config["mirrors"]))
+    grid = MirrorGrid(mirror_list)
+
+    assert all(view is None for view in mirror_list.views)
+
+    light_source = config["light_sources"][0]
+    light_source.mirror = mirror_list[config["mirrors"].index(light_source.mirror)]
+    result = Tracer(mirror_list, config["light_destination"], grid).trace(light_source, 1000)
+    expected = Tracer(config["mirrors"], config["light_destination"]).trace(config["light_sources"][0], 1000)
+
+    assert result.mirror_indices == expected.mirror_indices
@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+import pytest
+
+from classes import Tracer, BundleTracer, RayBundle, MirrorGrid, STATUS_NAMES, read_scene
+
+
+# Точный трассировщик и векторизованный должны приходить к одному итогу по одному и тому же пути
+def test_bundle_tracer_matches_tracer(save_path):
+
+    config = read_scene(save_path)
+    light_source = config["light_sources"][0]
+
+    result = Tracer(config["mirrors"], config["light_destination"]).trace(light_source, 1000)
+    bundle = RayBundle.from_light_source(light_source)
+    BundleTracer(config["mirrors"], config["light_destination"]).trace(bundle, 1000)
+
+    assert STATUS_NAMES[int(bundle.status[0])] == result.status
+    assert int(bundle.bounces[0]) == result.bounces
+    assert bundle.lengths[0] == pytest.approx(result.length)
+    assert tuple(bundle.positions[0]) == pytest.approx(result.points[-1])
+
+
+# То же для веера лучей из источника сохранения
+def test_bundle_tracer_matches_tracer_on_fan(save_path):
+
+    config = read_scene(save_path)
+    light_source = config["light_sources"][0]
+    angles = np.linspace(5.0, 175.0, 35)
+
+    bundle = RayBundle.from_light_source(light_source, angles)
+    BundleTracer(config["mirrors"], config["light_destination"]).trace(bundle, 50)
+
+    tracer = Tracer(config["mirrors"], config["light_destination"])
+    for idx, angle in enumerate(angles):
+        light_source.light_direction = float(angle)
+        result = tracer.trace(light_source, 50)
+        assert STATUS_NAMES[int(bundle.status[idx])] == result.status, angle
+        assert int(bundle.bounces[idx]) == result.bounces, angle
+
+
+# Сетка зеркал не меняет результат, только ускоряет поиск
+def test_tracer_with_mirror_grid(save_path):
+
+    config = read_scene(save_path)
+    mirrors, light_source = config["mirrors"], config["light_sources"][0]
+
+    plain = Tracer(mirrors, config["light_destination"]).trace(light_source, 1000)
+    indexed = Tracer(mirrors, config["light_destination"], MirrorGrid(mirrors)).trace(light_source, 1000)
+
+    assert indexed.status == plain.status
+    assert indexed.mirror_indices == plain.mirror_indices
+    assert indexed.length == pytest.approx(plain.length)
+
+
+def test_saves_reach_destination(save_path):
+
+    config = read_scene(save_path)
+    result = Tracer(config["mirrors"], config["light_destination"]).trace(config["light_sources"][0], 1000)
+
+    assert result.is_achieved()
+    assert len(result.points) == result.bounces + 2 # Источник, отражения и точка входа в цель
+    assert result.get_time() == pytest.approx(result.length / config["light_sources"][0].velocity)
+    assert math.isfinite(result.closest)
@@ -0,0 +1,70 @@
+import csv
+
+from classes import PointRing, ReflectionWriter, simplify_polyline
+
+
+def test_point_ring_keeps_last_points():
+
+    ring = PointRing(3, [(0, 0)])
+    for x in range(1, 6):
+        ring.append((x, 0))
+
+    assert list(ring) == [(3, 0), (4, 0), (5, 0)]
+    assert ring.total == 6
+    assert ring[0] == (3, 0)
+
+
+def test_point_ring_since():
+
+    ring = PointRing(4, [(0, 0), (1, 0)])
+    count = ring.total
+    ring.append((2, 0))
+    ring.append((3, 0))
+
+    assert ring.since(count) == [(2, 0), (3, 0)]
+    assert ring.since(ring.total) == []
+    # Вытесненные точки не возвращаются
+    for x in range(4, 10):
+        ring.append((x, 0))
+    assert ring.since(count) == [(6, 0), (7, 0), (8, 0), (9, 0)]
+
+
+def test_simplify_drops_collinear_and_close_points():
+
+    points = [(0.0, 0.0), (1.0, 0.2), (2.0, -0.2), (3.0, 0.0), (3.1, 0.0), (10.0, 0.0)]
+
+    assert simplify_polyline(points, 1.0) == [(0.0, 0.0), (10.0, 0.0)]
+
+
+def test_simplify_keeps_corners():
+
+    points = [(0.0, 0.0), (5.0, 0.0), (10.0, 0.0), (10.0, 5.0), (10.0, 10.0)]
+
+    assert simplify_polyline(points, 1.0) == [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0)]
+
+
+# Луч, отразившийся назад, лежит на прямой первого отрезка, но вершина поворота нужна
+def test_simplify_keeps_reversal():
+
+    points = [(0.0, 0.0), (10.0, 0.0), (5.0, 0.0)]
+
+    assert simplify_polyline(points, 1.0) == points
+
+
+def test_simplify_short_polylines_unchanged():
+
+    assert simplify_polyline([(0.0, 0.0), (0.1, 0.0)], 1.0) == [(0.0, 0.0), (0.1, 0.0)]
+
+
+def test_reflection_writer(tmp_path):
+
+    path = tmp_path / "reflections.csv"
+    writer = ReflectionWriter(path, flush_every = 1)
+    writer.write(1.5, (10.0, 20.0), 3, (0.0, 1.0), 1)
+    writer.close()
+
+    with open(path, newline = "") as log_file:
+        rows = list(csv.reader(log_file))
+
+    assert rows[0] == ["time", "x", "y", "mirror", "dx", "dy", "source"]
+    assert [float(value) for value in rows[1]] == [1.5, 10.0, 20.0, 3, 0.0, 1.0, 1]